@@ -0,0 +1,1341 @@
+"""
+Benchmarks for Market Data Archivist.
+
+Each benchmark builds its own synthetic TradingView-style data, so no
+market data files are needed.
+
+Run all benchmarks:
+    python benchmark_market_archivist.py
+
+Run selected benchmarks with a custom size:
+    python benchmark_market_archivist.py ingest --rows 50000
+"""
+
+import argparse
+import array
+import asyncio
+import bz2
+import csv
+import datetime
+import gzip
+import http.client
+import json
+import lzma
+import multiprocessing
+import os
+import random
+import resource
+import shutil
+import sqlite3
+import statistics
+import sys
+import threading
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from zoneinfo import ZoneInfo
+import market_archivist
+from market_archivist import (
+    ARCHIVE_PRAGMAS,
+    BULK_CHUNK_SIZE,
+    Archive,
+    ArchiveServer,
+    AsyncArchive,
+    init_database,
+    ingest_csv,
+    ingest_many,
+    get_bars,
+    iter_bars,
+    get_bars_columnar,
+    export_bars,
+    import_bars,
+    get_session_summaries,
+    rebuild_session_summaries,
+    save_day_annotation,
+    save_day_annotations_bulk,
+    get_trade_day,
+    get_pt_datetime,
+    resolve_trade_day,
+    resolve_trade_days,
+    parse_tradingview_timestamp,
+    parse_tradingview_timestamps
+)
+
+
+PT_TIMEZONE = ZoneInfo("America/Los_Angeles")
+BENCH_DB = "bench_market_data.db"
+BENCH_CSV = "bench_market_data.csv"
+SAMPLE_CSV = "TradingView-Feb9-CME_MINI_MNQ1!, 1_5cedc.csv"
+
+# Sunday 2024-01-07 3:00 PM PT, the first session of the synthetic data
+SYNTHETIC_START = datetime.datetime(2024, 1, 7, 15, 0, 0, tzinfo=PT_TIMEZONE)
+
+# First trade day of synthetic archives built directly in SQL; far enough
+# back that 10M bars still end before SYNTHETIC_START
+ARCHIVE_START = datetime.date(1990, 1, 2)
+
+# 1-minute bars in a 23-hour session
+BARS_PER_SESSION = 23 * 60
+
+
+def cleanup(*paths):
+    """Remove benchmark files (and SQLite side files) if they exist."""
+    for path in paths:
+        for candidate in (path, path + "-wal", path + "-shm", path + "-journal"):
+            if os.path.exists(candidate):
+                os.remove(candidate)
+
+
+def is_market_open(dt: datetime.datetime) -> bool:
+    """Check if a PT datetime falls in a trading session (not halt, not weekend)."""
+    weekday = dt.weekday()
+    if weekday == 5:
+        return False
+    if weekday == 4 and dt.hour >= 14:
+        return False
+    if weekday == 6 and dt.hour < 15:
+        return False
+    return dt.hour != 14
+
+
+def synthetic_timestamps(n_rows: int, start: datetime.datetime = SYNTHETIC_START) -> list:
+    """Return n_rows 1-minute bar open times (PT datetimes) during market hours."""
+    result = []
+    epoch = int(start.timestamp())
+    while len(result) < n_rows:
+        dt = datetime.datetime.fromtimestamp(epoch, tz=PT_TIMEZONE)
+        if is_market_open(dt):
+            result.append(dt)
+        epoch += 60
+    return result
+
+
+def write_synthetic_csv(path: str, n_rows: int, start: datetime.datetime = SYNTHETIC_START) -> None:
+    """Write n_rows of 1-minute bars in TradingView export format."""
+    write_bars_csv(path, synthetic_timestamps(n_rows, start))
+
+
+def write_synthetic_csv_files(paths: list, rows_per_file: int) -> None:
+    """Write consecutive, non-overlapping synthetic exports to each path."""
+    datetimes = synthetic_timestamps(rows_per_file * len(paths))
+    for i, path in enumerate(paths):
+        write_bars_csv(path, datetimes[i * rows_per_file:(i + 1) * rows_per_file])
+
+
+def write_bars_csv(path: str, datetimes: list) -> None:
+    """Write synthetic 1-minute bars at the given PT datetimes."""
+    price = 17000.0
+    with open(path, "w") as f:
+        f.write("time,open,high,low,close,Volume\n")
+        for i, dt in enumerate(datetimes):
+            step = ((i * 7919) % 17 - 8) * 0.25
+            open_price = price
+            close_price = price + step
+            high_price = max(open_price, close_price) + 0.5
+            low_price = min(open_price, close_price) - 0.5
+            f.write(
+                f"{dt.isoformat()},{open_price},{high_price},{low_price},"
+                f"{close_price},{100 + i % 400}\n"
+            )
+            price = close_price
+
+
+def synthetic_sessions(n_bars: int, start: datetime.date = ARCHIVE_START):
+    """
+    Yield (session_date, session_open_epoch) for consecutive weekday trade
+    days until n_bars 1-minute bars are covered.
+    """
+    day = start
+    remaining = n_bars
+    while remaining > 0:
+        if day.weekday() < 5:
+            previous = day - datetime.timedelta(days=1)
+            session_open = datetime.datetime(
+                previous.year, previous.month, previous.day, 15, 0, 0, tzinfo=PT_TIMEZONE
+            )
+            yield day.isoformat(), int(session_open.timestamp())
+            remaining -= BARS_PER_SESSION
+        day += datetime.timedelta(days=1)
+
+
+def build_synthetic_archive(db_path: str, n_bars: int, symbol: str = "MNQ", indexed: bool = True) -> list:
+    """
+    Fill a fresh database with about n_bars 1-minute bars (plus one halt bar
+    per Monday-Thursday session) straight through SQL.
+
+    With indexed=False, the indexes added by schema migrations are dropped,
+    the schema version reset and bars stored without a timeframe, giving a
+    baseline (unmigrated) database.
+
+    Returns the list of (trade_day_id, session_open_epoch).
+    """
+    cleanup(db_path)
+    init_database(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+
+    if not indexed:
+        cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+        for (name,) in cursor.fetchall():
+            cursor.execute(f"DROP INDEX {name}")
+        cursor.execute("PRAGMA user_version = 0")
+
+    timeframe = 60 if indexed else None
+    sessions = []
+    remaining = n_bars
+    for session_date, session_open in synthetic_sessions(n_bars):
+        cursor.execute(
+            "INSERT INTO trade_days (symbol, session_date, source) VALUES (?, ?, 'tradingview')",
+            (symbol, session_date)
+        )
+        trade_day_id = cursor.lastrowid
+        sessions.append((trade_day_id, session_open))
+
+        count = min(BARS_PER_SESSION, remaining)
+        remaining -= count
+        rows = []
+        price = 17000.0
+        for i in range(count):
+            step = ((i * 7919) % 17 - 8) * 0.25
+            rows.append((
+                trade_day_id, timeframe, session_open + 60 * i, price, price + 1, price - 1,
+                price + step, 100.0 + i % 400, 0, None, None, None
+            ))
+            price += step
+        # The halt hour after a Monday-Thursday session
+        if datetime.date.fromisoformat(session_date).weekday() < 4:
+            rows.append((None, timeframe, session_open + 23 * 3600, price, price, price, price, 1.0, 1,
+                         symbol, "tradingview", None))
+        cursor.executemany(
+            """INSERT INTO bars
+               (trade_day_id, timeframe, timestamp, open, high, low, close, volume, halt_period,
+                halt_symbol, halt_source, raw_json)
+               VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+            rows
+        )
+
+    conn.commit()
+    conn.close()
+    return sessions
+
+
+def timed(fn, *args, **kwargs):
+    """Run fn and return (result, elapsed seconds)."""
+    start = time.perf_counter()
+    result = fn(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def report(label: str, seconds: float, rows: int) -> None:
+    """Print a timing line with throughput."""
+    rate = rows / seconds if seconds else float("inf")
+    print(f"  {label:<40} {seconds:9.3f}s {rate:14,.0f} rows/s")
+
+
+def report_latency(label: str, seconds: float, calls: int) -> None:
+    """Print the mean latency of calls."""
+    print(f"  {label:<40} {seconds / calls * 1000:12.3f} ms/call ({calls} calls)")
+
+
+def measure_lookups(db_path: str, sessions: list, calls: int) -> dict:
+    """Time the ingest duplicate checks and get_bars queries against db_path."""
+    rng = random.Random(42)
+    picks = [rng.choice(sessions) for _ in range(calls)]
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    timings = {}
+
+    start = time.perf_counter()
+    for trade_day_id, session_open in picks:
+        cursor.execute(
+            "SELECT id, open, high, low, close, volume FROM bars "
+            "WHERE trade_day_id = ? AND timeframe = 60 AND timestamp = ?",
+            (trade_day_id, session_open + 600)
+        )
+        cursor.fetchone()
+    timings["duplicate check (session bar)"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for trade_day_id, session_open in picks:
+        cursor.execute(
+            "SELECT id, open, high, low, close, volume FROM bars "
+            "WHERE timeframe = 60 AND timestamp = ? AND halt_period = 1",
+            (session_open + 23 * 3600,)
+        )
+        cursor.fetchone()
+    timings["duplicate check (halt bar)"] = time.perf_counter() - start
+
+    cursor.execute("SELECT id, session_date FROM trade_days")
+    dates = dict(cursor.fetchall())
+    conn.close()
+
+    query_calls = max(1, calls // 10)
+    start = time.perf_counter()
+    for trade_day_id, _ in picks[:query_calls]:
+        get_bars("MNQ", session_date=dates[trade_day_id], db_path=db_path)
+    timings["get_bars (one session)"] = time.perf_counter() - start
+
+    return timings
+
+
+def bench_ingest(args):
+    """Row-by-row ingest_csv versus bulk=True."""
+    print(f"\n=== ingest_csv: row path vs bulk ({args.rows:,} rows) ===")
+    write_synthetic_csv(BENCH_CSV, args.rows)
+
+    try:
+        for label, kwargs in (("row path", {}), ("bulk", {"bulk": True})):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            stats, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB, **kwargs)
+            report(f"{label} (fresh)", seconds, args.rows)
+            stats, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB, **kwargs)
+            report(f"{label} (re-ingest, all skipped)", seconds, args.rows)
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV)
+
+
+def bench_incremental(args):
+    """Daily refresh of an overlapping re-export: full re-check vs incremental=True."""
+    n_rows = args.rows * 10
+    new_rows = n_rows // 20
+    print(f"\n=== Re-export refresh: {n_rows:,}-row export, last {new_rows:,} rows new ===")
+    write_synthetic_csv(BENCH_CSV, n_rows)
+    previous_csv = "bench_market_data_previous.csv"
+    with open(BENCH_CSV) as f:
+        lines = f.readlines()
+    with open(previous_csv, "w") as f:
+        f.writelines(lines[:len(lines) - new_rows])
+
+    try:
+        for label, kwargs in (("row path", {}), ("row path, incremental", {"incremental": True}),
+                              ("bulk", {"bulk": True}), ("bulk, incremental", {"bulk": True, "incremental": True})):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            ingest_csv(previous_csv, "MNQ", "1m", db_path=BENCH_DB, bulk=True)
+            stats, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB, **kwargs)
+            report(label, seconds, n_rows)
+            print(f"  {'':<40} {stats['inserted']:,} inserted, {stats['skipped']:,} skipped")
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV, previous_csv)
+
+
+def dict_reader_chunks(reader, chunk_size: int):
+    """Yield lists of up to chunk_size csv.DictReader rows."""
+    chunk = []
+    for row in reader:
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def read_workload(kind: str, path: str) -> tuple:
+    """
+    Run one CSV reading workload over path; returns (seconds, peak RSS in
+    MB). Meant to run in a fresh process so the peak RSS is its own.
+    """
+    start = time.perf_counter()
+    if kind == "DictReader chunks":
+        # The reader bulk ingest used before the mmap reader
+        with open(path) as f:
+            for rows in dict_reader_chunks(csv.DictReader(f), BULK_CHUNK_SIZE):
+                pass
+    elif kind == "mmap tuple chunks":
+        for fieldnames, rows in market_archivist._iter_csv_chunks(path, BULK_CHUNK_SIZE):
+            pass
+    else:
+        cleanup(BENCH_DB)
+        init_database(BENCH_DB)
+        ingest_csv(path, "MNQ", "1m", db_path=BENCH_DB, bulk=True, raw_storage=kind.split("=")[1])
+    seconds = time.perf_counter() - start
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return seconds, peak / (1 << 20 if sys.platform == "darwin" else 1 << 10)
+
+
+def bench_reader(args):
+    """CSV reading throughput and peak RSS: csv.DictReader vs the mmap chunk reader, by file size."""
+    print(f"\n=== Streaming CSV reader (chunks of {BULK_CHUNK_SIZE:,} rows, fresh process per run) ===")
+    spawn = multiprocessing.get_context("spawn")
+
+    try:
+        for n_rows in (args.rows * 10, args.rows * 40):
+            write_synthetic_csv(BENCH_CSV, n_rows)
+            megabytes = os.path.getsize(BENCH_CSV) / 1e6
+            print(f"  {n_rows:,} rows, {megabytes:.0f} MB:")
+            for kind in ("DictReader chunks", "mmap tuple chunks", "ingest_csv bulk, raw_storage=off",
+                         "ingest_csv bulk, raw_storage=inline"):
+                with ProcessPoolExecutor(max_workers=1, mp_context=spawn) as executor:
+                    seconds, peak_mb = executor.submit(read_workload, kind, BENCH_CSV).result()
+                print(f"    {kind:<38} {megabytes / seconds:8.1f} MB/s   peak RSS {peak_mb:7.1f} MB")
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV)
+
+
+def bench_compressed(args):
+    """Ingest of a compressed export: streamed decompression vs decompress-to-disk first."""
+    n_rows = args.rows * 10
+    print(f"\n=== Compressed input ({n_rows:,} rows, bulk ingest, raw_storage=off) ===")
+    write_synthetic_csv(BENCH_CSV, n_rows)
+    megabytes = os.path.getsize(BENCH_CSV) / 1e6
+    openers = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+
+    def ingest(path):
+        cleanup(BENCH_DB)
+        init_database(BENCH_DB)
+        ingest_csv(path, "MNQ", "1m", db_path=BENCH_DB, bulk=True, raw_storage="off")
+
+    def decompress_then_ingest(path, opener):
+        with opener(path, "rb") as src, open(BENCH_CSV + ".tmp", "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        ingest(BENCH_CSV + ".tmp")
+        os.remove(BENCH_CSV + ".tmp")
+
+    try:
+        _, seconds = timed(ingest, BENCH_CSV)
+        print(f"  plain CSV ({megabytes:.0f} MB)")
+        report("  ingest", seconds, n_rows)
+        for suffix, opener in openers.items():
+            path = BENCH_CSV + suffix
+            with open(BENCH_CSV, "rb") as src, opener(path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            print(f"  {suffix} ({os.path.getsize(path) / 1e6:.1f} MB)")
+            _, seconds = timed(decompress_then_ingest, path, opener)
+            report("  decompress to disk, then ingest", seconds, n_rows)
+            _, seconds = timed(ingest, path)
+            report("  streamed ingest", seconds, n_rows)
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV, BENCH_CSV + ".tmp", *(BENCH_CSV + suffix for suffix in openers))
+
+
+def bench_indexes(args):
+    """Duplicate-check and query latency before and after the index migration."""
+    print(f"\n=== Bar indexes: unmigrated vs migrated ({args.bars:,} bars) ===")
+    calls = 200
+
+    try:
+        sessions, seconds = timed(build_synthetic_archive, BENCH_DB, args.bars, indexed=False)
+        print(f"  built unindexed archive in {seconds:.1f}s")
+
+        before = measure_lookups(BENCH_DB, sessions, calls)
+        _, seconds = timed(init_database, BENCH_DB)
+        print(f"  in-place migration took {seconds:.1f}s")
+        after = measure_lookups(BENCH_DB, sessions, calls)
+
+        for label in before:
+            n = calls if label.startswith("duplicate") else max(1, calls // 10)
+            report_latency(f"{label}, before", before[label], n)
+            report_latency(f"{label}, after", after[label], n)
+
+        # ingest_csv migrates on its own, so ingest is only timed with indexes;
+        # without them each row pays the duplicate-check latency above
+        write_synthetic_csv(BENCH_CSV, args.rows)
+        _, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB)
+        report("ingest_csv row path into archive", seconds, args.rows)
+        _, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB, bulk=True)
+        report("ingest_csv bulk re-ingest into archive", seconds, args.rows)
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV)
+
+
+def zoneinfo_trade_day(timestamp: int):
+    """Trade day resolution with a ZoneInfo conversion per check (the original approach)."""
+    if get_pt_datetime(timestamp).weekday() == 5:
+        raise ValueError("Saturday")
+    if get_pt_datetime(timestamp).hour == 14:
+        return None
+    dt = get_pt_datetime(timestamp)
+    if dt.hour >= 15:
+        return (dt.date() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    return dt.date().strftime("%Y-%m-%d")
+
+
+def bench_calendar(args):
+    """Trade-day resolution: per-bar ZoneInfo vs cached calendar vs batch."""
+    print(f"\n=== Trade-day resolution ({args.rows:,} timestamps) ===")
+    timestamps = [int(dt.timestamp()) for dt in synthetic_timestamps(args.rows)]
+
+    _, seconds = timed(lambda: [zoneinfo_trade_day(ts) for ts in timestamps])
+    report("ZoneInfo per check", seconds, args.rows)
+    _, seconds = timed(lambda: [resolve_trade_day(ts) for ts in timestamps])
+    report("resolve_trade_day (cached calendar)", seconds, args.rows)
+    _, seconds = timed(resolve_trade_days, timestamps)
+    report("resolve_trade_days (batch)", seconds, args.rows)
+
+
+def general_timestamp(time_str: str) -> int:
+    """Timestamp parsing through fromisoformat and a PT conversion (the original approach)."""
+    dt = datetime.datetime.fromisoformat(time_str)
+    return int(dt.astimezone(PT_TIMEZONE).timestamp())
+
+
+def bench_timestamps(args):
+    """Timestamp parsing on the sample TradingView export."""
+    with open(SAMPLE_CSV) as f:
+        sample = [line.split(",", 1)[0] for line in f.read().splitlines()[1:]]
+    times = (sample * (args.rows // len(sample) + 1))[:args.rows]
+    print(f"\n=== Timestamp parsing (sample export, {len(times):,} strings) ===")
+
+    _, seconds = timed(lambda: [general_timestamp(t) for t in times])
+    report("fromisoformat + astimezone", seconds, len(times))
+    _, seconds = timed(lambda: [parse_tradingview_timestamp(t) for t in times])
+    report("parse_tradingview_timestamp", seconds, len(times))
+    _, seconds = timed(parse_tradingview_timestamps, times)
+    report("parse_tradingview_timestamps (batch)", seconds, len(times))
+
+
+def bench_many(args):
+    """Serial ingest_csv per file versus ingest_many with a process pool."""
+    workers = os.cpu_count() or 1
+    paths = [f"bench_market_data_{i}.csv" for i in range(args.files)]
+    print(f"\n=== Multi-file ingest ({args.files} files x {args.rows:,} rows, "
+          f"{workers} CPUs) ===")
+    write_synthetic_csv_files(paths, args.rows)
+    total = args.files * args.rows
+
+    try:
+        cleanup(BENCH_DB)
+        init_database(BENCH_DB)
+        _, seconds = timed(lambda: [ingest_csv(p, "MNQ", "1m", db_path=BENCH_DB, bulk=True) for p in paths])
+        report("ingest_csv(bulk=True) per file", seconds, total)
+
+        for n in sorted({1, 2, workers}):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            _, seconds = timed(ingest_many, paths, "MNQ", "1m", db_path=BENCH_DB, workers=n)
+            report(f"ingest_many(workers={n})", seconds, total)
+    finally:
+        cleanup(BENCH_DB, *paths)
+
+
+def bench_ledger(args):
+    """Re-running a backfill of already ingested files: ingest_files ledger vs force=True."""
+    paths = [f"bench_market_data_{i}.csv" for i in range(args.files)]
+    print(f"\n=== Backfill re-run ({args.files} files x {args.rows:,} rows) ===")
+    write_synthetic_csv_files(paths, args.rows)
+    total = args.files * args.rows
+
+    try:
+        cleanup(BENCH_DB)
+        init_database(BENCH_DB)
+        ingest_many(paths, "MNQ", "1m", db_path=BENCH_DB, workers=1)
+        for label, force in (("force=True, rows re-verified", True), ("ledger hit, hash only", False)):
+            _, seconds = timed(lambda: [ingest_csv(p, "MNQ", "1m", db_path=BENCH_DB, bulk=True, force=force)
+                                        for p in paths])
+            report(f"ingest_csv, {label}", seconds, total)
+            _, seconds = timed(ingest_many, paths, "MNQ", "1m", db_path=BENCH_DB, workers=1, force=force)
+            report(f"ingest_many, {label}", seconds, total)
+    finally:
+        cleanup(BENCH_DB, *paths)
+
+
+def bench_raw_storage(args):
+    """Database size, ingest time and range-scan latency per raw_json policy."""
+    print(f"\n=== raw_json storage policies ({args.rows:,} bars) ===")
+    write_synthetic_csv(BENCH_CSV, args.rows)
+
+    try:
+        for raw_storage in ("inline", "compressed", "side", "off"):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            _, ingest_seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB,
+                                      bulk=True, raw_storage=raw_storage)
+            size_mb = os.path.getsize(BENCH_DB) / 1e6
+            _, lean_seconds = timed(get_bars, "MNQ", db_path=BENCH_DB)
+            _, raw_seconds = timed(get_bars, "MNQ", db_path=BENCH_DB, with_raw=True)
+            print(f"  {raw_storage:<11} {size_mb:8.1f} MB   ingest {ingest_seconds:7.3f}s   "
+                  f"get_bars {lean_seconds:7.3f}s   with_raw {raw_seconds:7.3f}s")
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV)
+
+
+def bench_archive(args):
+    """Repeated small queries: connect-per-call module functions vs a persistent Archive."""
+    n_bars = min(args.bars, 200_000)
+    calls = 2000
+    print(f"\n=== Small queries: module functions vs Archive ({n_bars:,} bars, {calls} calls) ===")
+
+    try:
+        sessions = build_synthetic_archive(BENCH_DB, n_bars)
+        init_database(BENCH_DB)
+        conn = sqlite3.connect(BENCH_DB)
+        dates = dict(conn.execute("SELECT id, session_date FROM trade_days").fetchall())
+        conn.close()
+        rng = random.Random(42)
+        picks = [dates[rng.choice(sessions)[0]] for _ in range(calls)]
+
+        def module_calls(method, **kwargs):
+            for session_date in picks:
+                method("MNQ", session_date, db_path=BENCH_DB, **kwargs)
+
+        def archive_calls(archive, method, **kwargs):
+            for session_date in picks:
+                getattr(archive, method)("MNQ", session_date, **kwargs)
+
+        _, seconds = timed(module_calls, get_trade_day)
+        report_latency("get_trade_day, module function", seconds, calls)
+        _, seconds = timed(module_calls, get_bars, include_halt=True)
+        report_latency("get_bars (session), module function", seconds, calls)
+
+        no_pragmas = {name: None for name in ARCHIVE_PRAGMAS}
+        for label, pragmas in (("Archive", None), ("Archive, no pragmas", no_pragmas)):
+            with Archive(BENCH_DB, pragmas=pragmas) as archive:
+                archive.get_trade_day("MNQ", picks[0])  # open the connection outside the timing
+                _, seconds = timed(archive_calls, archive, "get_trade_day")
+                report_latency(f"get_trade_day, {label}", seconds, calls)
+                _, seconds = timed(archive_calls, archive, "get_bars", include_halt=True)
+                report_latency(f"get_bars (session), {label}", seconds, calls)
+    finally:
+        cleanup(BENCH_DB)
+
+
+def bench_wal_readers(args):
+    """get_bars latency from a reader thread while a multi-file ingest runs."""
+    paths = [f"bench_market_data_{i}.csv" for i in range(args.files + 1)]
+    print(f"\n=== Reader latency during ingest ({args.files} files x {args.rows:,} rows) ===")
+    write_synthetic_csv_files(paths, args.rows)
+    commit_every = max(1, args.rows // 10)
+
+    def run(pragmas, commit_every):
+        cleanup(BENCH_DB)
+        latencies = []
+        errors = []
+        done = threading.Event()
+        with Archive(BENCH_DB, pragmas=pragmas) as writer:
+            writer.init_database()
+            # Seed one file so the reader has a session to query
+            writer.ingest_csv(paths[0], "MNQ", "1m", bulk=True)
+            session_date = writer.get_bars("MNQ")[0]["session_date"]
+
+            def reader():
+                with Archive(BENCH_DB, pragmas=pragmas) as archive:
+                    while not done.is_set():
+                        start = time.perf_counter()
+                        try:
+                            archive.get_bars("MNQ", session_date=session_date)
+                        except sqlite3.OperationalError as e:
+                            errors.append(e)
+                        latencies.append(time.perf_counter() - start)
+
+            thread = threading.Thread(target=reader)
+            thread.start()
+            _, seconds = timed(writer.ingest_many, paths[1:], "MNQ", "1m", workers=1, commit_every=commit_every)
+            done.set()
+            thread.join()
+            wal_path = BENCH_DB + "-wal"
+            wal_mb = os.path.getsize(wal_path) / 1e6 if os.path.exists(wal_path) else 0.0
+        return seconds, latencies, errors, wal_mb
+
+    configs = (
+        ("rollback journal, txn per file", {"journal_mode": "DELETE"}, None),
+        ("WAL, txn per file", None, None),
+        (f"WAL, commit_every={commit_every}", None, commit_every),
+    )
+    try:
+        for label, pragmas, every in configs:
+            seconds, latencies, errors, wal_mb = run(pragmas, every)
+            percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+            p50, p95, p99 = (percentiles[i] * 1000 for i in (49, 94, 98))
+            print(f"  {label:<32} ingest {seconds:6.2f}s   {len(latencies):5d} reads   "
+                  f"p50 {p50:7.2f}  p95 {p95:7.2f}  p99 {p99:7.2f}  max {max(latencies) * 1000:7.2f} ms   "
+                  f"{len(errors)} errors   WAL {wal_mb:.1f} MB")
+    finally:
+        cleanup(BENCH_DB, *paths)
+
+
+def traced(fn, *args, **kwargs):
+    """Run fn under tracemalloc and return (result, elapsed seconds, peak MB)."""
+    tracemalloc.start()
+    try:
+        result, seconds = timed(fn, *args, **kwargs)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, seconds, peak / 1e6
+
+
+def bench_iter_bars(args):
+    """Peak memory of get_bars versus streaming with iter_bars over the whole archive."""
+    print(f"\n=== Full-history scan: get_bars vs iter_bars ({args.bars:,} bars) ===")
+
+    def scan_list():
+        return sum(bar["close"] for bar in get_bars("MNQ", include_halt=True, db_path=BENCH_DB))
+
+    def scan_stream():
+        return sum(bar.close for bar in iter_bars("MNQ", include_halt=True, db_path=BENCH_DB))
+
+    def scan_sessions():
+        return sum(sum(bar.close for bar in bars)
+                   for _, bars in iter_bars("MNQ", include_halt=True, db_path=BENCH_DB, by_session=True))
+
+    try:
+        build_synthetic_archive(BENCH_DB, args.bars)
+        init_database(BENCH_DB)
+        for label, scan in (("get_bars (list of dicts)", scan_list),
+                            ("iter_bars (Bar tuples)", scan_stream),
+                            ("iter_bars(by_session=True)", scan_sessions)):
+            _, seconds, peak_mb = traced(scan)
+            print(f"  {label:<32} peak {peak_mb:9.1f} MB   {seconds:6.2f}s (under tracemalloc)")
+    finally:
+        cleanup(BENCH_DB)
+
+
+def bench_columnar(args):
+    """Pulling the whole archive into column arrays: get_bars + conversion vs get_bars_columnar."""
+    print(f"\n=== Columnar pull ({args.bars:,} bars) ===")
+
+    def dicts_to_arrays():
+        bars = get_bars("MNQ", include_halt=True, db_path=BENCH_DB)
+        columns = {"timestamp": array.array("q", [bar["timestamp"] for bar in bars])}
+        for name in ("open", "high", "low", "close", "volume"):
+            columns[name] = array.array("d", [bar[name] for bar in bars])
+        columns["halt_period"] = array.array("b", [bar["halt_period"] for bar in bars])
+        return columns
+
+    def columnar():
+        return get_bars_columnar("MNQ", include_halt=True, db_path=BENCH_DB)
+
+    pulls = [("get_bars + array conversion", dicts_to_arrays), ("get_bars_columnar", columnar)]
+    try:
+        import numpy  # noqa: F401
+        pulls.append(("get_bars_columnar + to_numpy", lambda: columnar().to_numpy()))
+    except ImportError:
+        print("  (NumPy not installed, skipping to_numpy)")
+
+    try:
+        build_synthetic_archive(BENCH_DB, args.bars)
+        init_database(BENCH_DB)
+        for label, pull in pulls:
+            _, seconds = timed(pull)
+            _, _, peak_mb = traced(pull)
+            report(label, seconds, args.bars)
+            print(f"  {'':<40} peak {peak_mb:9.1f} MB (tracemalloc)")
+    finally:
+        cleanup(BENCH_DB)
+
+
+def directory_size(path: str) -> int:
+    """Total size in bytes of the files under path."""
+    return sum(os.path.getsize(os.path.join(directory, name))
+               for directory, _, names in os.walk(path) for name in names)
+
+
+def bench_export(args):
+    """Exporting the whole archive: get_bars + JSON per session vs export_bars, then import_bars."""
+    export_dir = "bench_market_data_export"
+    import_db = "bench_market_data_import.db"
+    print(f"\n=== Bar export and import ({args.bars:,} bars) ===")
+
+    def dicts_to_json():
+        # The baseline: pull into dicts, re-serialize one file per session
+        shutil.rmtree(export_dir, ignore_errors=True)
+        os.makedirs(export_dir)
+        bars = get_bars("MNQ", db_path=BENCH_DB)
+        sessions = {}
+        for bar in bars:
+            sessions.setdefault(bar["session_date"], []).append(bar)
+        for session_date, session_bars in sessions.items():
+            with open(os.path.join(export_dir, f"{session_date}.json"), "w") as f:
+                json.dump(session_bars, f)
+
+    formats = ["columnar"]
+    try:
+        import pyarrow  # noqa: F401
+        formats.append("parquet")
+    except ImportError:
+        print("  (pyarrow not installed, skipping parquet)")
+
+    try:
+        build_synthetic_archive(BENCH_DB, args.bars)
+        init_database(BENCH_DB)
+        _, seconds = timed(dicts_to_json)
+        _, _, peak_mb = traced(dicts_to_json)
+        report("get_bars + JSON per session", seconds, args.bars)
+        print(f"  {'':<40} peak {peak_mb:9.1f} MB, {directory_size(export_dir) / 1e6:8.1f} MB on disk")
+        for format in formats:
+            shutil.rmtree(export_dir, ignore_errors=True)
+            _, seconds = timed(export_bars, "MNQ", export_dir, db_path=BENCH_DB, format=format)
+            _, _, peak_mb = traced(export_bars, "MNQ", export_dir, db_path=BENCH_DB, format=format)
+            report(f"export_bars, {format}", seconds, args.bars)
+            print(f"  {'':<40} peak {peak_mb:9.1f} MB, {directory_size(export_dir) / 1e6:8.1f} MB on disk")
+            cleanup(import_db)
+            init_database(import_db)
+            _, seconds = timed(import_bars, export_dir, db_path=import_db)
+            report(f"import_bars, {format}", seconds, args.bars)
+    finally:
+        cleanup(BENCH_DB, import_db)
+        shutil.rmtree(export_dir, ignore_errors=True)
+
+
+def resample_in_python(bars: list, seconds: int, session_opens: dict) -> list:
+    """Aggregate 1-minute get_bars output into buckets aligned to session opens."""
+    result = []
+    current = None
+    for bar in bars:
+        session_open = session_opens[bar["session_date"]]
+        start = session_open + (bar["timestamp"] - session_open) // seconds * seconds
+        if current is None or current["timestamp"] != start:
+            current = dict(bar, id=None, timestamp=start)
+            result.append(current)
+        else:
+            current["high"] = max(current["high"], bar["high"])
+            current["low"] = min(current["low"], bar["low"])
+            current["close"] = bar["close"]
+            current["volume"] += bar["volume"]
+    return result
+
+
+def bench_resample(args):
+    """get_bars(timeframe=...) resampling in SQL vs pulling 1-minute bars and aggregating in Python."""
+    print(f"\n=== Resampling ({args.bars:,} 1-minute bars) ===")
+
+    try:
+        build_synthetic_archive(BENCH_DB, args.bars)
+        init_database(BENCH_DB)
+        session_opens = dict(synthetic_sessions(args.bars))
+        minute_bars, seconds = timed(get_bars, "MNQ", db_path=BENCH_DB)
+        report("get_bars 1m (pull only)", seconds, args.bars)
+
+        for timeframe, tf_seconds in (("5m", 300), ("15m", 900), ("1h", 3600), ("1D", 86400)):
+            resampled, seconds = timed(get_bars, "MNQ", timeframe=timeframe, db_path=BENCH_DB)
+            report(f"get_bars(timeframe='{timeframe}') in SQL", seconds, args.bars)
+            _, seconds = timed(get_bars_columnar, "MNQ", timeframe=timeframe, db_path=BENCH_DB)
+            report(f"get_bars_columnar(timeframe='{timeframe}')", seconds, args.bars)
+            expected, seconds = timed(lambda: resample_in_python(get_bars("MNQ", db_path=BENCH_DB), tf_seconds, session_opens))
+            report("get_bars 1m + Python aggregation", seconds, args.bars)
+            assert resampled == expected, f"{timeframe} resampling mismatch"
+    finally:
+        cleanup(BENCH_DB)
+
+
+# The daily OHLC query from example_queries.sql
+DAILY_OHLC_SQL = """
+    SELECT
+        td.session_date,
+        MIN(b.timestamp) as session_start,
+        MAX(b.timestamp) as session_end,
+        (SELECT open FROM bars WHERE trade_day_id = td.id AND halt_period = 0 ORDER BY timestamp LIMIT 1) as session_open,
+        MAX(b.high) as session_high,
+        MIN(b.low) as session_low,
+        (SELECT close FROM bars WHERE trade_day_id = td.id AND halt_period = 0 ORDER BY timestamp DESC LIMIT 1) as session_close,
+        SUM(b.volume) as total_volume,
+        COUNT(b.id) as bar_count
+    FROM bars b
+    JOIN trade_days td ON b.trade_day_id = td.id
+    WHERE td.symbol = ?
+      AND b.halt_period = 0
+    GROUP BY td.session_date
+    ORDER BY td.session_date
+"""
+
+
+def bench_session_summary(args):
+    """Daily OHLC over the whole archive: aggregate query vs the session_summary table."""
+    print(f"\n=== Daily session stats ({args.bars:,} bars) ===")
+
+    def aggregate_query():
+        conn = sqlite3.connect(BENCH_DB)
+        rows = conn.execute(DAILY_OHLC_SQL, ("MNQ",)).fetchall()
+        conn.close()
+        return rows
+
+    try:
+        build_synthetic_archive(BENCH_DB, args.bars)
+        count, seconds = timed(rebuild_session_summaries, db_path=BENCH_DB)
+        print(f"  rebuild_session_summaries: {count:,} sessions in {seconds:.2f}s")
+
+        rows, seconds = timed(aggregate_query)
+        report_latency("example_queries.sql daily OHLC", seconds, 1)
+        summaries, seconds = timed(get_session_summaries, "MNQ", db_path=BENCH_DB)
+        report_latency("get_session_summaries", seconds, 1)
+        assert [(r[0], r[3], r[6]) for r in rows] == [(s["session_date"], s["open"], s["close"]) for s in summaries]
+
+        write_synthetic_csv(BENCH_CSV, args.rows)
+        for label, kwargs in (("row path", {}), ("bulk", {"bulk": True})):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            _, seconds = timed(ingest_csv, BENCH_CSV, "MNQ", "1m", db_path=BENCH_DB, **kwargs)
+            report(f"ingest_csv {label} (maintains summaries)", seconds, args.rows)
+    finally:
+        cleanup(BENCH_DB, BENCH_CSV)
+
+
+def bench_cache(args):
+    """Repeated get_bars calls on recent sessions, with and without the result cache."""
+    n_bars = min(args.bars, 200_000)
+    calls = 2000
+    print(f"\n=== get_bars cache: {calls} calls over the last 20 sessions ({n_bars:,} bars) ===")
+
+    try:
+        build_synthetic_archive(BENCH_DB, n_bars)
+        init_database(BENCH_DB)
+        conn = sqlite3.connect(BENCH_DB)
+        recent = [row[0] for row in conn.execute(
+            "SELECT session_date FROM trade_days ORDER BY session_date DESC LIMIT 20"
+        )]
+        conn.close()
+        rng = random.Random(42)
+        picks = [rng.choice(recent) for _ in range(calls)]
+
+        def workload(archive):
+            for session_date in picks:
+                archive.get_bars("MNQ", session_date=session_date)
+
+        for label, cache_bytes in (("no cache", 0), ("cache, 256 MB", 256 * 1024 * 1024),
+                                   ("cache, 5 sessions' worth", 5 * 1380 * 500)):
+            with Archive(BENCH_DB, cache_bytes=cache_bytes) as archive:
+                _, seconds = timed(workload, archive)
+                report_latency(f"get_bars, {label}", seconds, calls)
+                if archive.cache is not None:
+                    stats = archive.cache.stats()
+                    print(f"  {'':<40} {stats['hits']} hits, {stats['misses']} misses, "
+                          f"{stats['evictions']} evictions, {stats['bytes'] / 1e6:.1f} MB cached")
+    finally:
+        cleanup(BENCH_DB)
+
+
+def bench_bar_files(args):
+    """Range reads of a day, a week and a year: get_bars vs a memory-mapped bar file."""
+    bar_file_dir = "bench_market_data_bar_files"
+    print(f"\n=== Bar file range reads ({args.bars:,} bars) ===")
+
+    try:
+        shutil.rmtree(bar_file_dir, ignore_errors=True)
+        build_synthetic_archive(BENCH_DB, args.bars)
+        init_database(BENCH_DB)
+        conn = sqlite3.connect(BENCH_DB)
+        dates = [row[0] for row in conn.execute("SELECT session_date FROM trade_days ORDER BY session_date")]
+        conn.close()
+        rng = random.Random(42)
+
+        with Archive(BENCH_DB, bar_file_dir=bar_file_dir) as archive:
+            _, seconds = timed(archive.bar_file, "MNQ", "1m")
+            report("build bar file", seconds, args.bars)
+            bar_file = archive.bar_file("MNQ", "1m")
+            _, seconds = timed(archive.check_bar_file, "MNQ", "1m")
+            report("check_bar_file", seconds, args.bars)
+
+            for label, days, calls in (("day", 1, 200), ("week", 5, 50), ("year", 252, 5)):
+                if days > len(dates):
+                    break
+                ranges = []
+                for _ in range(calls):
+                    first = rng.randrange(len(dates) - days + 1)
+                    ranges.append((dates[first], dates[first + days - 1]))
+                print(f"  {label} ({days} sessions):")
+                _, seconds = timed(lambda: [archive.get_bars("MNQ", start_date=start, end_date=end)
+                                            for start, end in ranges])
+                report_latency("  get_bars", seconds, calls)
+                _, seconds = timed(lambda: [bar_file.bars(start, end) for start, end in ranges])
+                report_latency("  BarFile.bars (decoded tuples)", seconds, calls)
+                _, seconds = timed(lambda: [bar_file.session_view(start, end).release() for start, end in ranges])
+                report_latency("  BarFile.session_view (zero-copy)", seconds, calls)
+    finally:
+        cleanup(BENCH_DB)
+        shutil.rmtree(bar_file_dir, ignore_errors=True)
+
+
+ANNOTATION_TAGS = [f"tag{i:02d}" for i in range(50)]
+
+# Vocabulary for synthetic annotation text; the search benchmark looks for phrases of it
+ANNOTATION_WORDS = (
+    "open high low close gap fill range trend day failed breakout breakdown reversal "
+    "CPI FOMC NFP auction value area poor single prints excess balance rotation "
+    "overnight inventory short covering liquidation drive test retest level support "
+    "resistance VWAP volume news chop responsive initiative buyer seller"
+).split()
+
+
+def build_annotation_archive(db_path: str, n_annotations: int, symbol: str = "MNQ") -> list:
+    """
+    Fill a fresh database with n_annotations annotations spread over about
+    1,000 trade days, each with 1-4 tags from ANNOTATION_TAGS and 10-40
+    words of text from ANNOTATION_WORDS.
+
+    Returns the list of session dates.
+    """
+    cleanup(db_path)
+    init_database(db_path)
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    rng = random.Random(42)
+
+    trade_days = []
+    for session_date, _ in synthetic_sessions(1000 * BARS_PER_SESSION):
+        cursor.execute(
+            "INSERT INTO trade_days (symbol, session_date, source) VALUES (?, ?, 'tradingview')",
+            (symbol, session_date)
+        )
+        trade_days.append((cursor.lastrowid, session_date))
+
+    annotations, annotation_tags = [], []
+    for annotation_id in range(1, n_annotations + 1):
+        trade_day_id, _ = rng.choice(trade_days)
+        tags = rng.sample(ANNOTATION_TAGS, rng.randint(1, 4))
+        content = " ".join(rng.choices(ANNOTATION_WORDS, k=rng.randint(10, 40)))
+        annotations.append((annotation_id, trade_day_id, content, json.dumps(tags), annotation_id))
+        annotation_tags.extend((annotation_id, tag) for tag in tags)
+    cursor.executemany(
+        """INSERT INTO day_annotations (id, trade_day_id, annotation_type, content, tags, source, created_at)
+           VALUES (?, ?, 'observation', ?, ?, 'script', ?)""",
+        annotations
+    )
+    cursor.executemany("INSERT INTO annotation_tags (annotation_id, tag) VALUES (?, ?)", annotation_tags)
+    cursor.execute("INSERT INTO annotation_fts (annotation_fts) VALUES ('rebuild')")
+
+    conn.commit()
+    conn.close()
+    return [session_date for _, session_date in trade_days]
+
+
+def scan_tags_in_python(archive, symbol, start_date, end_date, tags, match) -> list:
+    """Tag filtering by parsing every annotation's JSON tags in Python (the original approach)."""
+    annotations = archive.get_day_annotations(symbol, start_date, end_date)
+    return [a for a in annotations if match(tag in a["tags"] for tag in tags)]
+
+
+async def measure_loop_lag(coroutines, interval: float = 0.005) -> tuple:
+    """
+    Run coroutines concurrently while a probe task sleeps interval seconds
+    in a loop; returns (elapsed seconds, probe overshoots in ms).
+    """
+    lags = []
+    done = asyncio.Event()
+
+    async def probe():
+        loop = asyncio.get_running_loop()
+        while not done.is_set():
+            start = loop.time()
+            await asyncio.sleep(interval)
+            lags.append((loop.time() - start - interval) * 1000)
+
+    probing = asyncio.create_task(probe())
+    start = time.perf_counter()
+    await asyncio.gather(*coroutines)
+    seconds = time.perf_counter() - start
+    done.set()
+    await probing
+    return seconds, lags
+
+
+def bench_async(args):
+    """500 concurrent query coroutines: blocking get_bars in the loop vs AsyncArchive reader pools."""
+    n_bars = min(args.bars, 200_000)
+    n_coroutines, queries_each = 500, 4
+    calls = n_coroutines * queries_each
+    print(f"\n=== asyncio queries: {n_coroutines} coroutines x {queries_each} get_bars ({n_bars:,} bars) ===")
+
+    try:
+        build_synthetic_archive(BENCH_DB, n_bars)
+        init_database(BENCH_DB)
+        conn = sqlite3.connect(BENCH_DB)
+        dates = [row[0] for row in conn.execute("SELECT session_date FROM trade_days")]
+        conn.close()
+        rng = random.Random(42)
+        picks = [[rng.choice(dates) for _ in range(queries_each)] for _ in range(n_coroutines)]
+
+        def show(label, seconds, lags):
+            lags = sorted(lags) or [0.0]
+            print(f"  {label:<40} {calls / seconds:9,.0f} queries/s   loop lag p50 {lags[len(lags) // 2]:7.2f} ms"
+                  f"   p99 {lags[int(len(lags) * 0.99)]:7.2f} ms   max {lags[-1]:8.2f} ms")
+
+        async def blocking():
+            with Archive(BENCH_DB) as archive:
+                async def client(session_dates):
+                    for session_date in session_dates:
+                        archive.get_bars("MNQ", session_date=session_date)
+                        await asyncio.sleep(0)
+                return await measure_loop_lag([client(dates) for dates in picks])
+
+        async def pooled(max_readers):
+            async with AsyncArchive(BENCH_DB, max_readers=max_readers) as archive:
+                async def client(session_dates):
+                    for session_date in session_dates:
+                        await archive.get_bars("MNQ", session_date=session_date)
+                return await measure_loop_lag([client(dates) for dates in picks])
+
+        show("get_bars called in the event loop", *asyncio.run(blocking()))
+        for max_readers in (1, 2, 4, 8):
+            show(f"AsyncArchive, {max_readers} reader thread(s)", *asyncio.run(pooled(max_readers)))
+    finally:
+        cleanup(BENCH_DB)
+
+
+def direct_client(db_path: str, session_dates: list) -> list:
+    """One analyst opening the database itself: get_bars per session; returns latencies in ms."""
+    latencies = []
+    with Archive(db_path) as archive:
+        for session_date in session_dates:
+            start = time.perf_counter()
+            archive.get_bars("MNQ", session_date=session_date)
+            latencies.append((time.perf_counter() - start) * 1000)
+    return latencies
+
+
+def http_client(port: int, paths: list, etags: dict) -> list:
+    """
+    One client on a keep-alive connection to an ArchiveServer, sending
+    etags[path] as If-None-Match where known; returns latencies in ms.
+    """
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=60)
+    latencies = []
+    for path in paths:
+        start = time.perf_counter()
+        conn.request("GET", path, headers={"If-None-Match": etags[path]} if path in etags else {})
+        response = conn.getresponse()
+        body = response.read()
+        if response.status == 200:
+            json.loads(body)
+        latencies.append((time.perf_counter() - start) * 1000)
+    conn.close()
+    return latencies
+
+
+def first_byte(port: int, path: str) -> tuple:
+    """Seconds to the first body byte and to the whole body of one request, and the body size."""
+    conn = http.client.HTTPConnection("127.0.0.1", port, timeout=600)
+    start = time.perf_counter()
+    conn.request("GET", path)
+    response = conn.getresponse()
+    response.read(1)
+    first = time.perf_counter() - start
+    size = 1 + len(response.read())
+    conn.close()
+    return first, time.perf_counter() - start, size
+
+
+def bench_server(args):
+    """Concurrent local clients: each opening the database vs ArchiveServer, then streaming a year of bars."""
+    n_bars = min(args.bars, 200_000)
+    n_clients, requests_each = 16, 50
+    calls = n_clients * requests_each
+    print(f"\n=== ArchiveServer: {n_clients} client processes x {requests_each} session queries "
+          f"over the last 20 sessions ({n_bars:,} bars) ===")
+
+    server = None
+    try:
+        build_synthetic_archive(BENCH_DB, n_bars)
+        init_database(BENCH_DB)
+        conn = sqlite3.connect(BENCH_DB)
+        dates = [row[0] for row in conn.execute("SELECT session_date FROM trade_days ORDER BY session_date")]
+        conn.close()
+        rng = random.Random(42)
+        picks = [[rng.choice(dates[-20:]) for _ in range(requests_each)] for _ in range(n_clients)]
+
+        def show(label, seconds, latencies):
+            latencies = sorted(latency for client in latencies for latency in client)
+            print(f"  {label:<40} {calls / seconds:9,.0f} queries/s   latency p50 "
+                  f"{latencies[len(latencies) // 2]:7.2f} ms   p99 {latencies[int(len(latencies) * 0.99)]:7.2f} ms")
+
+        def run_clients(fn, arguments):
+            with ProcessPoolExecutor(n_clients) as pool:
+                # Start the processes before timing
+                list(pool.map(abs, range(n_clients)))
+                start = time.perf_counter()
+                latencies = list(pool.map(fn, *zip(*arguments)))
+                return time.perf_counter() - start, latencies
+
+        show("each client opens the database", *run_clients(
+            direct_client, [(BENCH_DB, session_dates) for session_dates in picks]
+        ))
+
+        server = ArchiveServer(BENCH_DB, port=0, workers=n_clients)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        port = server.server_address[1]
+        paths = [[f"/bars?symbol=MNQ&session_date={date}" for date in session_dates] for session_dates in picks]
+        show("ArchiveServer, json", *run_clients(http_client, [(port, p, {}) for p in paths]))
+        stats = server.cache.stats()
+        print(f"  {'':<40} response cache: {stats['hits']} hits, {stats['misses']} misses, "
+              f"{stats['bytes'] / 1e6:.1f} MB")
+        # Clients that kept the ETags of earlier answers
+        conn = http.client.HTTPConnection("127.0.0.1", port)
+        etags = {}
+        for path in {path for client_paths in paths for path in client_paths}:
+            conn.request("GET", path)
+            response = conn.getresponse()
+            response.read()
+            etags[path] = response.getheader("ETag")
+        conn.close()
+        show("ArchiveServer, json, If-None-Match", *run_clients(http_client, [(port, p, etags) for p in paths]))
+
+        everything = f"/bars?symbol=MNQ&start_date={dates[0]}&end_date={dates[-1]}"
+        print(f"  Whole archive in one request ({len(dates)} sessions), cold:")
+        for fmt in ("json", "ndjson", "columnar"):
+            server.cache.clear()
+            first, total, size = first_byte(port, f"{everything}&format={fmt}")
+            print(f"  {'  format=' + fmt:<40} first byte {first * 1000:8.1f} ms   complete {total:7.3f}s"
+                  f"   {size / 1e6:6.1f} MB")
+    finally:
+        if server is not None:
+            server.shutdown()
+            server.server_close()
+        cleanup(BENCH_DB)
+
+
+def bench_tags(args):
+    """get_day_annotations tag filters: JSON scan in Python vs the annotation_tags index."""
+    n_annotations = args.annotations
+    calls = 5
+    print(f"\n=== Annotation tag filters: {n_annotations:,} annotations, {calls} calls each ===")
+
+    try:
+        dates = build_annotation_archive(BENCH_DB, n_annotations)
+        ranges = [("whole archive", dates[0], dates[-1]), ("one month", dates[500], dates[520])]
+        filters = [("any", ["tag07"], any), ("any", ["tag07", "tag31", "tag44"], any),
+                   ("all", ["tag07", "tag31"], all)]
+        with Archive(BENCH_DB) as archive:
+            for range_label, start_date, end_date in ranges:
+                for tag_mode, tags, match in filters:
+                    label = f"{range_label}, {tag_mode.upper()} {len(tags)} tag(s)"
+                    expected, scan_seconds = timed(
+                        lambda: [scan_tags_in_python(archive, "MNQ", start_date, end_date, tags, match)
+                                 for _ in range(calls)]
+                    )
+                    found, sql_seconds = timed(
+                        lambda: [archive.get_day_annotations("MNQ", start_date, end_date, tags=tags,
+                                                             tag_mode=tag_mode)
+                                 for _ in range(calls)]
+                    )
+                    assert found == expected
+                    print(f"  {label:<34} {len(found[0]):>6,} matches   "
+                          f"Python scan {scan_seconds / calls * 1000:8.2f} ms   "
+                          f"SQL {sql_seconds / calls * 1000:8.2f} ms   "
+                          f"({scan_seconds / sql_seconds:.1f}x)")
+    finally:
+        cleanup(BENCH_DB)
+
+
+def bench_search(args):
+    """Phrase search over annotation content: LIKE scan vs search_annotations (FTS5)."""
+    n_annotations = args.annotations
+    calls = 5
+    print(f"\n=== Annotation search: {n_annotations:,} annotations, {calls} calls each ===")
+
+    try:
+        build_annotation_archive(BENCH_DB, n_annotations)
+        with Archive(BENCH_DB) as archive:
+            conn = archive.connection()
+
+            def like_scan(phrase):
+                return conn.execute(
+                    """SELECT da.id FROM day_annotations da
+                       JOIN trade_days td ON da.trade_day_id = td.id
+                       WHERE td.symbol = 'MNQ' AND da.status = 'active' AND da.content LIKE ?
+                       ORDER BY td.session_date, da.created_at""",
+                    (f"%{phrase}%",)
+                ).fetchall()
+
+            for phrase in ("failed breakout", "FOMC liquidation", "poor single prints", "VWAP retest support"):
+                expected, like_seconds = timed(lambda: [like_scan(phrase) for _ in range(calls)])
+                found, fts_seconds = timed(
+                    lambda: [archive.search_annotations("MNQ", f'"{phrase}"') for _ in range(calls)]
+                )
+                assert len(found[0]) == len(expected[0])
+                label = f'"{phrase}"'
+                print(f"  {label:<24} {len(found[0]):>7,} hits   "
+                      f"LIKE {like_seconds / calls * 1000:8.2f} ms   "
+                      f"FTS5 {fts_seconds / calls * 1000:8.2f} ms   "
+                      f"({like_seconds / fts_seconds:.1f}x)")
+    finally:
+        cleanup(BENCH_DB)
+
+
+def generated_annotations(n_records: int, sessions: list, symbol: str = "MNQ") -> list:
+    """Machine-style annotation records (gap and range flags) cycling over sessions."""
+    rng = random.Random(42)
+    records = []
+    for i in range(n_records):
+        session_date = sessions[i % len(sessions)]
+        if i % 2:
+            content = f"Gap {'up' if rng.random() < 0.5 else 'down'} {rng.randint(1, 80)} points"
+            tags = ["gap", "auto"]
+        else:
+            content = f"Initial balance range {rng.randint(20, 200)} points"
+            tags = ["range", "auto"]
+        records.append({"symbol": symbol, "session_date": session_date, "content": content,
+                        "tags": tags, "source": "script"})
+    return records
+
+
+def bench_bulk_annotations(args):
+    """Saving generated annotations: save_day_annotation per note vs save_day_annotations_bulk."""
+    n_records = args.annotations // 10
+    print(f"\n=== Saving {n_records:,} generated annotations ===")
+    sessions = [session_date for session_date, _ in synthetic_sessions(2000 * BARS_PER_SESSION)]
+    records = generated_annotations(n_records, sessions)
+
+    def per_call_module():
+        for record in records:
+            save_day_annotation(db_path=BENCH_DB, **record)
+
+    def per_call_archive():
+        with Archive(BENCH_DB) as archive:
+            for record in records:
+                archive.save_day_annotation(**record)
+
+    try:
+        for label, fn in (("save_day_annotation (module function)", per_call_module),
+                          ("save_day_annotation (one Archive)", per_call_archive),
+                          ("save_day_annotations_bulk", lambda: save_day_annotations_bulk(records, BENCH_DB))):
+            cleanup(BENCH_DB)
+            init_database(BENCH_DB)
+            _, seconds = timed(fn)
+            report(label, seconds, n_records)
+    finally:
+        cleanup(BENCH_DB)
+
+
+BENCHMARKS = {
+    "ingest": bench_ingest,
+    "incremental": bench_incremental,
+    "indexes": bench_indexes,
+    "calendar": bench_calendar,
+    "timestamps": bench_timestamps,
+    "many": bench_many,
+    "ledger": bench_ledger,
+    "reader": bench_reader,
+    "compressed": bench_compressed,
+    "raw": bench_raw_storage,
+    "archive": bench_archive,
+    "wal": bench_wal_readers,
+    "iter": bench_iter_bars,
+    "columnar": bench_columnar,
+    "export": bench_export,
+    "resample": bench_resample,
+    "summary": bench_session_summary,
+    "cache": bench_cache,
+    "barfile": bench_bar_files,
+    "async": bench_async,
+    "server": bench_server,
+    "tags": bench_tags,
+    "search": bench_search,
+    "bulk": bench_bulk_annotations,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("benchmarks", nargs="*", metavar="NAME",
+                        help=f"benchmarks to run: {', '.join(BENCHMARKS)} (default: all)")
+    parser.add_argument("--rows", type=int, default=20_000,
+                        help="number of synthetic bars per CSV file (default: 20000)")
+    parser.add_argument("--files", type=int, default=8,
+                        help="number of CSV files for multi-file benchmarks (default: 8)")
+    parser.add_argument("--bars", type=int, default=1_000_000,
+                        help="number of bars in synthetic archives (default: 1000000)")
+    parser.add_argument("--annotations", type=int, default=100_000,
+                        help="number of annotations in synthetic archives (default: 100000)")
+    args = parser.parse_args()
+    unknown = [name for name in args.benchmarks if name not in BENCHMARKS]
+    if unknown:
+        parser.error(f"unknown benchmark(s): {', '.join(unknown)}")
+
+    for name in args.benchmarks or BENCHMARKS:
+        BENCHMARKS[name](args)
+
+
+if __name__ == "__main__":
+    main()
@@ -82,6 +82,25 @@ WHERE td.symbol = 'ES'
 GROUP BY td.session_date
 ORDER BY td.session_date;
 
+-- Same daily OHLC from the session_summary table (kept current by ingest,
+-- one row per trade day and timeframe; no bars are scanned)
+SELECT 
+    td.session_date,
+    s.first_timestamp as session_start,
+    s.last_timestamp as session_end,
+    s.open as session_open,
+    s.high as session_high,
+    s.low as session_low,
+    s.close as session_close,
+    s.volume as total_volume,
+    s.price_volume / s.volume as vwap,
+    s.bar_count
+FROM session_summary s
+JOIN trade_days td ON s.trade_day_id = td.id
+WHERE td.symbol = 'ES'
+  AND s.timeframe = 60
+ORDER BY td.session_date;
+
 -- Calculate daily range
 SELECT 
     td.session_date,
@@ -135,10 +154,38 @@ SELECT
     da.tags
 FROM trade_days td
 JOIN day_annotations da ON da.trade_day_id = td.id
-WHERE da.tags LIKE '%breakout%'
+JOIN annotation_tags at ON at.annotation_id = da.id
+WHERE at.tag = 'breakout'
   AND da.status = 'active'
 ORDER BY td.session_date;
 
+-- Full-text search: annotations mentioning the phrase "failed breakout", best match first
+SELECT 
+    td.session_date,
+    da.content,
+    annotation_fts.rank
+FROM annotation_fts
+JOIN day_annotations da ON da.id = annotation_fts.rowid
+JOIN trade_days td ON da.trade_day_id = td.id
+WHERE annotation_fts MATCH '"failed breakout"'
+  AND da.status = 'active'
+ORDER BY annotation_fts.rank;
+
+-- Annotations tagged with ALL of "breakout" and "momentum"
+SELECT 
+    td.session_date,
+    da.content,
+    da.tags
+FROM day_annotations da
+JOIN trade_days td ON da.trade_day_id = td.id
+WHERE da.id IN (
+    SELECT annotation_id FROM annotation_tags
+    WHERE tag IN ('breakout', 'momentum')
+    GROUP BY annotation_id
+    HAVING COUNT(*) = 2
+)
+ORDER BY td.session_date;
+
 -- Count annotations by type
 SELECT 
     annotation_type,
@@ -183,16 +230,17 @@ HAVING COUNT(*) > 0;
 -- HALT PERIOD ANALYSIS
 -- =============================================================================
 
--- Count halt period bars
+-- Count halt period bars per symbol (halt bars have no trade day)
 SELECT 
+    halt_symbol,
     COUNT(*) as halt_bars,
-    COUNT(DISTINCT trade_day_id) as days_with_halt_data
+    COUNT(DISTINCT date(timestamp, 'unixepoch')) as days_with_halt_data
 FROM bars
-WHERE halt_period = 1;
+WHERE halt_period = 1
+GROUP BY halt_symbol, halt_source;
 
--- Get halt period bars for a specific day
+-- Get a symbol's halt period bars
 SELECT 
-    td.session_date,
     b.timestamp,
     datetime(b.timestamp, 'unixepoch') as timestamp_readable,
     b.open,
@@ -201,8 +249,7 @@ SELECT
     b.close,
     b.volume
 FROM bars b
-LEFT JOIN trade_days td ON b.trade_day_id = td.id
-WHERE b.halt_period = 1
+WHERE b.halt_period = 1 AND b.halt_symbol = 'ES' AND b.halt_source = 'tradingview'
 ORDER BY b.timestamp;
 
 -- =============================================================================
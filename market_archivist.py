@@ -6,26 +6,253 @@ and store it in a SQLite database with trade day resolution and annotations.
 """
 
 import sqlite3
+import array
+import asyncio
+import bz2
 import csv
+import glob
+import gzip
+import hashlib
+import http.server
+import io
 import json
+import lzma
+import mmap
+import os
+import re
+import struct
+import sys
+import zlib
 import datetime
+from collections import OrderedDict, deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from functools import lru_cache, partial
+from itertools import groupby
+import threading
+import urllib.parse
 from zoneinfo import ZoneInfo
-from typing import Optional
+from typing import Iterator, Optional
 
 
 # Timezone constants
 PT_TIMEZONE = ZoneInfo("America/Los_Angeles")
 
+# Calendar arithmetic on epoch days
+SECONDS_PER_DAY = 86400
+EPOCH_ORDINAL = datetime.date(1970, 1, 1).toordinal()
+EPOCH_WEEKDAY = datetime.date(1970, 1, 1).weekday()  # 3 = Thursday
+
+# Pieces of the fixed-width TradingView timestamp "YYYY-MM-DDTHH:MM:SS±HH:MM"
+_CLOCK_PATTERN = re.compile(r"([01][0-9]|2[0-3]):([0-5][0-9]):([0-5][0-9])")
+_DATE_OFFSET_PATTERN = re.compile(r"[0-9]{4}-[0-9]{2}-[0-9]{2}[+-][0-9]{2}:[0-9]{2}")
+
+# Bar value columns, in storage order
+OHLCV_FIELDS = ("open", "high", "low", "close", "volume")
+
+# Timeframe strings: "30s", "1m", "15m", "1h"/"1H", "1d"/"1D", or a bare
+# number of minutes as in TradingView ("5", "60"). Spelled-out units
+# ("1min", "2hours") are matched case-insensitively; single letters are
+# case-sensitive, since TradingView's "1M" is a month.
+_TIMEFRAME_PATTERN = re.compile(r"([1-9][0-9]*) ?([A-Za-z]*)")
+_TIMEFRAME_UNITS = {
+    "": 60,
+    "s": 1, "sec": 1, "secs": 1, "second": 1, "seconds": 1,
+    "m": 60, "min": 60, "mins": 60, "minute": 60, "minutes": 60,
+    "h": 3600, "H": 3600, "hr": 3600, "hrs": 3600, "hour": 3600, "hours": 3600,
+    "d": SECONDS_PER_DAY, "D": SECONDS_PER_DAY, "day": SECONDS_PER_DAY, "days": SECONDS_PER_DAY,
+}
+# Weekly and monthly units, refused with their own message
+_LONG_TIMEFRAME_UNITS = {"W", "w", "wk", "week", "weeks", "M", "mo", "mon", "month", "months"}
+
+# Timeframe assumed for bars stored before timeframes were recorded, when
+# it cannot be inferred from bar spacing
+DEFAULT_TIMEFRAME_SECONDS = 60
+
+# Pragmas applied to every Archive connection
+ARCHIVE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "mmap_size": 256 * 1024 * 1024,
+    "cache_size": -64 * 1024,  # KiB, i.e. 64 MB
+    "temp_store": "MEMORY",
+    "wal_autocheckpoint": 1000,  # pages
+    "journal_size_limit": 64 * 1024 * 1024,  # bytes kept after a WAL reset
+}
+
+# Modes accepted by PRAGMA wal_checkpoint
+WAL_CHECKPOINT_MODES = ("PASSIVE", "FULL", "RESTART", "TRUNCATE")
+
+# Tag matching modes for get_day_annotations: annotations with any / all of the tags
+TAG_MODES = ("any", "all")
+
+# Fields of a save_day_annotations_bulk record, with their defaults
+# (symbol, session_date and content are required)
+ANNOTATION_RECORD_DEFAULTS = {
+    "annotation_type": "observation",
+    "tags": None,
+    "source": "manual",
+    "supersedes_id": None,
+    "supersedes_index": None,
+}
+
+# Rows per chunk for bulk ingestion
+BULK_CHUNK_SIZE = 50_000
+
+# Default window before the last stored bar that an incremental ingest
+# re-reads and verifies (catches a final bar that was still forming)
+INCREMENTAL_OVERLAP_SECONDS = 3600
+
+# Input file suffixes read as compressed streams (.zst needs the zstandard package)
+COMPRESSED_SUFFIXES = (".gz", ".bz2", ".xz", ".zst")
+
+# Files picked up from a directory input
+CSV_INPUT_SUFFIXES = tuple([".csv"] + [".csv" + suffix for suffix in COMPRESSED_SUFFIXES])
+
+# Bytes decoded at a time by the streaming CSV reader (_iter_csv_chunks)
+CSV_READ_BYTES = 1 << 20
+
+# Read size for hashing input files for the ingest_files ledger
+HASH_CHUNK_BYTES = 1 << 20
+
+# Rows per fetchmany call when streaming bars
+ITER_BATCH_SIZE = 10_000
+
+# File formats written by export_bars: "parquet" needs pyarrow; "columnar"
+# is the built-in format (see _write_columnar_file); "auto" picks parquet
+# when pyarrow is installed
+EXPORT_FORMATS = ("auto", "parquet", "columnar")
+EXPORT_SUFFIXES = {"parquet": ".parquet", "columnar": ".bars"}
+
+# Columns of an exported bar file and their array typecodes
+EXPORT_COLUMNS = (
+    ("timestamp", "q"),
+    ("open", "d"),
+    ("high", "d"),
+    ("low", "d"),
+    ("close", "d"),
+    ("volume", "d"),
+    ("halt_period", "b"),
+)
+
+# First bytes of a file in the built-in columnar format
+_COLUMNAR_MAGIC = b"MABARS1\n"
+
+# Bar file record (see BarFile): timestamp int64, open/high/low/close/volume
+# float64 and flags int64, little-endian; 56 bytes, so every field stays aligned
+BAR_RECORD = struct.Struct("<q5dq")
+BAR_FLAG_HALT = 1
+
+# Bar file header: magic, record count, highest bar id included, last
+# timestamp and timeframe, padded to 64 bytes
+_BAR_FILE_HEADER = struct.Struct("<8s4q24x")
+_BAR_FILE_MAGIC = b"MABARF1\n"
+_BAR_TIMESTAMP = struct.Struct("<q")
+
+# Bar record yielded by iter_bars: same fields as a get_bars dict, as a tuple.
+# raw_json is only filled in with with_raw=True.
+Bar = namedtuple(
+    "Bar",
+    ["id", "timestamp", "open", "high", "low", "close", "volume", "halt_period", "session_date", "raw_json"],
+    defaults=(None,)
+)
+
+# Payload formats of ArchiveServer /bars: one JSON array, one JSON object
+# per line, or columnar partitions per trade day (see read_columnar_stream)
+SERVER_BAR_FORMATS = ("json", "ndjson", "columnar")
+_SERVER_CONTENT_TYPES = {
+    "json": "application/json",
+    "ndjson": "application/x-ndjson",
+    "columnar": "application/octet-stream",
+}
+
+# How ingest stores each bar's raw_json:
+#   "inline"     - JSON text in bars.raw_json (default)
+#   "compressed" - deflate blob in bars.raw_json
+#   "side"       - JSON text in the bar_raw side table, keyed by bar id
+#   "off"        - not stored
+RAW_STORAGE_POLICIES = ("inline", "compressed", "side", "off")
+
+# Preset deflate dictionary for compressed raw_json: a typical record, so
+# repeated keys and timestamp text compress even in a ~250 byte value.
+# Changing it makes existing blobs unreadable; add a new format byte instead.
+_RAW_JSON_ZDICT = json.dumps({
+    "timestamp": 0, "open": 0.0, "high": 0.0, "low": 0.0, "close": 0.0, "volume": 0.0,
+    "source_row": {
+        "time": "2000-01-01T00:00:00-08:00", "open": "", "high": "", "low": "",
+        "close": "", "Volume": ""
+    }
+}).encode()
+_RAW_FORMAT_DEFLATE = 1
+# Raw deflate with a 1 KB window: records are tiny, and a small window
+# makes per-record compressor setup cheap
+_RAW_DEFLATE_WBITS = -10
+
 
 def get_pt_datetime(timestamp: int) -> datetime.datetime:
     """Convert Unix timestamp to PT datetime."""
     return datetime.datetime.fromtimestamp(timestamp, tz=PT_TIMEZONE)
 
 
+def _pt_utc_offset(timestamp: int) -> int:
+    """PT offset from UTC in seconds at a Unix timestamp, via ZoneInfo."""
+    return int(get_pt_datetime(timestamp).utcoffset().total_seconds())
+
+
+@lru_cache(maxsize=4096)
+def _pt_offsets_for_utc_day(utc_day: int) -> tuple:
+    """
+    Session calendar entry for one UTC day (days since the epoch).
+    
+    Returns:
+        (offset_before, transition, offset_after): the PT offset at the start
+        of the day, the epoch of a DST transition within the day (or None),
+        and the offset from that transition on.
+    """
+    start = utc_day * SECONDS_PER_DAY
+    end = start + SECONDS_PER_DAY
+    before = _pt_utc_offset(start)
+    after = _pt_utc_offset(end)
+    if before == after:
+        return (before, None, before)
+    
+    # Binary search for the first second with the new offset
+    low, high = start, end
+    while high - low > 1:
+        middle = (low + high) // 2
+        if _pt_utc_offset(middle) == before:
+            low = middle
+        else:
+            high = middle
+    return (before, high, after)
+
+
+def _pt_local_seconds(timestamp: int) -> int:
+    """PT wall-clock time of a Unix timestamp, as seconds since 1970-01-01 PT."""
+    before, transition, after = _pt_offsets_for_utc_day(timestamp // SECONDS_PER_DAY)
+    if transition is None or timestamp < transition:
+        return timestamp + before
+    return timestamp + after
+
+
+@lru_cache(maxsize=16384)
+def _pt_date_string(local_day: int) -> str:
+    """YYYY-MM-DD for a PT calendar day given as days since 1970-01-01."""
+    return datetime.date.fromordinal(EPOCH_ORDINAL + local_day).strftime("%Y-%m-%d")
+
+
+def _saturday_error(timestamp: int) -> ValueError:
+    """Build the error raised for a Saturday timestamp."""
+    dt = get_pt_datetime(timestamp)
+    return ValueError(
+        f"Saturday trading data is invalid per session calendar. "
+        f"Timestamp: {timestamp} ({dt})"
+    )
+
+
 def is_saturday(timestamp: int) -> bool:
     """Check if timestamp falls on Saturday in PT."""
-    dt = get_pt_datetime(timestamp)
-    return dt.weekday() == 5  # 5 = Saturday
+    local_day = _pt_local_seconds(timestamp) // SECONDS_PER_DAY
+    return (local_day + EPOCH_WEEKDAY) % 7 == 5  # 5 = Saturday
 
 
 def is_halt_period(timestamp: int) -> bool:
@@ -34,8 +261,8 @@ def is_halt_period(timestamp: int) -> bool:
     
     Returns True if hour is 14 (2 PM) or any time before 3 PM within that hour.
     """
-    dt = get_pt_datetime(timestamp)
-    return dt.hour == 14  # 14:00 - 14:59 is the halt period
+    hour = _pt_local_seconds(timestamp) % SECONDS_PER_DAY // 3600
+    return hour == 14  # 14:00 - 14:59 is the halt period
 
 
 def resolve_trade_day(timestamp: int) -> Optional[str]:
@@ -55,83 +282,431 @@ def resolve_trade_day(timestamp: int) -> Optional[str]:
         - Sunday 2024-01-07 3:00 PM PT → "2024-01-08"
         - Monday 2024-01-08 1:00 PM PT → "2024-01-08"
         - Monday 2024-01-08 2:30 PM PT → None (halt)
+    
+    PT wall-clock time comes from the cached session calendar
+    (_pt_offsets_for_utc_day) rather than a ZoneInfo conversion per call.
     """
-    if is_saturday(timestamp):
-        dt = get_pt_datetime(timestamp)
-        raise ValueError(
-            f"Saturday trading data is invalid per session calendar. "
-            f"Timestamp: {timestamp} ({dt})"
-        )
+    local_day, second = divmod(_pt_local_seconds(timestamp), SECONDS_PER_DAY)
     
-    if is_halt_period(timestamp):
-        return None
+    if (local_day + EPOCH_WEEKDAY) % 7 == 5:
+        raise _saturday_error(timestamp)
     
-    dt = get_pt_datetime(timestamp)
+    hour = second // 3600
+    if hour == 14:
+        return None
     
     # If >= 15:00 (3 PM), assign to next calendar day
-    if dt.hour >= 15:
-        next_day = dt.date() + datetime.timedelta(days=1)
-        return next_day.strftime("%Y-%m-%d")
+    if hour >= 15:
+        return _pt_date_string(local_day + 1)
     else:
         # < 14:00 (2 PM), assign to current calendar day
-        return dt.date().strftime("%Y-%m-%d")
+        return _pt_date_string(local_day)
 
 
-def init_database(db_path: str = "market_data.db") -> None:
+def resolve_trade_days(timestamps: list[int]) -> tuple[list[Optional[str]], list[bool]]:
     """
-    Creates the database and tables if they don't exist.
-    Safe to call repeatedly (idempotent).
+    Batch version of resolve_trade_day.
+    
+    Returns:
+        (session_dates, halt_flags): one entry per timestamp; session_dates
+        holds None for halt-period timestamps.
+    
+    Raises ValueError for the first Saturday timestamp, like resolve_trade_day.
+    """
+    session_dates = []
+    halt_flags = []
+    
+    # Bars arrive in time order, so consecutive timestamps share a UTC day
+    current_day = None
+    before = transition = after = 0
+    
+    for timestamp in timestamps:
+        utc_day = timestamp // SECONDS_PER_DAY
+        if utc_day != current_day:
+            current_day = utc_day
+            before, transition, after = _pt_offsets_for_utc_day(utc_day)
+        
+        if transition is None or timestamp < transition:
+            local = timestamp + before
+        else:
+            local = timestamp + after
+        local_day, second = divmod(local, SECONDS_PER_DAY)
+        
+        if (local_day + EPOCH_WEEKDAY) % 7 == 5:
+            raise _saturday_error(timestamp)
+        
+        hour = second // 3600
+        if hour == 14:
+            session_dates.append(None)
+            halt_flags.append(True)
+        else:
+            session_dates.append(_pt_date_string(local_day + 1 if hour >= 15 else local_day))
+            halt_flags.append(False)
+    
+    return session_dates, halt_flags
+
+
+@lru_cache(maxsize=16384)
+def _session_open_timestamp(session_date: str) -> int:
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    Unix timestamp at which a trade day's session opens: 3:00 PM PT on the
+    previous calendar day (Sunday for Monday's session).
+    """
+    day = datetime.date.fromisoformat(session_date) - datetime.timedelta(days=1)
+    return int(datetime.datetime(day.year, day.month, day.day, 15, tzinfo=PT_TIMEZONE).timestamp())
+
+
+def _migration_1_bar_indexes(cursor: sqlite3.Cursor) -> None:
+    """Index bar lookups and make bar keys unique."""
+    # Session bars are unique per trade day and timestamp
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bars_trade_day_timestamp "
+        "ON bars(trade_day_id, timestamp)"
+    )
+    # Halt bars have no trade day, so they are unique per timestamp
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bars_halt_timestamp "
+        "ON bars(timestamp) WHERE halt_period = 1"
+    )
+    # Symbol/source lookups over a range of session dates
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_trade_days_symbol_source_date "
+        "ON trade_days(symbol, source, session_date)"
+    )
+
+
+def _migration_2_bar_raw(cursor: sqlite3.Cursor) -> None:
+    """Side table for raw_json stored with the "side" policy."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS bar_raw (
+            bar_id INTEGER PRIMARY KEY,
+            raw_json TEXT,
+            FOREIGN KEY(bar_id) REFERENCES bars(id)
+        )
+    """)
+
+
+def _migration_3_bar_timeframe(cursor: sqlite3.Cursor) -> None:
+    """Store each bar's timeframe (in seconds) and make it part of the bar key."""
+    cursor.execute("PRAGMA table_info(bars)")
+    if "timeframe" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE bars ADD COLUMN timeframe INTEGER")
     
-    # Create trade_days table
+    # Existing bars were stored without a timeframe: infer it per trade day
+    # (halt bars count as one group) from the smallest gap between bars
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS trade_days (
-            id INTEGER PRIMARY KEY,
-            symbol TEXT,
-            session_date TEXT,
-            source TEXT,
-            UNIQUE(symbol, session_date, source)
+        SELECT trade_day_id, MIN(timestamp - previous)
+        FROM (
+            SELECT trade_day_id, timestamp,
+                   LAG(timestamp) OVER (PARTITION BY trade_day_id ORDER BY timestamp) AS previous
+            FROM bars
+            WHERE timeframe IS NULL
         )
+        WHERE timestamp > previous
+        GROUP BY trade_day_id
     """)
+    inferred = [(gap, trade_day_id) for trade_day_id, gap in cursor.fetchall()]
+    cursor.executemany(
+        "UPDATE bars SET timeframe = ? WHERE trade_day_id IS ? AND timeframe IS NULL",
+        inferred
+    )
+    cursor.execute(
+        "UPDATE bars SET timeframe = ? WHERE timeframe IS NULL",
+        (DEFAULT_TIMEFRAME_SECONDS,)
+    )
     
-    # Create bars table
+    cursor.execute("DROP INDEX IF EXISTS idx_bars_trade_day_timestamp")
+    cursor.execute("DROP INDEX IF EXISTS idx_bars_halt_timestamp")
+    # Session bars are unique per trade day, timeframe and timestamp
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bars_trade_day_timeframe_timestamp "
+        "ON bars(trade_day_id, timeframe, timestamp)"
+    )
+    # Halt bars have no trade day, so they are unique per timeframe and timestamp
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bars_halt_timeframe_timestamp "
+        "ON bars(timeframe, timestamp) WHERE halt_period = 1"
+    )
+
+
+def _migration_4_session_summary(cursor: sqlite3.Cursor) -> None:
+    """Per trade day and timeframe session aggregates, kept current by ingest."""
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS bars (
-            id INTEGER PRIMARY KEY,
+        CREATE TABLE IF NOT EXISTS session_summary (
             trade_day_id INTEGER,
-            timestamp INTEGER,
+            timeframe INTEGER,
             open REAL,
             high REAL,
             low REAL,
             close REAL,
             volume REAL,
-            halt_period INTEGER,
-            raw_json TEXT,
+            price_volume REAL,        -- sum of typical price * volume, for VWAP
+            bar_count INTEGER,
+            first_timestamp INTEGER,
+            last_timestamp INTEGER,
+            PRIMARY KEY(trade_day_id, timeframe),
             FOREIGN KEY(trade_day_id) REFERENCES trade_days(id)
         )
     """)
-    
-    # Create day_annotations table
+    _rebuild_session_summaries(cursor)
+
+
+def _migration_5_trade_day_generation(cursor: sqlite3.Cursor) -> None:
+    """Per trade day counter, bumped whenever ingest inserts bars into it."""
+    cursor.execute("PRAGMA table_info(trade_days)")
+    if "generation" not in {row[1] for row in cursor.fetchall()}:
+        cursor.execute("ALTER TABLE trade_days ADD COLUMN generation INTEGER NOT NULL DEFAULT 0")
+
+
+def _migration_6_annotation_tags(cursor: sqlite3.Cursor) -> None:
+    """Normalized, indexed annotation tags, backfilled from the JSON tags column."""
+    cursor.execute("""
+        CREATE TABLE IF NOT EXISTS annotation_tags (
+            annotation_id INTEGER,
+            tag TEXT,
+            PRIMARY KEY(annotation_id, tag),
+            FOREIGN KEY(annotation_id) REFERENCES day_annotations(id)
+        )
+    """)
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_annotation_tags_tag "
+        "ON annotation_tags(tag, annotation_id)"
+    )
+    # Date range queries start from trade days
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS idx_day_annotations_trade_day "
+        "ON day_annotations(trade_day_id, created_at)"
+    )
+    cursor.execute("""
+        INSERT OR IGNORE INTO annotation_tags (annotation_id, tag)
+        SELECT da.id, t.value
+        FROM day_annotations da, json_each(da.tags) t
+        WHERE json_valid(da.tags) AND json_type(da.tags) = 'array' AND t.type = 'text'
+    """)
+
+
+def _migration_7_annotation_fts(cursor: sqlite3.Cursor) -> None:
+    """Full-text index over annotation content, built from existing annotations."""
+    # External content table: the text lives only in day_annotations, and
+    # annotation_fts rowids are day_annotations ids
+    cursor.execute("""
+        CREATE VIRTUAL TABLE IF NOT EXISTS annotation_fts USING fts5(
+            content,
+            content='day_annotations',
+            content_rowid='id'
+        )
+    """)
+    cursor.execute("INSERT INTO annotation_fts (annotation_fts) VALUES ('rebuild')")
+
+
+def _migration_8_ingest_files(cursor: sqlite3.Cursor) -> None:
+    """Ledger of ingested files, keyed by content hash, symbol, source and timeframe."""
     cursor.execute("""
-        CREATE TABLE IF NOT EXISTS day_annotations (
+        CREATE TABLE IF NOT EXISTS ingest_files (
             id INTEGER PRIMARY KEY,
-            trade_day_id INTEGER,
-            annotation_type TEXT,
-            content TEXT,
-            tags TEXT,
+            path TEXT,
+            size INTEGER,
+            mtime REAL,
+            content_hash TEXT,
+            symbol TEXT,
             source TEXT,
-            created_at INTEGER,
-            supersedes_id INTEGER,
-            status TEXT DEFAULT 'active',
-            FOREIGN KEY(trade_day_id) REFERENCES trade_days(id),
-            FOREIGN KEY(supersedes_id) REFERENCES day_annotations(id)
+            timeframe INTEGER,
+            stats TEXT,
+            ingested_at INTEGER,
+            UNIQUE(content_hash, symbol, source, timeframe)
         )
     """)
+
+
+def _migration_9_halt_bar_keys(cursor: sqlite3.Cursor) -> None:
+    """Key halt bars by symbol and source instead of timestamp alone."""
+    cursor.execute("PRAGMA table_info(bars)")
+    columns = {row[1] for row in cursor.fetchall()}
+    if "halt_symbol" not in columns:
+        cursor.execute("ALTER TABLE bars ADD COLUMN halt_symbol TEXT")
+    if "halt_source" not in columns:
+        cursor.execute("ALTER TABLE bars ADD COLUMN halt_source TEXT")
+    
+    # Existing halt bars were stored without a symbol. Take it from a
+    # session bar of the same timeframe adjoining the same halt: the last
+    # bar before 2 PM PT or the first at 3 PM PT. When those belong to
+    # different symbols, the one whose price continues the halt bar's wins.
+    # Halt bars with no such neighbour, or no clear winner, stay NULL
+    # unless the database holds a single symbol and source; an ingest
+    # claims the rest when it meets them again (see
+    # _adopt_unattributed_halt_bars).
+    cursor.execute(
+        "SELECT id, timestamp, timeframe, open FROM bars WHERE halt_period = 1 AND halt_symbol IS NULL"
+    )
+    halt_bars = cursor.fetchall()
+    trade_days = {}  # session_date -> [(trade_day_id, symbol, source), ...]
+    if halt_bars:
+        cursor.execute("SELECT id, symbol, source, session_date FROM trade_days")
+        for trade_day_id, symbol, source, date in cursor.fetchall():
+            trade_days.setdefault(date, []).append((trade_day_id, symbol, source))
+    neighbours = {}  # (halt start, timeframe) -> [(symbol, source, price), ...]
+    keys = []
+    for bar_id, timestamp, timeframe, open_ in halt_bars:
+        halt_start = timestamp - (_pt_local_seconds(timestamp) % SECONDS_PER_DAY - 14 * 3600)
+        window = (halt_start, timeframe)
+        if window not in neighbours:
+            neighbours[window] = []
+            for neighbour_timestamp, price_column in ((halt_start - timeframe, "close"), (halt_start + 3600, "open")):
+                for trade_day_id, symbol, source in trade_days.get(resolve_trade_day(neighbour_timestamp), ()):
+                    cursor.execute(
+                        f"SELECT {price_column} FROM bars "
+                        "WHERE trade_day_id = ? AND timeframe = ? AND timestamp = ? AND halt_period = 0",
+                        (trade_day_id, timeframe, neighbour_timestamp)
+                    )
+                    neighbours[window].extend((symbol, source, price) for (price,) in cursor.fetchall())
+        distances = {}
+        for symbol, source, price in neighbours[window]:
+            distance = abs(price - open_)
+            distances[symbol, source] = min(distance, distances.get((symbol, source), distance))
+        if not distances:
+            continue
+        nearest = min(distances.values())
+        winners = [key for key, distance in distances.items() if distance == nearest]
+        if len(winners) == 1:
+            keys.append((*winners[0], bar_id))
+    cursor.executemany("UPDATE bars SET halt_symbol = ?, halt_source = ? WHERE id = ?", keys)
+    cursor.execute("SELECT DISTINCT symbol, source FROM trade_days LIMIT 2")
+    owners = cursor.fetchall()
+    if len(owners) == 1:
+        cursor.execute(
+            "UPDATE bars SET halt_symbol = ?, halt_source = ? WHERE halt_period = 1 AND halt_symbol IS NULL",
+            owners[0]
+        )
+    
+    cursor.execute("DROP INDEX IF EXISTS idx_bars_halt_timeframe_timestamp")
+    # Halt bars have no trade day, so they are unique per symbol, source,
+    # timeframe and timestamp
+    cursor.execute(
+        "CREATE UNIQUE INDEX IF NOT EXISTS idx_bars_halt_key "
+        "ON bars(halt_symbol, halt_source, timeframe, timestamp) WHERE halt_period = 1"
+    )
+
+
+# Schema migrations, applied in order. The database's PRAGMA user_version
+# records how many have been applied.
+SCHEMA_MIGRATIONS = [
+    _migration_1_bar_indexes,
+    _migration_2_bar_raw,
+    _migration_3_bar_timeframe,
+    _migration_4_session_summary,
+    _migration_5_trade_day_generation,
+    _migration_6_annotation_tags,
+    _migration_7_annotation_fts,
+    _migration_8_ingest_files,
+    _migration_9_halt_bar_keys,
+]
+SCHEMA_VERSION = len(SCHEMA_MIGRATIONS)
+
+
+def _migrate_schema(cursor: sqlite3.Cursor) -> None:
+    """Apply any schema migrations the database has not seen yet."""
+    cursor.execute("PRAGMA user_version")
+    version = cursor.fetchone()[0]
+    
+    for number, migration in enumerate(SCHEMA_MIGRATIONS[version:], start=version + 1):
+        migration(cursor)
+        cursor.execute(f"PRAGMA user_version = {number}")
+
+
+def _rebuild_session_summaries(cursor: sqlite3.Cursor, trade_day_filter: str = "", params: tuple = ()) -> int:
+    """
+    Recompute session_summary rows from the bars table.
+    
+    trade_day_filter is an optional SQL condition on the trade_days alias td
+    restricting which trade days are rebuilt. Returns the number of rows written.
+    """
+    day_ids = f"SELECT td.id FROM trade_days td WHERE {trade_day_filter}" if trade_day_filter else None
+    if day_ids:
+        cursor.execute(f"DELETE FROM session_summary WHERE trade_day_id IN ({day_ids})", params)
+    else:
+        cursor.execute("DELETE FROM session_summary")
+    
+    cursor.execute(f"""
+        INSERT INTO session_summary
+            (trade_day_id, timeframe, open, high, low, close, volume, price_volume,
+             bar_count, first_timestamp, last_timestamp)
+        SELECT g.trade_day_id, g.timeframe, o.open, g.high, g.low, c.close, g.volume, g.price_volume,
+               g.bar_count, g.first_timestamp, g.last_timestamp
+        FROM (
+            SELECT
+                trade_day_id,
+                timeframe,
+                MIN(timestamp) AS first_timestamp,
+                MAX(timestamp) AS last_timestamp,
+                MAX(high) AS high,
+                MIN(low) AS low,
+                SUM(volume) AS volume,
+                SUM((high + low + close) / 3 * volume) AS price_volume,
+                COUNT(*) AS bar_count
+            FROM bars
+            WHERE halt_period = 0 AND trade_day_id {"IN (" + day_ids + ")" if day_ids else "IS NOT NULL"}
+            GROUP BY trade_day_id, timeframe
+        ) g
+        JOIN bars o ON o.trade_day_id = g.trade_day_id AND o.timeframe = g.timeframe
+                   AND o.timestamp = g.first_timestamp
+        JOIN bars c ON c.trade_day_id = g.trade_day_id AND c.timeframe = g.timeframe
+                   AND c.timestamp = g.last_timestamp
+    """, params)
+    return cursor.rowcount
+
+
+def _update_session_summaries(cursor: sqlite3.Cursor, timeframe: int, bars: list) -> None:
+    """
+    Fold newly inserted session bars into session_summary.
+    
+    bars holds (trade_day_id, timestamp, open, high, low, close, volume)
+    tuples; they are aggregated per trade day here and merged into the
+    stored rows with one upsert per trade day.
+    """
+    summaries = {}
+    for trade_day_id, timestamp, o, h, l, c, v in bars:
+        summary = summaries.get(trade_day_id)
+        if summary is None:
+            summaries[trade_day_id] = [o, h, l, c, v, (h + l + c) / 3 * v, 1, timestamp, timestamp]
+            continue
+        if timestamp < summary[7]:
+            summary[0], summary[7] = o, timestamp
+        if timestamp > summary[8]:
+            summary[3], summary[8] = c, timestamp
+        if h > summary[1]:
+            summary[1] = h
+        if l < summary[2]:
+            summary[2] = l
+        summary[4] += v
+        summary[5] += (h + l + c) / 3 * v
+        summary[6] += 1
     
-    conn.commit()
-    conn.close()
+    # SET expressions all see the stored row as it was before the update
+    cursor.executemany(
+        """INSERT INTO session_summary
+               (trade_day_id, timeframe, open, high, low, close, volume, price_volume,
+                bar_count, first_timestamp, last_timestamp)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT(trade_day_id, timeframe) DO UPDATE SET
+               open = CASE WHEN excluded.first_timestamp < first_timestamp THEN excluded.open ELSE open END,
+               close = CASE WHEN excluded.last_timestamp > last_timestamp THEN excluded.close ELSE close END,
+               high = MAX(high, excluded.high),
+               low = MIN(low, excluded.low),
+               volume = volume + excluded.volume,
+               price_volume = price_volume + excluded.price_volume,
+               bar_count = bar_count + excluded.bar_count,
+               first_timestamp = MIN(first_timestamp, excluded.first_timestamp),
+               last_timestamp = MAX(last_timestamp, excluded.last_timestamp)""",
+        [(trade_day_id, timeframe, *summary) for trade_day_id, summary in summaries.items()]
+    )
+
+
+def _bump_generations(cursor: sqlite3.Cursor, trade_day_ids) -> None:
+    """Mark trade days whose bars changed, invalidating cached queries over them."""
+    cursor.executemany(
+        "UPDATE trade_days SET generation = generation + 1 WHERE id = ?",
+        [(trade_day_id,) for trade_day_id in set(trade_day_ids)]
+    )
 
 
 def get_or_create_trade_day(
@@ -169,6 +744,57 @@ def get_or_create_trade_day(
     return trade_day_id
 
 
+@lru_cache(maxsize=131072)
+def _seconds_since_midnight(clock: str) -> Optional[int]:
+    """Seconds since midnight for "HH:MM:SS", or None if malformed."""
+    match = _CLOCK_PATTERN.fullmatch(clock)
+    if not match:
+        return None
+    return int(match[1]) * 3600 + int(match[2]) * 60 + int(match[3])
+
+
+@lru_cache(maxsize=16384)
+def _offset_midnight_epoch(date_and_offset: str) -> Optional[int]:
+    """
+    Epoch seconds of midnight for "YYYY-MM-DD±HH:MM" (the date at that
+    UTC offset), or None if malformed.
+    """
+    if not _DATE_OFFSET_PATTERN.fullmatch(date_and_offset):
+        return None
+    date_str, offset = date_and_offset[:10], date_and_offset[10:]
+    try:
+        dt = datetime.datetime.fromisoformat(f"{date_str}T00:00:00{offset}")
+    except ValueError:
+        return None
+    return int(dt.timestamp())
+
+
+def parse_timeframe(timeframe: str) -> int:
+    """
+    Parse a timeframe such as "1m", "15m", "4h" or "1D" into seconds.
+    
+    A bare number is minutes, as in TradingView exports ("5" is 5 minutes).
+    Spelled-out units are accepted too ("1min", "15 mins", "4hours").
+    Raises ValueError for anything else, for weekly and monthly
+    timeframes ("1W", "1M"), or for timeframes over one day.
+    """
+    match = _TIMEFRAME_PATTERN.fullmatch(str(timeframe).strip())
+    unit = match.group(2) if match else None
+    if unit is not None and len(unit) > 1:
+        unit = unit.lower()
+    if unit in _LONG_TIMEFRAME_UNITS:
+        raise ValueError(
+            f"Timeframe '{timeframe}' is weekly or monthly; bars are stored and resampled "
+            f"per trade day, so timeframes are at most one day ('1D')"
+        )
+    if unit not in _TIMEFRAME_UNITS:
+        raise ValueError(f"Invalid timeframe '{timeframe}'. Expected e.g. '1m', '15min', '1h' or '1D'")
+    seconds = int(match.group(1)) * _TIMEFRAME_UNITS[unit]
+    if seconds > SECONDS_PER_DAY:
+        raise ValueError(f"Timeframe '{timeframe}' is longer than one day")
+    return seconds
+
+
 def parse_tradingview_timestamp(time_str: str) -> int:
     """
     Parse TradingView timestamp string to Unix epoch seconds.
@@ -177,7 +803,17 @@ def parse_tradingview_timestamp(time_str: str) -> int:
     or "YYYY-MM-DD HH:MM:SS" (without timezone)
     
     Returns Unix timestamp in seconds.
+    
+    Strings with exactly the fixed-width export shape are split into a
+    date+offset part and a clock part, each converted once and cached;
+    anything else goes through full datetime parsing.
     """
+    if len(time_str) == 25 and time_str[10] == 'T':
+        seconds = _seconds_since_midnight(time_str[11:19])
+        midnight = _offset_midnight_epoch(time_str[:10] + time_str[19:])
+        if seconds is not None and midnight is not None:
+            return midnight + seconds
+    
     # Try ISO 8601 format first (with timezone)
     if 'T' in time_str:
         # Parse with timezone info
@@ -195,295 +831,3797 @@ def parse_tradingview_timestamp(time_str: str) -> int:
         return int(dt.timestamp())
 
 
-def ingest_csv(
-    file_path: str,
-    symbol: str,
-    timeframe: str,
-    source: str = "tradingview",
-    db_path: str = "market_data.db"
-) -> dict:
-    """
-    Ingests a CSV file of market data into the database.
+def parse_tradingview_timestamps(time_strs: list[str]) -> list[int]:
+    """Batch version of parse_tradingview_timestamp for a column of strings."""
+    result = []
+    append = result.append
+    seconds_since_midnight = _seconds_since_midnight
+    offset_midnight_epoch = _offset_midnight_epoch
     
-    Returns:
-        {
-            "inserted": N,
-            "skipped": M,
-            "conflicts": K,
-            "conflict_details": [...]
-        }
+    for time_str in time_strs:
+        if len(time_str) == 25 and time_str[10] == 'T':
+            seconds = seconds_since_midnight(time_str[11:19])
+            midnight = offset_midnight_epoch(time_str[:10] + time_str[19:])
+            if seconds is not None and midnight is not None:
+                append(midnight + seconds)
+                continue
+        append(parse_tradingview_timestamp(time_str))
+    
+    return result
+
+
+def _parse_csv_timestamp(row: dict, source: str) -> int:
+    """
+    Extract the bar timestamp from a CSV row as Unix epoch seconds.
     
-    Behavior:
-        - Reads CSV and validates structure
-        - For each bar, determine trade_day using assignment rules
-        - Check if bar already exists (trade_day_id, timestamp)
-        - If exact match: skip
-        - If conflict (different OHLCV): log warning and skip
-        - If new: insert
-        - Flag bars in halt period (2-3 PM PT) with halt_period=1
-        - Raise ValueError for Saturday data
+    TradingView rows use the "time" column; other sources use a "timestamp"
+    (or "time") column in "YYYY-MM-DD HH:MM:SS" format, assumed to be PT.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
+    if source == "tradingview":
+        return parse_tradingview_timestamp(row['time'])
     
-    stats = {
+    # For other sources, assume "timestamp" column in format "YYYY-MM-DD HH:MM:SS"
+    return _parse_plain_timestamp(row.get('timestamp', row.get('time')))
+
+
+def _parse_plain_timestamp(time_str: str) -> int:
+    """Parse a "YYYY-MM-DD HH:MM:SS" PT timestamp to Unix epoch seconds."""
+    dt = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
+    dt = dt.replace(tzinfo=PT_TIMEZONE)
+    return int(dt.timestamp())
+
+
+def _check_raw_storage(raw_storage: str) -> None:
+    """Raise ValueError for an unknown raw_json storage policy."""
+    if raw_storage not in RAW_STORAGE_POLICIES:
+        raise ValueError(
+            f"Unknown raw_storage '{raw_storage}'. "
+            f"Expected one of: {', '.join(RAW_STORAGE_POLICIES)}"
+        )
+
+
+def _check_commit_every(commit_every: Optional[int]) -> None:
+    """Raise ValueError unless commit_every is None or a positive row count."""
+    if commit_every is not None and commit_every < 1:
+        raise ValueError(f"commit_every must be a positive number of rows, got {commit_every}")
+
+
+def _encode_raw_json(raw_json: str, raw_storage: str):
+    """Encode raw_json text for storage under a raw_storage policy."""
+    if raw_storage == "compressed":
+        compressor = zlib.compressobj(9, zlib.DEFLATED, _RAW_DEFLATE_WBITS, 2, zdict=_RAW_JSON_ZDICT)
+        blob = compressor.compress(raw_json.encode()) + compressor.flush()
+        return bytes([_RAW_FORMAT_DEFLATE]) + blob
+    if raw_storage == "off":
+        return None
+    return raw_json
+
+
+def decode_raw_json(value) -> Optional[str]:
+    """
+    Decode a stored raw_json value (text, compressed blob or NULL) to JSON text.
+    """
+    if value is None or isinstance(value, str):
+        return value
+    if value[0] != _RAW_FORMAT_DEFLATE:
+        raise ValueError(f"Unknown raw_json storage format: {value[0]}")
+    decompressor = zlib.decompressobj(_RAW_DEFLATE_WBITS, zdict=_RAW_JSON_ZDICT)
+    return (decompressor.decompress(value[1:]) + decompressor.flush()).decode()
+
+
+def _store_side_raw_json(cursor: sqlite3.Cursor, bar_raws: list) -> None:
+    """Insert (bar_id, raw_json) pairs into the bar_raw side table."""
+    cursor.executemany(
+        "INSERT OR REPLACE INTO bar_raw (bar_id, raw_json) VALUES (?, ?)",
+        bar_raws
+    )
+
+
+def _new_ingest_stats() -> dict:
+    """Create an empty ingestion summary."""
+    return {
         "inserted": 0,
         "skipped": 0,
         "conflicts": 0,
         "conflict_details": []
     }
+
+
+def _ohlcv_matches(existing: tuple, new: tuple) -> bool:
+    """Check if two (open, high, low, close, volume) tuples are the same bar."""
+    return all(abs(old - value) < 0.001 for old, value in zip(existing, new))
+
+
+def _adopt_unattributed_halt_bars(
+    cursor: sqlite3.Cursor,
+    symbol: str,
+    source: str,
+    timeframe: int,
+    bars: list[tuple]
+) -> None:
+    """
+    Gives symbol and source to halt bars that migration 9 left without
+    them, where one matches a halt bar being ingested: same timeframe and
+    timestamp, and the same OHLCV as _ohlcv_matches compares them. The
+    ingest then finds it as an existing bar instead of storing a second
+    copy. bars holds (timestamp, open, high, low, close, volume) tuples.
+    """
+    if not bars:
+        return
+    cursor.execute("SELECT 1 FROM bars WHERE halt_period = 1 AND halt_symbol IS NULL LIMIT 1")
+    if cursor.fetchone() is None:
+        return
+    cursor.executemany(
+        """UPDATE bars SET halt_symbol = :symbol, halt_source = :source
+           WHERE id = (
+               SELECT MIN(id) FROM bars
+               WHERE halt_period = 1 AND halt_symbol IS NULL AND timeframe = :timeframe AND timestamp = :timestamp
+                 AND ABS(open - :open) < 0.001 AND ABS(high - :high) < 0.001 AND ABS(low - :low) < 0.001
+                 AND ABS(close - :close) < 0.001 AND ABS(volume - :volume) < 0.001
+           )
+           AND NOT EXISTS (
+               SELECT 1 FROM bars
+               WHERE halt_period = 1 AND halt_symbol = :symbol AND halt_source = :source
+                 AND timeframe = :timeframe AND timestamp = :timestamp
+           )""",
+        [
+            {"symbol": symbol, "source": source, "timeframe": timeframe, "timestamp": timestamp,
+             "open": o, "high": h, "low": l, "close": c, "volume": v}
+            for timestamp, o, h, l, c, v in bars
+        ]
+    )
+
+
+def _record_duplicate(
+    stats: dict,
+    timestamp: int,
+    existing: tuple,
+    new: tuple,
+    file_path: str
+) -> None:
+    """Count a bar that already exists as either skipped or a conflict."""
+    if _ohlcv_matches(existing, new):
+        # Exact match, skip
+        stats["skipped"] += 1
+        return
+    
+    # Conflict
+    stats["conflicts"] += 1
+    stats["conflict_details"].append({
+        "timestamp": timestamp,
+        "reason": "OHLCV mismatch",
+        "file": file_path,
+        "existing": dict(zip(OHLCV_FIELDS, existing)),
+        "new": dict(zip(OHLCV_FIELDS, new))
+    })
+
+
+def _normalize_rows(
+    rows: list[tuple],
+    fieldnames: list[str],
+    source: str,
+    file_path: str,
+    raw_storage: str = "inline"
+) -> dict:
+    """
+    Normalize a chunk of CSV rows (tuples of fields in header order, see
+    _iter_csv_chunks) into columnar lists.
+    
+    Returns:
+        Dictionary of equal-length lists: "timestamp", "open", "high", "low",
+        "close", "volume", "session_date" (None for halt bars) and "raw_json"
+        (encoded for raw_storage; None when it is "off").
+    
+    Raises ValueError for Saturday data, with the file path appended.
+    """
+    timestamps = []
+    opens = []
+    highs = []
+    lows = []
+    closes = []
+    volumes = []
+    raw_jsons = []
     
-    with open(file_path, 'r') as f:
-        reader = csv.DictReader(f)
+    if rows:
+        # Column positions by name; a repeated name maps to its last column, as in csv.DictReader
+        columns = {name: i for i, name in enumerate(fieldnames)}
+        open_column = columns['open']
+        high_column = columns['high']
+        low_column = columns['low']
+        close_column = columns['close']
+        volume_column = columns.get('volume', columns.get('Volume'))
+    
+    if not rows:
+        row_timestamps = []
+    elif source == "tradingview":
+        time_column = columns['time']
+        row_timestamps = parse_tradingview_timestamps([row[time_column] for row in rows])
+    else:
+        time_column = columns.get('timestamp', columns.get('time'))
+        row_timestamps = [_parse_plain_timestamp(row[time_column]) for row in rows]
+    
+    for row, timestamp in zip(rows, row_timestamps):
+        open_price = float(row[open_column])
+        high_price = float(row[high_column])
+        low_price = float(row[low_column])
+        close_price = float(row[close_column])
         
-        for row in reader:
-            # Parse timestamp based on source
-            if source == "tradingview":
-                timestamp = parse_tradingview_timestamp(row['time'])
-            else:
-                # For other sources, assume "timestamp" column in format "YYYY-MM-DD HH:MM:SS"
-                time_str = row.get('timestamp', row.get('time'))
-                dt = datetime.datetime.strptime(time_str, "%Y-%m-%d %H:%M:%S")
-                dt = dt.replace(tzinfo=PT_TIMEZONE)
-                timestamp = int(dt.timestamp())
-            
-            # Parse OHLCV
-            open_price = float(row['open'])
-            high_price = float(row['high'])
-            low_price = float(row['low'])
-            close_price = float(row['close'])
-            
-            # Handle empty volume
-            volume_str = row.get('volume', row.get('Volume', '0')).strip()
-            volume = float(volume_str) if volume_str else 0.0
-            
-            # Resolve trade day (may raise ValueError for Saturday)
-            try:
-                session_date = resolve_trade_day(timestamp)
-            except ValueError as e:
-                # Re-raise with file path context
-                raise ValueError(str(e) + f", File: {file_path}")
-            
-            # Determine if this is a halt period bar
+        # Handle missing or empty volume
+        volume_str = row[volume_column].strip() if volume_column is not None else ''
+        volume = float(volume_str) if volume_str else 0.0
+        
+        timestamps.append(timestamp)
+        opens.append(open_price)
+        highs.append(high_price)
+        lows.append(low_price)
+        closes.append(close_price)
+        volumes.append(volume)
+        if raw_storage == "off":
+            raw_jsons.append(None)
+        else:
+            raw_jsons.append(_encode_raw_json(json.dumps({
+                "timestamp": timestamp,
+                "open": open_price,
+                "high": high_price,
+                "low": low_price,
+                "close": close_price,
+                "volume": volume,
+                "source_row": dict(zip(fieldnames, row))
+            }), raw_storage))
+    
+    try:
+        session_dates, _ = resolve_trade_days(timestamps)
+    except ValueError as e:
+        raise ValueError(str(e) + f", File: {file_path}")
+    
+    return {
+        "timestamp": timestamps,
+        "open": opens,
+        "high": highs,
+        "low": lows,
+        "close": closes,
+        "volume": volumes,
+        "session_date": session_dates,
+        "raw_json": raw_jsons
+    }
+
+
+def _resolve_trade_day_ids(
+    cursor: sqlite3.Cursor,
+    symbol: str,
+    source: str,
+    session_dates: set,
+    trade_day_ids: dict
+) -> None:
+    """
+    Fill trade_day_ids (session_date -> id) for every date in session_dates,
+    creating missing trade_days rows with a single executemany.
+    """
+    missing = sorted(d for d in session_dates if d not in trade_day_ids)
+    if not missing:
+        return
+    
+    placeholders = ",".join("?" * len(missing))
+    query = (
+        "SELECT session_date, id FROM trade_days "
+        f"WHERE symbol = ? AND source = ? AND session_date IN ({placeholders})"
+    )
+    cursor.execute(query, [symbol, source] + missing)
+    trade_day_ids.update(cursor.fetchall())
+    
+    to_create = [d for d in missing if d not in trade_day_ids]
+    if to_create:
+        cursor.executemany(
+            "INSERT INTO trade_days (symbol, session_date, source) VALUES (?, ?, ?)",
+            [(symbol, d, source) for d in to_create]
+        )
+        cursor.execute(query, [symbol, source] + missing)
+        trade_day_ids.update(cursor.fetchall())
+
+
+def _write_bar_batch(
+    cursor: sqlite3.Cursor,
+    batch: dict,
+    symbol: str,
+    source: str,
+    timeframe: int,
+    file_path: str,
+    stats: dict,
+    trade_day_ids: Optional[dict] = None,
+    raw_storage: str = "inline"
+) -> None:
+    """
+    Write a normalized batch (see _normalize_rows) of timeframe-second bars
+    using set-based lookups.
+    
+    Existing bars for the batch's trade days and timestamp range are loaded
+    into an in-memory key map with one query per kind (session / halt), so
+    duplicates and conflicts are classified without per-row SELECTs. New
+    bars are inserted with executemany. Updates stats in place; the caller
+    owns the transaction.
+    """
+    timestamps = batch["timestamp"]
+    if not timestamps:
+        return
+    if trade_day_ids is None:
+        trade_day_ids = {}
+    
+    session_dates = batch["session_date"]
+    _resolve_trade_day_ids(
+        cursor, symbol, source,
+        {d for d in session_dates if d is not None},
+        trade_day_ids
+    )
+    
+    min_ts = min(timestamps)
+    max_ts = max(timestamps)
+    
+    # Existing session bars, keyed by (trade_day_id, timestamp)
+    existing = {}
+    day_ids = sorted({trade_day_ids[d] for d in session_dates if d is not None})
+    if day_ids:
+        placeholders = ",".join("?" * len(day_ids))
+        cursor.execute(
+            "SELECT trade_day_id, timestamp, open, high, low, close, volume FROM bars "
+            f"WHERE trade_day_id IN ({placeholders}) AND timeframe = ? AND timestamp BETWEEN ? AND ? "
+            "ORDER BY id",
+            day_ids + [timeframe, min_ts, max_ts]
+        )
+        for row in cursor.fetchall():
+            existing.setdefault((row[0], row[1]), row[2:])
+    
+    # Existing halt bars of this symbol, keyed by (None, timestamp)
+    if None in session_dates:
+        _adopt_unattributed_halt_bars(cursor, symbol, source, timeframe, [
+            bar[:6] for bar in zip(
+                timestamps, batch["open"], batch["high"], batch["low"], batch["close"], batch["volume"],
+                session_dates
+            ) if bar[6] is None
+        ])
+        cursor.execute(
+            "SELECT timestamp, open, high, low, close, volume FROM bars "
+            "WHERE halt_period = 1 AND halt_symbol = ? AND halt_source = ? AND timeframe = ? "
+            "AND timestamp BETWEEN ? AND ? ORDER BY id",
+            (symbol, source, timeframe, min_ts, max_ts)
+        )
+        for row in cursor.fetchall():
+            existing.setdefault((None, row[0]), row[1:])
+    
+    to_insert = []
+    for timestamp, o, h, l, c, v, session_date, raw_json in zip(
+        timestamps, batch["open"], batch["high"], batch["low"],
+        batch["close"], batch["volume"], session_dates, batch["raw_json"]
+    ):
+        trade_day_id = trade_day_ids[session_date] if session_date is not None else None
+        key = (trade_day_id, timestamp)
+        ohlcv = (o, h, l, c, v)
+        
+        if key in existing:
+            _record_duplicate(stats, timestamp, existing[key], ohlcv, file_path)
+        else:
+            # Later rows in the same batch must see this one as existing
+            existing[key] = ohlcv
+            if session_date is None:
+                to_insert.append((None, timeframe, timestamp, o, h, l, c, v, 1, symbol, source, raw_json))
+            else:
+                to_insert.append((trade_day_id, timeframe, timestamp, o, h, l, c, v, 0, None, None, raw_json))
+    
+    if not to_insert:
+        return
+    
+    if raw_storage == "side":
+        side_rows = [row[-1] for row in to_insert]
+        to_insert = [row[:-1] + (None,) for row in to_insert]
+    
+    cursor.executemany(
+        """INSERT INTO bars 
+           (trade_day_id, timeframe, timestamp, open, high, low, close, volume, halt_period,
+            halt_symbol, halt_source, raw_json)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""",
+        to_insert
+    )
+    stats["inserted"] += len(to_insert)
+    _update_session_summaries(cursor, timeframe, [row[:1] + row[2:8] for row in to_insert if row[0] is not None])
+    _bump_generations(cursor, [row[0] for row in to_insert if row[0] is not None])
+    
+    if raw_storage == "side":
+        # Look the new bar ids up by their unique keys
+        session_keys = [(row[0], row[2], raw) for row, raw in zip(to_insert, side_rows) if row[0] is not None]
+        halt_keys = [(row[2], raw) for row, raw in zip(to_insert, side_rows) if row[0] is None]
+        cursor.executemany(
+            """INSERT OR REPLACE INTO bar_raw (bar_id, raw_json)
+               SELECT id, ?3 FROM bars WHERE trade_day_id = ?1 AND timeframe = ?4 AND timestamp = ?2""",
+            [key + (timeframe,) for key in session_keys]
+        )
+        cursor.executemany(
+            """INSERT OR REPLACE INTO bar_raw (bar_id, raw_json)
+               SELECT id, ?2 FROM bars
+               WHERE halt_symbol = ?3 AND halt_source = ?4 AND timeframe = ?5 AND timestamp = ?1
+                 AND halt_period = 1""",
+            [key + (symbol, source, timeframe) for key in halt_keys]
+        )
+
+
+def _open_csv_reader(f, start_offset: Optional[int] = None) -> csv.DictReader:
+    """
+    DictReader over a CSV file opened in binary mode. With start_offset,
+    reading starts at that byte offset (the start of a data line, see
+    _csv_offset_after) using the field names from the header line.
+    """
+    if start_offset is None:
+        return csv.DictReader(io.TextIOWrapper(f))
+    f.seek(0)
+    fieldnames = next(csv.reader([f.readline().decode()]))
+    f.seek(start_offset)
+    return csv.DictReader(io.TextIOWrapper(f), fieldnames=fieldnames)
+
+
+def _last_stored_timestamp(cursor: sqlite3.Cursor, symbol: str, source: str, timeframe: int) -> Optional[int]:
+    """Timestamp of the latest stored session bar of a symbol, source and timeframe."""
+    # Trade days are in timestamp order, so only the latest one with bars is needed
+    cursor.execute(
+        """SELECT last_timestamp FROM (
+               SELECT td.session_date,
+                      (SELECT MAX(b.timestamp) FROM bars b
+                       WHERE b.trade_day_id = td.id AND b.timeframe = ?) AS last_timestamp
+               FROM trade_days td
+               WHERE td.symbol = ? AND td.source = ?
+           )
+           WHERE last_timestamp IS NOT NULL
+           ORDER BY session_date DESC LIMIT 1""",
+        (timeframe, symbol, source)
+    )
+    row = cursor.fetchone()
+    return row[0] if row else None
+
+
+def _csv_offset_after(file_path: str, source: str, cutoff: int) -> int:
+    """
+    Byte offset of the first data line with a timestamp after cutoff (or the
+    end of the file), found by binary search over byte offsets. The CSV
+    must be sorted by time, as exports are.
+    """
+    with open(file_path, 'rb') as f:
+        fieldnames = next(csv.reader([f.readline().decode()]))
+        data_start = f.tell()
+        
+        def line_start(position):
+            # Start of the first line at or after position
+            if position > data_start:
+                f.seek(position - 1)
+                f.readline()
+            else:
+                f.seek(data_start)
+            return f.tell()
+        
+        def is_after_cutoff(position):
+            f.seek(line_start(position))
+            line = f.readline().decode().strip()
+            if not line:
+                return True
+            row = dict(zip(fieldnames, next(csv.reader([line]))))
+            return _parse_csv_timestamp(row, source) > cutoff
+        
+        low, high = data_start, os.fstat(f.fileno()).st_size
+        while low < high:
+            middle = (low + high) // 2
+            if is_after_cutoff(middle):
+                high = middle
+            else:
+                low = middle + 1
+        return line_start(low)
+
+
+def _csv_line_fields(line: str) -> tuple:
+    """Fields of one CSV line; only lines with quotes go through the csv module."""
+    if '"' in line:
+        return tuple(next(csv.reader([line])))
+    return tuple(line.split(","))
+
+
+def _release_mapped_pages(mm: mmap.mmap, start: int, end: int) -> int:
+    """
+    Drop the whole pages of mm in [start, end) from this process's memory
+    (they are re-read from the file if touched again). Returns the offset
+    up to which pages have been released.
+    """
+    end -= end % mmap.PAGESIZE
+    if end <= start:
+        return start
+    if hasattr(mmap, "MADV_DONTNEED"):
+        mm.madvise(mmap.MADV_DONTNEED, start, end - start)
+    return end
+
+
+def _is_compressed(file_path: str) -> bool:
+    """Whether an input file is read through a decompressor (see COMPRESSED_SUFFIXES)."""
+    return file_path.lower().endswith(COMPRESSED_SUFFIXES)
+
+
+def _open_input(file_path: str):
+    """
+    Open an input file for binary reading. Compressed files are decompressed
+    as a stream, without a temporary file; they cannot seek cheaply.
+    """
+    name = file_path.lower()
+    if name.endswith(".gz"):
+        return gzip.open(file_path, 'rb')
+    if name.endswith(".bz2"):
+        return bz2.open(file_path, 'rb')
+    if name.endswith(".xz"):
+        return lzma.open(file_path, 'rb')
+    if name.endswith(".zst"):
+        import zstandard
+        
+        # The raw reader has no readline or line iteration; buffer it like
+        # the gzip, bz2 and lzma file objects are
+        return io.BufferedReader(zstandard.ZstdDecompressor().stream_reader(
+            open(file_path, 'rb'), read_across_frames=True, closefd=True
+        ))
+    return open(file_path, 'rb')
+
+
+def _mapped_text_blocks(file_path: str, start_offset: Optional[int] = None) -> Iterator[str]:
+    """
+    Decoded blocks of whole lines from a memory-mapped file, about
+    CSV_READ_BYTES each; pages already decoded are released. With
+    start_offset, the header line is followed by the lines from that offset.
+    """
+    with open(file_path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        if size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            if hasattr(mmap, "MADV_SEQUENTIAL"):
+                mm.madvise(mmap.MADV_SEQUENTIAL)
+            position = 0
+            if start_offset is not None:
+                yield mm.readline().decode()
+                position = start_offset
+            released = 0
+            
+            while position < size:
+                # Decode up to the last complete line in the next window
+                end = mm.rfind(b"\n", position, min(position + CSV_READ_BYTES, size)) + 1
+                if end <= position:
+                    end = mm.find(b"\n", position) + 1 or size
+                text = mm[position:end].decode()
+                released = _release_mapped_pages(mm, released, end)
+                position = end
+                yield text
+
+
+def _stream_text_blocks(file_path: str) -> Iterator[str]:
+    """Decoded blocks of whole lines from a (compressed) input stream, about CSV_READ_BYTES each."""
+    with _open_input(file_path) as f:
+        pending = b""
+        while True:
+            data = f.read(CSV_READ_BYTES)
+            if not data:
+                break
+            data = pending + data
+            end = data.rfind(b"\n") + 1
+            pending = data[end:]
+            if end:
+                yield data[:end].decode()
+        if pending:
+            yield pending.decode()
+
+
+def _iter_csv_chunks(
+    file_path: str,
+    chunk_size: int,
+    start_offset: Optional[int] = None
+) -> Iterator[tuple[list[str], list[tuple]]]:
+    """
+    Stream a CSV file as (fieldnames, rows) chunks of up to chunk_size rows,
+    each row a tuple of its fields in header order.
+    
+    Plain files are memory-mapped and compressed ones decompressed as a
+    stream; either way they are decoded CSV_READ_BYTES at a time, so memory
+    use depends on chunk_size, not on the file size. Each record must be on
+    one line (no newlines in quoted fields). With start_offset (plain files
+    only), data rows are read from that byte offset (the start of a line,
+    see _csv_offset_after).
+    """
+    if _is_compressed(file_path):
+        if start_offset is not None:
+            raise ValueError(f"Cannot seek in compressed input: {file_path}")
+        blocks = _stream_text_blocks(file_path)
+    else:
+        blocks = _mapped_text_blocks(file_path, start_offset)
+    
+    fieldnames = None
+    rows = []
+    for text in blocks:
+        if "\r" in text:
+            text = text.replace("\r", "")
+        lines = text.split("\n")
+        if fieldnames is None:
+            fieldnames = list(_csv_line_fields(lines[0]))
+            lines = lines[1:]
+        for line in lines:
+            if not line:
+                continue
+            rows.append(_csv_line_fields(line))
+            if len(rows) >= chunk_size:
+                yield fieldnames, rows
+                rows = []
+    
+    if rows:
+        yield fieldnames, rows
+
+
+def _first_csv_timestamp(file_path: str, source: str) -> Optional[int]:
+    """Timestamp of the first data row of a CSV file, or None if it has none."""
+    with _open_input(file_path) as f:
+        lines = (line.decode().rstrip("\r\n") for line in f)
+        fieldnames = list(_csv_line_fields(next(lines, "")))
+        for line in lines:
+            if line:
+                row = dict(zip(fieldnames, _csv_line_fields(line)))
+                return _parse_csv_timestamp(row, source)
+    return None
+
+
+def _is_multi_input(path: str) -> bool:
+    """Whether an input path names a directory or a glob pattern rather than one file."""
+    return os.path.isdir(path) or (not os.path.exists(path) and any(c in path for c in "*?["))
+
+
+def expand_csv_inputs(paths, source: str = "tradingview") -> list[str]:
+    """
+    Expand input paths into CSV files.
+    
+    Each path may be a file (kept as is), a directory (its files ending in
+    CSV_INPUT_SUFFIXES) or a glob pattern such as "exports/MNQ_*.csv.gz".
+    The files of each directory or pattern are ordered by the timestamp of
+    their first row, so overlapping exports are applied oldest first.
+    Plain files keep their position in the list.
+    
+    Raises:
+        FileNotFoundError: if a directory or pattern matches no files
+    """
+    if isinstance(paths, (str, os.PathLike)):
+        paths = [paths]
+    
+    expanded = []
+    for path in map(os.fspath, paths):
+        if not _is_multi_input(path):
+            expanded.append(path)
+            continue
+        if os.path.isdir(path):
+            matches = [
+                os.path.join(path, name) for name in os.listdir(path)
+                if name.lower().endswith(CSV_INPUT_SUFFIXES) and os.path.isfile(os.path.join(path, name))
+            ]
+        else:
+            matches = [match for match in glob.glob(path) if os.path.isfile(match)]
+        if not matches:
+            raise FileNotFoundError(f"No CSV files match: {path}")
+        
+        first_timestamps = {match: _first_csv_timestamp(match, source) for match in matches}
+        expanded.extend(sorted(
+            matches,
+            key=lambda match: (first_timestamps[match] is not None, first_timestamps[match] or 0, match)
+        ))
+    return expanded
+
+
+def _ingest_csv_rows(
+    cursor: sqlite3.Cursor,
+    file_path: str,
+    symbol: str,
+    source: str,
+    timeframe: int,
+    raw_storage: str,
+    commit_every: Optional[int] = None,
+    start_offset: Optional[int] = None,
+    after_timestamp: Optional[int] = None
+) -> dict:
+    """
+    Row-by-row implementation of ingest_csv. The caller owns the transaction;
+    with commit_every it is also committed after every commit_every rows.
+    With start_offset, rows before that byte offset are not read; with
+    after_timestamp, rows at or before that timestamp are read but skipped.
+    """
+    stats = _new_ingest_stats()
+    # Inserted session bars not yet folded into session_summary
+    summary_bars = []
+    
+    with _open_input(file_path) as f:
+        reader = _open_csv_reader(f, start_offset)
+        
+        for row_number, row in enumerate(reader):
+            if commit_every and row_number and row_number % commit_every == 0:
+                _update_session_summaries(cursor, timeframe, summary_bars)
+                _bump_generations(cursor, [bar[0] for bar in summary_bars])
+                summary_bars = []
+                cursor.connection.commit()
+            
+            # Parse timestamp based on source
+            timestamp = _parse_csv_timestamp(row, source)
+            if after_timestamp is not None and timestamp <= after_timestamp:
+                continue
+            
+            # Parse OHLCV
+            open_price = float(row['open'])
+            high_price = float(row['high'])
+            low_price = float(row['low'])
+            close_price = float(row['close'])
+            
+            # Handle empty volume
+            volume_str = row.get('volume', row.get('Volume', '0')).strip()
+            volume = float(volume_str) if volume_str else 0.0
+            
+            # Resolve trade day (may raise ValueError for Saturday)
+            try:
+                session_date = resolve_trade_day(timestamp)
+            except ValueError as e:
+                # Re-raise with file path context
+                raise ValueError(str(e) + f", File: {file_path}")
+            
+            # Determine if this is a halt period bar
             halt_period = 1 if session_date is None else 0
             
-            # For halt period bars, we still store them but with trade_day_id = NULL
+            # Halt period bars are stored without a trade day, keyed by symbol and source
             if halt_period:
                 trade_day_id = None
+                _adopt_unattributed_halt_bars(
+                    cursor, symbol, source, timeframe,
+                    [(timestamp, open_price, high_price, low_price, close_price, volume)]
+                )
             else:
                 trade_day_id = get_or_create_trade_day(symbol, session_date, source, cursor)
             
             # Create raw JSON representation
-            raw_json = json.dumps({
-                "timestamp": timestamp,
-                "open": open_price,
-                "high": high_price,
-                "low": low_price,
-                "close": close_price,
-                "volume": volume,
-                "source_row": row
-            })
+            raw_json = None
+            if raw_storage != "off":
+                raw_json = _encode_raw_json(json.dumps({
+                    "timestamp": timestamp,
+                    "open": open_price,
+                    "high": high_price,
+                    "low": low_price,
+                    "close": close_price,
+                    "volume": volume,
+                    "source_row": row
+                }), raw_storage)
+            
+            # Insert new bar; the unique bar keys turn an existing bar into a no-op
+            cursor.execute(
+                """INSERT INTO bars 
+                   (trade_day_id, timeframe, timestamp, open, high, low, close, volume, halt_period,
+                    halt_symbol, halt_source, raw_json)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                   ON CONFLICT DO NOTHING""",
+                (trade_day_id, timeframe, timestamp, open_price, high_price, low_price, close_price, volume,
+                 halt_period, symbol if halt_period else None, source if halt_period else None,
+                 None if raw_storage == "side" else raw_json)
+            )
+            if cursor.rowcount:
+                stats["inserted"] += 1
+                if raw_storage == "side":
+                    _store_side_raw_json(cursor, [(cursor.lastrowid, raw_json)])
+                if not halt_period:
+                    summary_bars.append((
+                        trade_day_id, timestamp, open_price, high_price, low_price, close_price, volume
+                    ))
+                continue
             
-            # Check for existing bar
+            # Bar already exists: compare against the stored values
             if halt_period:
                 cursor.execute(
-                    "SELECT id, open, high, low, close, volume FROM bars WHERE timestamp = ? AND halt_period = 1",
-                    (timestamp,)
+                    "SELECT id, open, high, low, close, volume FROM bars "
+                    "WHERE halt_symbol = ? AND halt_source = ? AND timeframe = ? AND timestamp = ? "
+                    "AND halt_period = 1",
+                    (symbol, source, timeframe, timestamp)
                 )
             else:
                 cursor.execute(
-                    "SELECT id, open, high, low, close, volume FROM bars WHERE trade_day_id = ? AND timestamp = ?",
-                    (trade_day_id, timestamp)
+                    "SELECT id, open, high, low, close, volume FROM bars "
+                    "WHERE trade_day_id = ? AND timeframe = ? AND timestamp = ?",
+                    (trade_day_id, timeframe, timestamp)
                 )
             
             existing = cursor.fetchone()
-            
-            if existing:
-                # Check if OHLCV matches
-                existing_id, existing_open, existing_high, existing_low, existing_close, existing_volume = existing
-                
-                if (abs(existing_open - open_price) < 0.001 and
-                    abs(existing_high - high_price) < 0.001 and
-                    abs(existing_low - low_price) < 0.001 and
-                    abs(existing_close - close_price) < 0.001 and
-                    abs(existing_volume - volume) < 0.001):
-                    # Exact match, skip
-                    stats["skipped"] += 1
-                else:
-                    # Conflict
-                    stats["conflicts"] += 1
-                    stats["conflict_details"].append({
-                        "timestamp": timestamp,
-                        "reason": "OHLCV mismatch",
-                        "file": file_path,
-                        "existing": {
-                            "open": existing_open,
-                            "high": existing_high,
-                            "low": existing_low,
-                            "close": existing_close,
-                            "volume": existing_volume
-                        },
-                        "new": {
-                            "open": open_price,
-                            "high": high_price,
-                            "low": low_price,
-                            "close": close_price,
-                            "volume": volume
-                        }
-                    })
+            _record_duplicate(
+                stats,
+                timestamp,
+                existing[1:],
+                (open_price, high_price, low_price, close_price, volume),
+                file_path
+            )
+    
+    _update_session_summaries(cursor, timeframe, summary_bars)
+    _bump_generations(cursor, [bar[0] for bar in summary_bars])
+    return stats
+
+
+def _ingest_csv_chunks(
+    cursor: sqlite3.Cursor,
+    file_path: str,
+    symbol: str,
+    source: str,
+    timeframe: int,
+    chunk_size: int,
+    raw_storage: str,
+    commit_every: Optional[int] = None,
+    start_offset: Optional[int] = None,
+    after_timestamp: Optional[int] = None
+) -> dict:
+    """
+    Chunked, set-based implementation of ingest_csv(bulk=True). The caller
+    owns the transaction; with commit_every, chunks are at most commit_every
+    rows and each one is committed. With start_offset, rows before that
+    byte offset are not read; with after_timestamp, rows at or before that
+    timestamp are read but skipped.
+    """
+    stats = _new_ingest_stats()
+    trade_day_ids = {}
+    if commit_every:
+        chunk_size = min(chunk_size, commit_every)
+    
+    for fieldnames, rows in _iter_csv_chunks(file_path, chunk_size, start_offset):
+        batch = _normalize_rows(rows, fieldnames, source, file_path, raw_storage)
+        if after_timestamp is not None:
+            keep = [i for i, timestamp in enumerate(batch["timestamp"]) if timestamp > after_timestamp]
+            if len(keep) < len(batch["timestamp"]):
+                batch = {key: [values[i] for i in keep] for key, values in batch.items()}
+        _write_bar_batch(cursor, batch, symbol, source, timeframe, file_path, stats, trade_day_ids, raw_storage)
+        if commit_every:
+            cursor.connection.commit()
+    
+    return stats
+
+
+def _slice_batch(batch: dict, size: int):
+    """Yields consecutive slices of at most size rows from a normalized batch."""
+    for start in range(0, len(batch["timestamp"]), size):
+        yield {key: values[start:start + size] for key, values in batch.items()}
+
+
+def _normalize_csv_file(file_path: str, source: str, raw_storage: str) -> dict:
+    """Read and normalize a whole CSV file. Runs in ingest_many workers."""
+    batch = _normalize_rows([], [], source, file_path, raw_storage)
+    for fieldnames, rows in _iter_csv_chunks(file_path, BULK_CHUNK_SIZE):
+        for key, values in _normalize_rows(rows, fieldnames, source, file_path, raw_storage).items():
+            batch[key].extend(values)
+    return batch
+
+
+def _file_fingerprint(file_path: str) -> tuple:
+    """
+    (size, mtime, SHA-256 hex digest) of a file, hashed in HASH_CHUNK_BYTES
+    reads. Compressed files are hashed as stored, not decompressed.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        info = os.fstat(f.fileno())
+        for block in iter(lambda: f.read(HASH_CHUNK_BYTES), b""):
+            digest.update(block)
+    return info.st_size, info.st_mtime, digest.hexdigest()
+
+
+def _ledger_stats(
+    cursor: sqlite3.Cursor,
+    fingerprint: tuple,
+    symbol: str,
+    source: str,
+    timeframe: int
+) -> Optional[dict]:
+    """Ingestion summary recorded for identical file content, or None."""
+    cursor.execute(
+        "SELECT stats FROM ingest_files WHERE content_hash = ? AND symbol = ? AND source = ? AND timeframe = ?",
+        (fingerprint[2], symbol, source, timeframe)
+    )
+    row = cursor.fetchone()
+    return json.loads(row[0]) if row else None
+
+
+def _record_ingested_file(
+    cursor: sqlite3.Cursor,
+    file_path: str,
+    fingerprint: tuple,
+    symbol: str,
+    source: str,
+    timeframe: int,
+    stats: dict,
+    incremental: bool = False
+) -> None:
+    """
+    Add (or refresh) a file's ingest_files ledger row. incremental records
+    that the run read only the rows from the overlap window on, so its
+    stats do not cover the whole file.
+    """
+    size, mtime, content_hash = fingerprint
+    cursor.execute(
+        """INSERT INTO ingest_files
+           (path, size, mtime, content_hash, symbol, source, timeframe, stats, ingested_at)
+           VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+           ON CONFLICT (content_hash, symbol, source, timeframe) DO UPDATE SET
+               path = excluded.path, size = excluded.size, mtime = excluded.mtime,
+               stats = excluded.stats, ingested_at = excluded.ingested_at""",
+        (file_path, size, mtime, content_hash, symbol, source, timeframe,
+         json.dumps({**stats, "incremental": incremental}), int(datetime.datetime.now(tz=PT_TIMEZONE).timestamp()))
+    )
+
+
+def _replay_ingest_stats(stats: dict, file_path: str) -> dict:
+    """
+    The summary a re-run of an already ingested file reports: its inserted
+    bars are now skipped, and its conflicts are still conflicts. It is
+    marked "replayed"; "incremental" says the recorded run read only the
+    overlap window, so the counts describe that window, not the file.
+    """
+    return {
+        "inserted": 0,
+        "skipped": stats["inserted"] + stats["skipped"],
+        "conflicts": stats["conflicts"],
+        "conflict_details": [{**detail, "file": file_path} for detail in stats["conflict_details"]],
+        "replayed": True,
+        "incremental": stats.get("incremental", False)
+    }
+
+
+def _merge_ingest_stats(total: dict, stats: dict) -> None:
+    """Add one file's ingestion summary into an aggregate summary."""
+    total["inserted"] += stats["inserted"]
+    total["skipped"] += stats["skipped"]
+    total["conflicts"] += stats["conflicts"]
+    total["conflict_details"].extend(stats["conflict_details"])
+
+
+def _trade_day_filter(
+    symbol: str,
+    session_date: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    source: str
+) -> tuple[str, dict]:
+    """SQL condition on trade_days (alias td) selecting the trade days a bar query covers."""
+    day_filter = "td.symbol = :symbol AND td.source = :source"
+    params = {"symbol": symbol, "source": source}
+    if session_date:
+        day_filter += " AND td.session_date = :session_date"
+        params["session_date"] = session_date
+    elif start_date and end_date:
+        day_filter += " AND td.session_date >= :start_date AND td.session_date <= :end_date"
+        params.update(start_date=start_date, end_date=end_date)
+    return day_filter, params
+
+
+def _halt_bar_filter(
+    symbol: str,
+    session_date: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    source: str
+) -> tuple[str, dict]:
+    """
+    SQL condition on bars (alias b) selecting the halt bars a bar query
+    covers: those of the symbol and source in the halt that follows each
+    requested trade day (2-3 PM PT on its calendar date).
+    """
+    halt_filter = "b.halt_period = 1 AND b.halt_symbol = :symbol AND b.halt_source = :source"
+    params = {"symbol": symbol, "source": source}
+    if session_date:
+        start_date = end_date = session_date
+    if start_date and end_date:
+        # From the first session's open to the next session's open after the last one
+        after_end = (datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat()
+        halt_filter += " AND b.timestamp >= :halt_start AND b.timestamp < :halt_end"
+        params.update(halt_start=_session_open_timestamp(start_date), halt_end=_session_open_timestamp(after_end))
+    return halt_filter, params
+
+
+def _bar_generations(
+    cursor: sqlite3.Cursor,
+    symbol: str,
+    session_date: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    include_halt: bool,
+    source: str
+) -> tuple:
+    """
+    Version stamp of the bars a query covers: the (trade_day_id, generation)
+    pairs of its trade days, plus a fingerprint of its halt bars with
+    include_halt. Changes whenever ingest adds a bar the query would return.
+    """
+    day_filter, params = _trade_day_filter(symbol, session_date, start_date, end_date, source)
+    cursor.execute(f"SELECT td.id, td.generation FROM trade_days td WHERE {day_filter} ORDER BY td.id", params)
+    generations = tuple(tuple(row) for row in cursor.fetchall())
+    if include_halt:
+        # Halt bars have no trade day generation; bars are append-only,
+        # so their count and newest id change whenever one is added
+        halt_filter, params = _halt_bar_filter(symbol, session_date, start_date, end_date, source)
+        cursor.execute(f"SELECT COUNT(*), MAX(b.id) FROM bars b WHERE {halt_filter}", params)
+        generations += (tuple(cursor.fetchone()),)
+    return generations
+
+
+def _annotation_generation(cursor: sqlite3.Cursor, symbol: str, start_date: str, end_date: str) -> tuple:
+    """
+    Version stamp of a symbol's annotations in a date range. Annotations
+    are never deleted, so their count and newest id change whenever one
+    is saved. The superseding note may sit on a date outside the range,
+    so the number of superseded notes is stamped as well.
+    """
+    cursor.execute(
+        """SELECT COUNT(*), MAX(da.id), SUM(da.status = 'superseded') FROM day_annotations da
+           JOIN trade_days td ON da.trade_day_id = td.id
+           WHERE td.symbol = ? AND td.session_date >= ? AND td.session_date <= ?""",
+        (symbol, start_date, end_date)
+    )
+    return tuple(cursor.fetchone())
+
+
+def _bars_query(
+    cursor: sqlite3.Cursor,
+    symbol: str,
+    session_date: Optional[str],
+    start_date: Optional[str],
+    end_date: Optional[str],
+    timeframe: Optional[str],
+    include_halt: bool,
+    source: str,
+    with_raw: bool
+) -> tuple[str, dict]:
+    """
+    Builds the bar SELECT shared by get_bars, iter_bars, get_bars_columnar
+    and export_bars.
+    
+    The timeframe is resolved per trade day: a day that stores bars of the
+    requested timeframe returns them as they are, any other day is
+    resampled in SQL from its finest stored timeframe (see
+    _resample_query). With no timeframe, each day returns its finest
+    stored bars. Every variant yields the same columns: id, timestamp,
+    OHLCV, halt_period, session_date (and raw_json with with_raw).
+    
+    With include_halt, each day returned as stored is merged in timestamp
+    order with the symbol's halt bars of the same timeframe from the halt
+    that follows it, and from the halt before it if no trade day precedes
+    that halt; their session_date is None. Resampled days never include
+    halt bars.
+    
+    The returned params also hold "timeframes", the timeframe in seconds
+    of the bars returned for each session date, and for the date of a
+    leading halt (one with no trade day before it); these are the
+    partition dates of _iter_bar_partitions. It is not bound by the query.
+    """
+    day_filter, params = _trade_day_filter(symbol, session_date, start_date, end_date, source)
+    
+    requested = parse_timeframe(timeframe) if timeframe else None
+    # One index probe per trade day for its finest timeframe, one for the requested one
+    cursor.execute(
+        f"""SELECT
+                td.id,
+                td.session_date,
+                (SELECT MIN(b.timeframe) FROM bars b WHERE b.trade_day_id = td.id),
+                EXISTS (SELECT 1 FROM bars b WHERE b.trade_day_id = td.id AND b.timeframe = :requested)
+            FROM trade_days td
+            WHERE {day_filter}""",
+        {**params, "requested": requested}
+    )
+    stored_days, resampled_days, timeframes = {}, [], {}
+    for trade_day_id, date, finest, has_requested in cursor.fetchall():
+        if finest is None:
+            continue
+        if requested is None or has_requested:
+            stored_days[date] = requested or finest
+        else:
+            if requested < finest or requested % finest:
+                raise ValueError(
+                    f"Cannot resample {finest}s bars to timeframe '{timeframe}'; "
+                    f"it must be a multiple of the stored timeframe"
+                )
+            if with_raw:
+                raise ValueError("raw_json is not available for resampled bars")
+            resampled_days.append((trade_day_id, _session_open_timestamp(date), date, finest))
+        timeframes[date] = requested or finest
+    
+    # Halt windows as (timeframe, start, end): the halt after a trade day runs
+    # up to the next day's session open. A halt with no trade day before it
+    # (a file starting in the halt) goes with the stored day it precedes.
+    halt_windows = []
+    for date, seconds in stored_days.items() if include_halt else ():
+        previous = (datetime.date.fromisoformat(date) - datetime.timedelta(days=1)).isoformat()
+        halt_dates = [date]
+        if previous not in timeframes and not session_date and not (start_date and end_date and previous < start_date):
+            halt_dates.append(previous)
+            # Its bars are exported under their own calendar date
+            timeframes[previous] = seconds
+        for halt_date in halt_dates:
+            next_date = (datetime.date.fromisoformat(halt_date) + datetime.timedelta(days=1)).isoformat()
+            halt_windows.append((seconds, _session_open_timestamp(halt_date), _session_open_timestamp(next_date)))
+    
+    columns = """
+            b.id,
+            b.timestamp,
+            b.open,
+            b.high,
+            b.low,
+            b.close,
+            b.volume,
+            b.halt_period,
+            {session_date} AS session_date
+    """
+    if with_raw:
+        columns += ", COALESCE(b.raw_json, br.raw_json) AS raw_json"
+    raw_join = "LEFT JOIN bar_raw br ON br.bar_id = b.id" if with_raw else ""
+    
+    # A day returned as stored holds either the requested timeframe or, with
+    # none requested, its finest one; other days find no bars here
+    if requested is not None:
+        day_timeframe = ":requested"
+        params["requested"] = requested
+    else:
+        day_timeframe = "(SELECT MIN(f.timeframe) FROM bars f WHERE f.trade_day_id = td.id)"
+    ctes = []
+    # Session bars belong to trade days; halt bars only to their symbol
+    selects = [f"""
+        SELECT {columns.format(session_date="td.session_date")}
+        FROM trade_days td
+        JOIN bars b ON b.trade_day_id = td.id AND b.timeframe = {day_timeframe}
+        {raw_join}
+        WHERE {day_filter} AND b.halt_period = 0
+    """]
+    if include_halt:
+        ctes.append("""
+            halts(timeframe, start_ts, end_ts) AS (
+                SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]')
+                FROM json_each(:halt_windows)
+            )
+        """)
+        selects.append(f"""
+            SELECT {columns.format(session_date="NULL")}
+            FROM halts h
+            JOIN bars b ON b.halt_period = 1 AND b.halt_symbol = :symbol AND b.halt_source = :source
+                AND b.timeframe = h.timeframe AND b.timestamp >= h.start_ts AND b.timestamp < h.end_ts
+            {raw_join}
+        """)
+        params["halt_windows"] = json.dumps(halt_windows)
+    params["timeframes"] = timeframes
+    
+    if resampled_days:
+        resample_ctes, resample_select = _resample_query(resampled_days)
+        ctes.extend(resample_ctes)
+        selects.append(resample_select)
+        params.update(resampled_days=json.dumps(resampled_days), timeframe=requested)
+    
+    query = ("WITH " + ",".join(ctes) if ctes else "") + " UNION ALL ".join(selects) + " ORDER BY timestamp"
+    
+    return query, params
+
+
+def _resample_query(sessions: list) -> tuple[list, str]:
+    """
+    Builds the CTEs and SELECT aggregating each trade day's stored bars into
+    timeframe-second bars, for _bars_query.
+    
+    sessions are (trade_day_id, session_open, session_date, base) rows,
+    bound as JSON to :resampled_days; base is the day's finest stored
+    timeframe, and :timeframe the requested one. Buckets are aligned to
+    each trade day's session open (3:00 PM PT) and grouped per trade day,
+    so no bar spans two sessions or the daily halt; the last bucket of a
+    session may be shorter. Open and close come from the first and last
+    stored bar in the bucket, looked up by bar key. Halt bars are not
+    resampled. Resampled bars have no id.
+    """
+    ctes = ["""
+        resampled(trade_day_id, open_ts, session_date, base) AS (
+            SELECT json_extract(value, '$[0]'), json_extract(value, '$[1]'), json_extract(value, '$[2]'),
+                   json_extract(value, '$[3]')
+            FROM json_each(:resampled_days)
+        )
+    """, """
+        buckets AS (
+            SELECT
+                b.trade_day_id,
+                s.session_date,
+                s.base,
+                s.open_ts + ((b.timestamp - s.open_ts) / :timeframe) * :timeframe AS bucket,
+                MIN(b.timestamp) AS first_ts,
+                MAX(b.timestamp) AS last_ts,
+                MAX(b.high) AS high,
+                MIN(b.low) AS low,
+                SUM(b.volume) AS volume
+            FROM resampled s
+            JOIN bars b ON b.trade_day_id = s.trade_day_id AND b.timeframe = s.base
+            WHERE b.halt_period = 0
+            GROUP BY b.trade_day_id, bucket
+        )
+    """]
+    
+    query = """
+        SELECT
+            NULL AS id,
+            k.bucket AS timestamp,
+            o.open,
+            k.high,
+            k.low,
+            c.close,
+            k.volume,
+            0 AS halt_period,
+            k.session_date
+        FROM buckets k
+        JOIN bars o ON o.trade_day_id = k.trade_day_id AND o.timeframe = k.base AND o.timestamp = k.first_ts
+        JOIN bars c ON c.trade_day_id = k.trade_day_id AND c.timeframe = k.base AND c.timestamp = k.last_ts
+    """
+    
+    return ctes, query
+
+
+def _iter_bar_records(cursor: sqlite3.Cursor, batch_size: int, with_raw: bool) -> Iterator[Bar]:
+    """Yields Bar tuples from an executed _bars_query, batch_size rows at a time."""
+    make = Bar._make
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            return
+        for row in rows:
+            bar_id, timestamp, open_, high, low, close, volume, halt_period, session_date = row[:9]
+            yield make((
+                bar_id, timestamp, open_, high, low, close, volume, bool(halt_period), session_date,
+                decode_raw_json(row[9]) if with_raw else None
+            ))
+
+
+def _iter_bar_partitions(cursor: sqlite3.Cursor, batch_size: int) -> Iterator[tuple[str, dict]]:
+    """
+    Yields (session_date, columns) per trade day from an executed
+    _bars_query, with columns as EXPORT_COLUMNS arrays. A halt bar goes
+    with the session that ends at its calendar date, or into a partition
+    of its own when it leads the query; every session_date yielded is a
+    key of the query's params["timeframes"].
+    """
+    def partition_date(row):
+        return row[8] if row[8] is not None else get_pt_datetime(row[1]).date().isoformat()
+    
+    partition_session, columns = None, None
+    while True:
+        rows = cursor.fetchmany(batch_size)
+        if not rows:
+            break
+        for session_date, group in groupby(rows, key=partition_date):
+            if session_date != partition_session:
+                if columns is not None:
+                    yield partition_session, columns
+                partition_session = session_date
+                columns = {name: array.array(typecode) for name, typecode in EXPORT_COLUMNS}
+            _, timestamps, opens, highs, lows, closes, volumes, halts, _ = zip(*group)
+            for name, values in zip(
+                ("timestamp", "open", "high", "low", "close", "volume", "halt_period"),
+                (timestamps, opens, highs, lows, closes, volumes, halts)
+            ):
+                columns[name].extend(values)
+    if columns is not None:
+        yield partition_session, columns
+
+
+def _annotation_record(row: sqlite3.Row) -> dict:
+    """Convert a day_annotations row (joined with session_date) to a dictionary."""
+    return {
+        "id": row["id"],
+        "session_date": row["session_date"],
+        "annotation_type": row["annotation_type"],
+        "content": row["content"],
+        "tags": json.loads(row["tags"]) if row["tags"] else [],
+        "source": row["source"],
+        "created_at": row["created_at"],
+        "supersedes_id": row["supersedes_id"],
+        "status": row["status"]
+    }
+
+
+class BarColumns:
+    """
+    Bars as contiguous, typed columns, as returned by get_bars_columnar.
+    
+    Each column is an array.array: timestamp int64 ('q'); open, high, low,
+    close and volume float64 ('d'); halt_period 0/1 bytes ('b'); and
+    session_code int32 ('i') indexing into session_dates, with -1 for bars
+    without a trade day. to_numpy() and to_pandas() wrap the same buffers
+    without copying.
+    """
+    
+    __slots__ = ("timestamp", "open", "high", "low", "close", "volume", "halt_period", "session_code", "session_dates")
+    
+    def __init__(self):
+        self.timestamp = array.array("q")
+        self.open = array.array("d")
+        self.high = array.array("d")
+        self.low = array.array("d")
+        self.close = array.array("d")
+        self.volume = array.array("d")
+        self.halt_period = array.array("b")
+        self.session_code = array.array("i")
+        self.session_dates = []
+    
+    def __len__(self) -> int:
+        return len(self.timestamp)
+    
+    def session_date(self, index: int) -> Optional[str]:
+        """Returns the session date of the bar at index (None for halt bars)."""
+        code = self.session_code[index]
+        return self.session_dates[code] if code >= 0 else None
+    
+    def to_numpy(self) -> dict:
+        """
+        Returns the columns as NumPy arrays sharing memory with this object.
+        
+        halt_period is a bool array; session_code stays integer codes into
+        session_dates. The arrays stay valid as long as they are referenced,
+        but these BarColumns can no longer grow while they exist.
+        """
+        import numpy as np
+        
+        return {
+            name: np.frombuffer(getattr(self, name), dtype=dtype)
+            for name, dtype in (
+                ("timestamp", np.int64),
+                ("open", np.float64),
+                ("high", np.float64),
+                ("low", np.float64),
+                ("close", np.float64),
+                ("volume", np.float64),
+                ("halt_period", np.bool_),
+                ("session_code", np.intc),
+            )
+        }
+    
+    def to_pandas(self):
+        """
+        Returns a pandas DataFrame over the same buffers.
+        
+        session_date becomes a Categorical built from session_code, so trade
+        days are stored once. Columns are not copied on pandas versions that
+        honour copy=False for dict input.
+        """
+        import pandas as pd
+        
+        columns = self.to_numpy()
+        codes = columns.pop("session_code")
+        columns["session_date"] = pd.Categorical.from_codes(codes, categories=self.session_dates)
+        return pd.DataFrame(columns, copy=False)
+
+
+def _check_export_format(format: str) -> str:
+    """Raise ValueError for an unknown export format; resolve "auto" to the one used."""
+    if format not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown format '{format}'. Expected one of: {', '.join(EXPORT_FORMATS)}")
+    if format == "auto":
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            return "columnar"
+        return "parquet"
+    return format
+
+
+def _columnar_chunks(metadata: dict, columns: dict) -> Iterator[bytes]:
+    """
+    Encode one partition in the built-in columnar format, as a header
+    chunk and then one chunk per column:
+    
+        b"MABARS1\n", a little-endian uint32 header length, the JSON header
+        (metadata plus "rows" and the EXPORT_COLUMNS names and typecodes),
+        then each column's little-endian values back to back.
+    """
+    header = json.dumps({**metadata, "rows": len(columns["timestamp"]), "columns": EXPORT_COLUMNS}).encode()
+    yield _COLUMNAR_MAGIC + len(header).to_bytes(4, "little") + header
+    for name, _ in EXPORT_COLUMNS:
+        values = columns[name]
+        if sys.byteorder != "little":
+            values = array.array(values.typecode, values)
+            values.byteswap()
+        yield values.tobytes()
+
+
+def _write_columnar_file(path: str, metadata: dict, columns: dict) -> None:
+    """Write one partition to path in the built-in columnar format (see _columnar_chunks)."""
+    with open(path, 'wb') as f:
+        f.writelines(_columnar_chunks(metadata, columns))
+
+
+def _read_columnar(f, name: str) -> Optional[tuple[dict, dict]]:
+    """Read one columnar partition from a binary stream; None at end of stream."""
+    magic = f.read(len(_COLUMNAR_MAGIC))
+    if not magic:
+        return None
+    if magic != _COLUMNAR_MAGIC:
+        raise ValueError(f"Not a columnar bar file: {name}")
+    header = json.loads(f.read(int.from_bytes(f.read(4), "little")))
+    columns = {}
+    for column, typecode in header.pop("columns"):
+        values = array.array(typecode)
+        data = f.read(values.itemsize * header["rows"])
+        if len(data) != values.itemsize * header["rows"]:
+            raise ValueError(f"Truncated columnar bar file: {name}")
+        values.frombytes(data)
+        if sys.byteorder != "little":
+            values.byteswap()
+        columns[column] = values
+    return header, columns
+
+
+def _read_columnar_file(path: str) -> tuple[dict, dict]:
+    """Read a file written by _write_columnar_file; returns (metadata, columns as arrays)."""
+    with open(path, 'rb') as f:
+        partition = _read_columnar(f, path)
+    if partition is None:
+        raise ValueError(f"Not a columnar bar file: {path}")
+    return partition
+
+
+def read_columnar_stream(f) -> Iterator[tuple[dict, dict]]:
+    """
+    Reads back-to-back columnar partitions from a binary stream, such as
+    the body of an ArchiveServer /bars?format=columnar response.
+    
+    Yields:
+        (metadata, columns) per trade day: metadata has symbol, source,
+        timeframe, session_date and rows; columns maps each EXPORT_COLUMNS
+        name to an array.array
+    """
+    name = getattr(f, "name", "stream")
+    while True:
+        partition = _read_columnar(f, name)
+        if partition is None:
+            return
+        yield partition
+
+
+def _write_parquet_file(path: str, metadata: dict, columns: dict) -> None:
+    """Write one partition as Parquet, with the metadata in the schema."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    
+    table = pa.table({name: pa.array(columns[name]) for name, _ in EXPORT_COLUMNS})
+    table = table.replace_schema_metadata({"market_archivist": json.dumps(metadata)})
+    pq.write_table(table, path)
+
+
+def _read_parquet_file(path: str) -> tuple[dict, dict]:
+    """Read a file written by _write_parquet_file; returns (metadata, columns as lists)."""
+    import pyarrow.parquet as pq
+    
+    table = pq.read_table(path)
+    metadata = json.loads(table.schema.metadata[b"market_archivist"])
+    return metadata, table.to_pydict()
+
+
+class BarFile:
+    """
+    A bar file: every stored bar of one symbol, source and timeframe as
+    fixed-width BAR_RECORD records sorted by timestamp, memory-mapped.
+    
+    Range reads binary-search the mapped timestamps and return memoryview
+    slices of the mapping, so reading a day, a week or a year costs the
+    same few microseconds and copies nothing. Halt bars are included,
+    marked with BAR_FLAG_HALT. Archive(bar_file_dir=...) keeps the files
+    current as bars are ingested; any process can open one read-only
+    without touching SQLite.
+    
+    A BarFile is a snapshot: open it again (or use Archive.bar_file) to see
+    bars appended or rebuilt since.
+    """
+    
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, self.count, self.max_bar_id, self.last_timestamp, self.timeframe = _BAR_FILE_HEADER.unpack_from(
+            self._mmap
+        )
+        if magic != _BAR_FILE_MAGIC:
+            self._mmap.close()
+            raise ValueError(f"Not a bar file: {path}")
+        self._records = memoryview(self._mmap)[_BAR_FILE_HEADER.size:_BAR_FILE_HEADER.size + self.count * BAR_RECORD.size]
+    
+    def __len__(self) -> int:
+        return self.count
+    
+    def close(self) -> None:
+        """Unmaps the file. Views returned earlier must be released first."""
+        self._records.release()
+        self._mmap.close()
+    
+    def __enter__(self) -> "BarFile":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def _bisect(self, timestamp: int) -> int:
+        """Index of the first record with a timestamp at or after timestamp."""
+        low, high = 0, self.count
+        while low < high:
+            middle = (low + high) // 2
+            if _BAR_TIMESTAMP.unpack_from(self._records, middle * BAR_RECORD.size)[0] < timestamp:
+                low = middle + 1
+            else:
+                high = middle
+        return low
+    
+    def view(self, start_timestamp: Optional[int] = None, end_timestamp: Optional[int] = None) -> memoryview:
+        """
+        Zero-copy memoryview over the packed records with start_timestamp <=
+        timestamp < end_timestamp (either bound may be None). Decode it with
+        BAR_RECORD.iter_unpack or to_numpy.
+        """
+        start = 0 if start_timestamp is None else self._bisect(start_timestamp)
+        end = self.count if end_timestamp is None else self._bisect(end_timestamp)
+        return self._records[start * BAR_RECORD.size:max(start, end) * BAR_RECORD.size]
+    
+    def session_view(self, start_date: Optional[str] = None, end_date: Optional[str] = None) -> memoryview:
+        """
+        view() over trade days start_date to end_date (YYYY-MM-DD, inclusive):
+        their sessions and the halt after each, as get_bars(include_halt=True).
+        """
+        start = _session_open_timestamp(start_date) if start_date else None
+        if end_date:
+            end_date = (datetime.date.fromisoformat(end_date) + datetime.timedelta(days=1)).isoformat()
+        return self.view(start, _session_open_timestamp(end_date) if end_date else None)
+    
+    def bars(
+        self,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        include_halt: bool = False
+    ) -> list[tuple]:
+        """
+        Decoded records of trade days start_date to end_date, as
+        (timestamp, open, high, low, close, volume, flags) tuples. Halt bars
+        are left out unless include_halt=True.
+        """
+        records = BAR_RECORD.iter_unpack(self.session_view(start_date, end_date))
+        if include_halt:
+            return list(records)
+        return [record for record in records if not record[6] & BAR_FLAG_HALT]
+    
+    def to_numpy(self, view: Optional[memoryview] = None):
+        """
+        A NumPy structured array over view (default: the whole file) sharing
+        its memory, with fields timestamp, open, high, low, close, volume
+        and flags.
+        """
+        import numpy as np
+        
+        dtype = np.dtype([
+            ("timestamp", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"),
+            ("close", "<f8"), ("volume", "<f8"), ("flags", "<i8"),
+        ])
+        return np.frombuffer(self._records if view is None else view, dtype=dtype)
+
+
+def _bar_file_rows_query(new_only: bool) -> str:
+    """
+    SELECT of a symbol's bars of one source and timeframe, as (id,
+    timestamp, OHLCV, halt_period) in timestamp order: session bars through
+    their trade days, halt bars through their halt keys. With new_only,
+    only bars with an id above :max_bar_id, found from the id range.
+    """
+    if new_only:
+        # CROSS JOIN keeps bars as the outer loop, scanning only the new ids
+        session_bars = """
+            FROM bars b CROSS JOIN trade_days td
+            WHERE b.id > :max_bar_id AND td.id = b.trade_day_id"""
+        halt_bars = "FROM bars b WHERE b.id > :max_bar_id AND"
+    else:
+        session_bars = """
+            FROM trade_days td JOIN bars b ON b.trade_day_id = td.id
+            WHERE 1"""
+        halt_bars = "FROM bars b WHERE"
+    columns = "b.id, b.timestamp, b.open, b.high, b.low, b.close, b.volume, b.halt_period"
+    return f"""
+        SELECT {columns} {session_bars}
+            AND td.symbol = :symbol AND td.source = :source AND b.timeframe = :timeframe
+        UNION ALL
+        SELECT {columns} {halt_bars} b.halt_period = 1
+            AND b.halt_symbol = :symbol AND b.halt_source = :source AND b.timeframe = :timeframe
+        ORDER BY timestamp
+    """
+
+
+def _pack_bar_rows(rows: list) -> bytes:
+    """Pack (id, timestamp, OHLCV, halt_period) rows into BAR_RECORD records."""
+    pack = BAR_RECORD.pack
+    return b"".join([
+        pack(timestamp, o, h, l, c, v, BAR_FLAG_HALT if halt else 0)
+        for _, timestamp, o, h, l, c, v, halt in rows
+    ])
+
+
+def _sync_bar_file(cursor: sqlite3.Cursor, path: str, symbol: str, source: str, timeframe: int) -> str:
+    """
+    Bring a bar file up to date with the bars table. Bars newer than the
+    file's last timestamp are appended in place; anything else (a missing
+    or foreign file, or a backfill before the last timestamp) rewrites the
+    file and swaps it in atomically.
+    
+    Returns "current", "appended" or "rebuilt".
+    """
+    params = {"symbol": symbol, "source": source, "timeframe": timeframe}
+    header = None
+    if os.path.exists(path):
+        with open(path, 'rb') as f:
+            data = f.read(_BAR_FILE_HEADER.size)
+        if len(data) == _BAR_FILE_HEADER.size and data.startswith(_BAR_FILE_MAGIC):
+            header = _BAR_FILE_HEADER.unpack(data)
+    
+    if header is not None:
+        _, count, max_bar_id, last_timestamp, _ = header
+        cursor.execute(_bar_file_rows_query(new_only=True), {**params, "max_bar_id": max_bar_id})
+        rows = cursor.fetchall()
+        if not rows:
+            return "current"
+        if rows[0][1] > last_timestamp:
+            # Records first, then the header that makes them visible
+            with open(path, 'r+b') as f:
+                f.seek(_BAR_FILE_HEADER.size + count * BAR_RECORD.size)
+                f.write(_pack_bar_rows(rows))
+                f.truncate()
+                f.seek(0)
+                f.write(_BAR_FILE_HEADER.pack(
+                    _BAR_FILE_MAGIC, count + len(rows), max(max_bar_id, max(row[0] for row in rows)),
+                    rows[-1][1], timeframe
+                ))
+            return "appended"
+    
+    count = max_bar_id = last_timestamp = 0
+    cursor.execute(_bar_file_rows_query(new_only=False), params)
+    with open(path + ".tmp", 'wb') as f:
+        f.write(bytes(_BAR_FILE_HEADER.size))
+        while True:
+            rows = cursor.fetchmany(ITER_BATCH_SIZE)
+            if not rows:
+                break
+            f.write(_pack_bar_rows(rows))
+            count += len(rows)
+            max_bar_id = max(max_bar_id, max(row[0] for row in rows))
+            last_timestamp = rows[-1][1]
+        f.seek(0)
+        f.write(_BAR_FILE_HEADER.pack(_BAR_FILE_MAGIC, count, max_bar_id, last_timestamp, timeframe))
+    os.replace(path + ".tmp", path)
+    return "rebuilt"
+
+
+class BarCache:
+    """
+    Size-capped LRU cache of get_bars results (ArchiveServer also keeps
+    its encoded responses in one, with the ETag as generations).
+    
+    Each entry remembers the (trade_day_id, generation) pairs of the trade
+    days it covers. A lookup with different pairs - a trade day gained bars,
+    or a new trade day appeared in range - drops the entry, so results are
+    never stale, even after ingests from other processes. Sizes are
+    estimated from the result dicts.
+    """
+    
+    def __init__(self, max_bytes: int):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+        self._entries = OrderedDict()  # key -> (generations, bars, size)
+        self._lock = threading.Lock()
+    
+    def get(self, key: tuple, generations: tuple) -> Optional[list]:
+        """Returns the cached bars for key if still current, else None."""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] != generations:
+                self._discard(key)
+                self.invalidations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[1]
+    
+    def put(self, key: tuple, generations: tuple, bars: list, size: Optional[int] = None) -> None:
+        """
+        Stores bars for key, evicting least recently used entries to fit.
+        size overrides the estimate, for values other than get_bars results.
+        """
+        if size is None:
+            size = _estimate_bars_size(bars)
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            if key in self._entries:
+                self._discard(key)
+            self._entries[key] = (generations, bars, size)
+            self.bytes += size
+            while self.bytes > self.max_bytes:
+                self._discard(next(iter(self._entries)))
+                self.evictions += 1
+    
+    def clear(self) -> None:
+        """Drops every entry; the counters are kept."""
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+    
+    def stats(self) -> dict:
+        """Counters: hits, misses, evictions, invalidations, entries, bytes, max_bytes."""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "invalidations": self.invalidations,
+                "entries": len(self._entries),
+                "bytes": self.bytes,
+                "max_bytes": self.max_bytes
+            }
+    
+    def _discard(self, key: tuple) -> None:
+        self.bytes -= self._entries.pop(key)[2]
+
+
+def _estimate_bars_size(bars: list) -> int:
+    """Approximate memory held by a list of get_bars dicts."""
+    if not bars:
+        return sys.getsizeof(bars)
+    first = bars[0]
+    per_bar = sys.getsizeof(first) + sum(sys.getsizeof(v) for k, v in first.items() if k != "raw_json")
+    size = sys.getsizeof(bars) + per_bar * len(bars)
+    if "raw_json" in first:
+        size += sum(sys.getsizeof(bar["raw_json"]) for bar in bars)
+    return size
+
+
+def _check_checkpoint_mode(mode: str) -> None:
+    """Raise ValueError for an unknown WAL checkpoint mode."""
+    if mode not in WAL_CHECKPOINT_MODES:
+        raise ValueError(
+            f"Unknown checkpoint mode '{mode}'. "
+            f"Expected one of: {', '.join(WAL_CHECKPOINT_MODES)}"
+        )
+
+
+class Archive:
+    """
+    A market data archive backed by one SQLite database file.
+    
+    Each thread gets its own connection, opened on first use and reused by
+    every later call from that thread, with ARCHIVE_PRAGMAS applied once
+    (journal_mode on its first write). Keep one Archive around for repeated queries; the module-level
+    functions open a short-lived Archive per call. In WAL mode (the
+    default) readers on other connections are not blocked by an ingest.
+    
+    Usage:
+        with Archive("market_data.db") as archive:
+            archive.init_database()
+            bars = archive.get_bars("MNQ", session_date="2026-02-06")
+    """
+    
+    def __init__(
+        self,
+        db_path: str = "market_data.db",
+        pragmas: Optional[dict] = None,
+        checkpoint_mode: Optional[str] = "PASSIVE",
+        cache_bytes: int = 0,
+        bar_file_dir: Optional[str] = None
+    ):
+        """
+        Args:
+            db_path: SQLite database file
+            pragmas: Overrides for ARCHIVE_PRAGMAS; a value of None skips that pragma
+            checkpoint_mode: WAL checkpoint run after every ingest (one of
+                WAL_CHECKPOINT_MODES), or None to rely on wal_autocheckpoint only
+            cache_bytes: Memory cap for the get_bars result cache (see
+                BarCache); 0 disables caching
+            bar_file_dir: Directory of memory-mapped bar files (see
+                BarFile), kept current by every ingest through this
+                archive; None disables them
+        """
+        if checkpoint_mode is not None:
+            _check_checkpoint_mode(checkpoint_mode)
+        self.db_path = db_path
+        self.pragmas = {**ARCHIVE_PRAGMAS, **(pragmas or {})}
+        self.checkpoint_mode = checkpoint_mode
+        self.cache = BarCache(cache_bytes) if cache_bytes > 0 else None
+        self.bar_file_dir = bar_file_dir
+        self._bar_files = {}
+        self._local = threading.local()
+        self._connections = []
+        self._lock = threading.Lock()
+    
+    def connection(self, write: bool = False) -> sqlite3.Connection:
+        """
+        Returns the calling thread's connection, opening it if needed.
+        
+        journal_mode is stored in the database file, so it is only applied
+        by the first write=True call on a connection (init_database and the
+        ingest, import and annotation methods): queries alone never switch
+        an existing rollback-journal database to WAL.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # Each connection is only used by the thread that opened it;
+            # check_same_thread=False just lets close() run from any thread
+            conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            for name, value in self.pragmas.items():
+                if value is not None and name != "journal_mode":
+                    conn.execute(f"PRAGMA {name} = {value}")
+            self._local.conn = conn
+            self._local.journal_mode_set = False
+            with self._lock:
+                self._connections.append(conn)
+        if write and not self._local.journal_mode_set:
+            if self.pragmas.get("journal_mode") is not None:
+                conn.execute(f"PRAGMA journal_mode = {self.pragmas['journal_mode']}")
+            self._local.journal_mode_set = True
+        return conn
+    
+    def close(self) -> None:
+        """Closes every pooled connection. The archive can be used again afterwards."""
+        with self._lock:
+            connections, self._connections = self._connections, []
+        for conn in connections:
+            conn.close()
+        self._local = threading.local()
+    
+    def checkpoint(self, mode: str = "PASSIVE") -> tuple:
+        """
+        Copies committed WAL content back into the database file.
+        
+        PASSIVE never waits; FULL and RESTART wait for readers, TRUNCATE also
+        shrinks the WAL file to zero bytes. Has no effect unless the database
+        is in WAL mode.
+        
+        Returns:
+            (busy, wal_frames, checkpointed_frames) as reported by SQLite
+        """
+        _check_checkpoint_mode(mode)
+        return self.connection().execute(f"PRAGMA wal_checkpoint({mode})").fetchone()
+    
+    def _checkpoint_after_ingest(self) -> None:
+        if self.checkpoint_mode:
+            self.checkpoint(self.checkpoint_mode)
+    
+    def _bar_file_path(self, symbol: str, source: str, timeframe: int) -> str:
+        if self.bar_file_dir is None:
+            raise ValueError("Bar files are disabled; open the Archive with bar_file_dir")
+        return os.path.join(self.bar_file_dir, f"{symbol}.{source}.{timeframe}s.bars")
+    
+    def _sync_bar_files(self, keys) -> None:
+        """Append or rebuild the bar files of (symbol, source, timeframe) keys after an ingest."""
+        if self.bar_file_dir is None:
+            return
+        os.makedirs(self.bar_file_dir, exist_ok=True)
+        cursor = self.connection().cursor()
+        with self._lock:
+            for symbol, source, timeframe in keys:
+                _sync_bar_file(cursor, self._bar_file_path(symbol, source, timeframe), symbol, source, timeframe)
+        cursor.connection.commit()
+    
+    def __enter__(self) -> "Archive":
+        return self
+    
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+    
+    def init_database(self) -> None:
+        """
+        Creates the database and tables if they don't exist.
+        Safe to call repeatedly (idempotent).
+        """
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        
+        try:
+            # Create trade_days table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS trade_days (
+                    id INTEGER PRIMARY KEY,
+                    symbol TEXT,
+                    session_date TEXT,
+                    source TEXT,
+                    UNIQUE(symbol, session_date, source)
+                )
+            """)
+            
+            # Create bars table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS bars (
+                    id INTEGER PRIMARY KEY,
+                    trade_day_id INTEGER,
+                    timestamp INTEGER,
+                    open REAL,
+                    high REAL,
+                    low REAL,
+                    close REAL,
+                    volume REAL,
+                    halt_period INTEGER,
+                    raw_json TEXT,
+                    FOREIGN KEY(trade_day_id) REFERENCES trade_days(id)
+                )
+            """)
+            
+            # Create day_annotations table
+            cursor.execute("""
+                CREATE TABLE IF NOT EXISTS day_annotations (
+                    id INTEGER PRIMARY KEY,
+                    trade_day_id INTEGER,
+                    annotation_type TEXT,
+                    content TEXT,
+                    tags TEXT,
+                    source TEXT,
+                    created_at INTEGER,
+                    supersedes_id INTEGER,
+                    status TEXT DEFAULT 'active',
+                    FOREIGN KEY(trade_day_id) REFERENCES trade_days(id),
+                    FOREIGN KEY(supersedes_id) REFERENCES day_annotations(id)
+                )
+            """)
+            
+            _migrate_schema(cursor)
+            
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+    
+    def ingest_csv(
+        self,
+        file_path: str,
+        symbol: str,
+        timeframe: str,
+        source: str = "tradingview",
+        bulk: bool = False,
+        chunk_size: int = BULK_CHUNK_SIZE,
+        raw_storage: str = "inline",
+        commit_every: Optional[int] = None,
+        incremental: bool = False,
+        overlap_seconds: int = INCREMENTAL_OVERLAP_SECONDS,
+        force: bool = False
+    ) -> dict:
+        """
+        Ingests a CSV file of market data into the database.
+        
+        Returns:
+            {
+                "inserted": N,
+                "skipped": M,
+                "conflicts": K,
+                "conflict_details": [...]
+            }
+        
+        Behavior:
+            - Reads CSV and validates structure
+            - For each bar, determine trade_day using assignment rules
+            - Insert with ON CONFLICT DO NOTHING on the bar key
+              (trade_day_id, timeframe, timestamp), or for halt bars
+              (halt_symbol, halt_source, timeframe, timestamp); on conflict,
+              compare with the stored bar
+            - If exact match: skip
+            - If conflict (different OHLCV): log warning and skip
+            - If new: insert
+            - Flag bars in halt period (2-3 PM PT) with halt_period=1
+            - Raise ValueError for Saturday data
+        
+        With bulk=True the file is processed in chunks of chunk_size rows:
+        trade days and existing bars are looked up once per chunk and new bars
+        are written with executemany. The result is the same as the row-by-row
+        path, but with a handful of statements per chunk instead of several
+        per row.
+        
+        raw_storage selects how each bar's raw_json is kept (see
+        RAW_STORAGE_POLICIES): inline text, a compressed blob, a row in the
+        bar_raw side table, or not at all.
+        
+        By default the whole file is one transaction. With commit_every=N the
+        ingest commits every N rows, so a long ingest does not hold back WAL
+        readers and each reader sees a consistent prefix of the file. If the
+        ingest fails, the chunks committed before the error stay; re-running
+        the file skips them.
+        
+        With incremental=True, for re-exports that overlap what is already
+        stored: the latest stored bar of this symbol, source and timeframe is
+        looked up, and a binary search over the file's byte offsets skips
+        every row older than overlap_seconds before it. Only that overlap
+        window is re-checked (and counted as skipped or conflicts); the rows
+        before it are never read. Requires the CSV to be sorted by time.
+        Compressed files cannot seek, so their older rows are decompressed
+        and dropped instead of skipped over.
+        
+        file_path may be compressed (.gz, .bz2, .xz, or .zst with the
+        zstandard package installed); it is decompressed as a stream, with no
+        temporary file. It may also be a directory or a glob pattern (see
+        expand_csv_inputs): the files are then ingested one by one, oldest
+        first, and the result adds a "files" list as in ingest_many.
+        
+        Every ingested file is recorded in the ingest_files ledger with its
+        size, mtime, SHA-256 content hash and result. A file whose content
+        was already ingested for this symbol, source and timeframe is only
+        hashed, not parsed: bars are not touched, and the result is what a
+        re-run would report (the earlier inserts as skipped, the earlier
+        conflicts again), marked "replayed": True. If the recorded run was
+        incremental, the replay also has "incremental": True and its counts
+        cover only that run's overlap window. force=True re-verifies the
+        file row by row regardless.
+        """
+        _check_raw_storage(raw_storage)
+        _check_commit_every(commit_every)
+        timeframe_seconds = parse_timeframe(timeframe)
+        if overlap_seconds < 0:
+            raise ValueError(f"overlap_seconds must not be negative, got {overlap_seconds}")
+        
+        file_path = os.fspath(file_path)
+        if _is_multi_input(file_path):
+            report = _new_ingest_stats()
+            report["files"] = []
+            for path in expand_csv_inputs(file_path, source):
+                stats = self.ingest_csv(
+                    path, symbol, timeframe, source, bulk, chunk_size, raw_storage, commit_every,
+                    incremental, overlap_seconds, force
+                )
+                _merge_ingest_stats(report, stats)
+                report["files"].append({"file": path, **stats})
+            return report
+        
+        fingerprint = _file_fingerprint(file_path)
+        
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        
+        try:
+            # Duplicate detection relies on the unique bar keys
+            _migrate_schema(cursor)
+            
+            previous = None if force else _ledger_stats(cursor, fingerprint, symbol, source, timeframe_seconds)
+            if previous is not None:
+                conn.commit()
+                return _replay_ingest_stats(previous, file_path)
+            
+            start_offset = None
+            after_timestamp = None
+            if incremental:
+                last_timestamp = _last_stored_timestamp(cursor, symbol, source, timeframe_seconds)
+                if last_timestamp is not None and _is_compressed(file_path):
+                    after_timestamp = last_timestamp - overlap_seconds
+                elif last_timestamp is not None:
+                    start_offset = _csv_offset_after(file_path, source, last_timestamp - overlap_seconds)
+            
+            if bulk:
+                stats = _ingest_csv_chunks(
+                    cursor, file_path, symbol, source, timeframe_seconds, chunk_size, raw_storage, commit_every,
+                    start_offset, after_timestamp
+                )
+            else:
+                stats = _ingest_csv_rows(
+                    cursor, file_path, symbol, source, timeframe_seconds, raw_storage, commit_every,
+                    start_offset, after_timestamp
+                )
+            
+            _record_ingested_file(
+                cursor, file_path, fingerprint, symbol, source, timeframe_seconds, stats,
+                start_offset is not None or after_timestamp is not None
+            )
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        if stats["inserted"]:
+            self._sync_bar_files([(symbol, source, timeframe_seconds)])
+        self._checkpoint_after_ingest()
+        return stats
+    
+    def ingest_many(
+        self,
+        file_paths: list[str],
+        symbol: str,
+        timeframe: str,
+        source: str = "tradingview",
+        workers: Optional[int] = None,
+        raw_storage: str = "inline",
+        commit_every: Optional[int] = None,
+        force: bool = False
+    ) -> dict:
+        """
+        Ingests several CSV files of the same symbol and timeframe.
+        
+        Parsing, timestamp conversion, trade-day resolution and raw_json
+        building run in a process pool of `workers` processes (default: CPU
+        count; 1 runs everything in this process). This process is the only
+        SQLite writer: it applies the normalized files in input order, one
+        transaction per file (or per commit_every rows), so results match
+        calling ingest_csv on each file in turn.
+        
+        Files are hashed first; those already in the ingest_files ledger for
+        this symbol, source and timeframe are not parsed (unless force=True),
+        as in ingest_csv.
+        
+        Entries may be compressed files, directories or glob patterns; they
+        are expanded with expand_csv_inputs before parsing.
+        
+        Returns:
+            {
+                "inserted": N,
+                "skipped": M,
+                "conflicts": K,
+                "conflict_details": [...],
+                "files": [{"file": path, "inserted": ..., ...}, ...]
+            }
+        
+        Raises ValueError for Saturday data. Files before the failing one stay
+        committed.
+        """
+        _check_raw_storage(raw_storage)
+        _check_commit_every(commit_every)
+        timeframe_seconds = parse_timeframe(timeframe)
+        if workers is None:
+            workers = os.cpu_count() or 1
+        file_paths = expand_csv_inputs(file_paths, source)
+        
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        
+        report = _new_ingest_stats()
+        report["files"] = []
+        trade_day_ids = {}
+        
+        def add_to_report(file_path, stats):
+            _merge_ingest_stats(report, stats)
+            report["files"].append({"file": file_path, **stats})
+        
+        def write(file_path, batch):
+            stats = _new_ingest_stats()
+            for rows in _slice_batch(batch, commit_every) if commit_every else [batch]:
+                _write_bar_batch(
+                    cursor, rows, symbol, source, timeframe_seconds, file_path, stats, trade_day_ids, raw_storage
+                )
+                conn.commit()
+            _record_ingested_file(
+                cursor, file_path, fingerprints[file_path], symbol, source, timeframe_seconds, stats
+            )
+            conn.commit()
+            add_to_report(file_path, stats)
+        
+        try:
+            _migrate_schema(cursor)
+            conn.commit()
+            
+            # Files already in the ledger are replayed in place, without parsing
+            fingerprints = {}
+            replayed = {}
+            for file_path in file_paths:
+                fingerprints[file_path] = _file_fingerprint(file_path)
+                previous = None if force else _ledger_stats(
+                    cursor, fingerprints[file_path], symbol, source, timeframe_seconds
+                )
+                if previous is not None:
+                    replayed[file_path] = _replay_ingest_stats(previous, file_path)
+            to_parse = [file_path for file_path in file_paths if file_path not in replayed]
+            
+            def parsed_batches():
+                if workers <= 1:
+                    for file_path in to_parse:
+                        yield _normalize_csv_file(file_path, source, raw_storage)
+                    return
+                with ProcessPoolExecutor(max_workers=workers) as executor:
+                    # Keep a bounded window of files in flight; yield in input order
+                    pending = deque()
+                    paths = iter(to_parse)
+                    for file_path in paths:
+                        pending.append(executor.submit(_normalize_csv_file, file_path, source, raw_storage))
+                        if len(pending) >= 2 * workers:
+                            break
+                    while pending:
+                        batch = pending.popleft().result()
+                        next_path = next(paths, None)
+                        if next_path is not None:
+                            pending.append(executor.submit(_normalize_csv_file, next_path, source, raw_storage))
+                        yield batch
+            
+            batches = parsed_batches()
+            try:
+                for file_path in file_paths:
+                    if file_path in replayed:
+                        add_to_report(file_path, replayed[file_path])
+                    else:
+                        write(file_path, next(batches))
+            finally:
+                batches.close()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        if report["inserted"]:
+            self._sync_bar_files([(symbol, source, timeframe_seconds)])
+        self._checkpoint_after_ingest()
+        return report
+    
+    def save_day_annotation(
+        self,
+        symbol: str,
+        session_date: str,
+        content: str,
+        annotation_type: str = "observation",
+        tags: Optional[list[str]] = None,
+        source: str = "manual",
+        supersedes_id: Optional[int] = None
+    ) -> int:
+        """
+        Saves an annotation for a specific trade day.
+        
+        Returns:
+            The ID of the newly created annotation.
+        
+        Behavior:
+            - Find or create trade_day record
+            - Insert annotation
+            - If supersedes_id provided, mark old annotation as 'superseded'
+            - Store tags as JSON string, and one annotation_tags row per tag
+            - Index the content for search_annotations
+        """
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        
+        try:
+            _migrate_schema(cursor)
+            
+            # Get or create trade day (assuming tradingview source by default)
+            trade_day_id = get_or_create_trade_day(symbol, session_date, "tradingview", cursor)
+            
+            # Convert tags to JSON
+            tags_json = json.dumps(tags if tags else [])
+            
+            # Get current timestamp
+            created_at = int(datetime.datetime.now(tz=PT_TIMEZONE).timestamp())
+            
+            # Insert annotation
+            cursor.execute(
+                """INSERT INTO day_annotations 
+                   (trade_day_id, annotation_type, content, tags, source, created_at, supersedes_id, status)
+                   VALUES (?, ?, ?, ?, ?, ?, ?, 'active')""",
+                (trade_day_id, annotation_type, content, tags_json, source, created_at, supersedes_id)
+            )
+            
+            annotation_id = cursor.lastrowid
+            
+            # Index the tags for get_day_annotations
+            if tags:
+                cursor.executemany(
+                    "INSERT OR IGNORE INTO annotation_tags (annotation_id, tag) VALUES (?, ?)",
+                    [(annotation_id, tag) for tag in tags]
+                )
+            
+            # Index the content for search_annotations
+            cursor.execute(
+                "INSERT INTO annotation_fts (rowid, content) VALUES (?, ?)",
+                (annotation_id, content)
+            )
+            
+            # If supersedes another annotation, mark the old one as superseded
+            if supersedes_id:
+                cursor.execute(
+                    "UPDATE day_annotations SET status = 'superseded' WHERE id = ?",
+                    (supersedes_id,)
+                )
+            
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        return annotation_id
+    
+    def save_day_annotations_bulk(self, records: list[dict]) -> list[int]:
+        """
+        Saves many annotations in one transaction.
+        
+        Each record is a dictionary with the save_day_annotation arguments:
+        symbol, session_date and content (required), and annotation_type,
+        tags, source and supersedes_id (optional). A record may instead give
+        supersedes_index, the position of an earlier record in the same batch
+        that it replaces, so supersede chains can be written in one call.
+        
+        Returns:
+            The IDs of the new annotations, in input order.
+        
+        Behavior:
+            - Resolves (and creates) all trade days with one query per symbol
+            - Inserts each annotation with its own INSERT, so its id is the
+              statement's lastrowid; tags and search index rows use executemany
+            - Marks every superseded annotation with a single UPDATE
+            - Commits once; on error nothing is saved
+        
+        Raises:
+            ValueError: for a record with missing or unknown fields, or a
+                supersedes_index that does not point to an earlier record
+        """
+        normalized = []
+        for i, record in enumerate(records):
+            unknown = set(record) - set(ANNOTATION_RECORD_DEFAULTS) - {"symbol", "session_date", "content"}
+            if unknown:
+                raise ValueError(f"Annotation record {i} has unknown fields: {', '.join(sorted(unknown))}")
+            missing = [name for name in ("symbol", "session_date", "content") if name not in record]
+            if missing:
+                raise ValueError(f"Annotation record {i} is missing: {', '.join(missing)}")
+            record = {**ANNOTATION_RECORD_DEFAULTS, **record}
+            index = record["supersedes_index"]
+            if index is not None:
+                if not 0 <= index < i:
+                    raise ValueError(
+                        f"Annotation record {i} has supersedes_index {index}; "
+                        f"it must point to an earlier record"
+                    )
+                if record["supersedes_id"] is not None:
+                    raise ValueError(f"Annotation record {i} has both supersedes_id and supersedes_index")
+            normalized.append(record)
+        
+        if not normalized:
+            return []
+        
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        
+        try:
+            _migrate_schema(cursor)
+            
+            # Resolve every trade day up front (tradingview source, as in save_day_annotation)
+            dates_by_symbol = {}
+            for record in normalized:
+                dates_by_symbol.setdefault(record["symbol"], set()).add(record["session_date"])
+            trade_day_ids = {}
+            for symbol, session_dates in dates_by_symbol.items():
+                ids = {}
+                _resolve_trade_day_ids(cursor, symbol, "tradingview", session_dates, ids)
+                trade_day_ids.update(((symbol, d), trade_day_id) for d, trade_day_id in ids.items())
+            
+            # One INSERT per record, taking each id from lastrowid: rowids of
+            # a batch need not be consecutive. Earlier ids are known by the
+            # time a record's supersedes_index is resolved.
+            created_at = int(datetime.datetime.now(tz=PT_TIMEZONE).timestamp())
+            annotation_ids = []
+            superseded_ids = []
+            for r in normalized:
+                supersedes_id = r["supersedes_id"]
+                if r["supersedes_index"] is not None:
+                    supersedes_id = annotation_ids[r["supersedes_index"]]
+                cursor.execute(
+                    """INSERT INTO day_annotations 
+                       (trade_day_id, annotation_type, content, tags, source, created_at, supersedes_id, status)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 'active')""",
+                    (
+                        trade_day_ids[(r["symbol"], r["session_date"])], r["annotation_type"], r["content"],
+                        json.dumps(r["tags"] if r["tags"] else []), r["source"], created_at, supersedes_id
+                    )
+                )
+                annotation_ids.append(cursor.lastrowid)
+                if supersedes_id is not None:
+                    superseded_ids.append(supersedes_id)
+            
+            cursor.executemany(
+                "INSERT OR IGNORE INTO annotation_tags (annotation_id, tag) VALUES (?, ?)",
+                [
+                    (annotation_id, tag)
+                    for r, annotation_id in zip(normalized, annotation_ids)
+                    for tag in r["tags"] or ()
+                ]
+            )
+            cursor.executemany(
+                "INSERT INTO annotation_fts (rowid, content) VALUES (?, ?)",
+                [(annotation_id, r["content"]) for r, annotation_id in zip(normalized, annotation_ids)]
+            )
+            
+            # Everything the batch supersedes, in one statement
+            if superseded_ids:
+                cursor.execute(
+                    """UPDATE day_annotations SET status = 'superseded'
+                       WHERE id IN (SELECT value FROM json_each(?))""",
+                    (json.dumps(superseded_ids),)
+                )
+            
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        return annotation_ids
+    
+    def get_bars(
+        self,
+        symbol: str,
+        session_date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        with_raw: bool = False
+    ) -> list[dict]:
+        """
+        Queries bars from the database.
+        
+        Returns:
+            List of bar dictionaries with all fields. "raw_json" is only
+            included (decoded to JSON text, whatever the storage policy) when
+            with_raw=True.
+        
+        Behavior:
+            - Default: filters WHERE halt_period = 0
+            - Joins with trade_days to include session_date in results
+            - Can query single day or date range
+            - timeframe ("1m", "15m", "1h", ...), per trade day: stored bars
+              of that timeframe if the day has any, otherwise resampled from
+              the day's finest stored timeframe (resampled bars have id
+              None). Default: each day's finest stored timeframe.
+            - include_halt=True adds the symbol's halt bars (session_date
+              None) from the halt after each requested trade day
+            - With a cache (Archive(cache_bytes=...)), repeated queries are
+              served from memory until ingest adds bars to one of their trade
+              days
+        """
+        cursor = self.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        if self.cache is not None:
+            key = (symbol, source, session_date, start_date, end_date, timeframe, include_halt, with_raw)
+            generations = _bar_generations(cursor, symbol, session_date, start_date, end_date, include_halt, source)
+            cached = self.cache.get(key, generations)
+            if cached is not None:
+                return [dict(bar) for bar in cached]
+        
+        query, params = _bars_query(
+            cursor, symbol, session_date, start_date, end_date, timeframe, include_halt, source, with_raw
+        )
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        # Convert to list of dictionaries
+        result = []
+        for row in rows:
+            bar = {
+                "id": row["id"],
+                "timestamp": row["timestamp"],
+                "open": row["open"],
+                "high": row["high"],
+                "low": row["low"],
+                "close": row["close"],
+                "volume": row["volume"],
+                "halt_period": bool(row["halt_period"]),
+                "session_date": row["session_date"]
+            }
+            if with_raw:
+                bar["raw_json"] = decode_raw_json(row["raw_json"])
+            result.append(bar)
+        
+        if self.cache is not None:
+            # Generations were read first: if an ingest landed in between,
+            # the next lookup just misses
+            self.cache.put(key, generations, [dict(bar) for bar in result])
+        
+        return result
+    
+    def iter_bars(
+        self,
+        symbol: str,
+        session_date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        with_raw: bool = False,
+        batch_size: int = ITER_BATCH_SIZE,
+        by_session: bool = False
+    ) -> Iterator:
+        """
+        Streams bars with the same filters and order as get_bars.
+        
+        Rows are fetched batch_size at a time and yielded as Bar tuples, so
+        memory stays flat however long the date range is. With
+        by_session=True, yields (session_date, [Bar, ...]) once per trade
+        day instead (and (None, [Bar, ...]) per halt with include_halt).
+        
+        The query runs in one read transaction, so the stream is a
+        consistent snapshot even while an ingest commits.
+        """
+        cursor = self.connection().cursor()
+        query, params = _bars_query(
+            cursor, symbol, session_date, start_date, end_date, timeframe, include_halt, source, with_raw
+        )
+        
+        try:
+            cursor.execute(query, params)
+            bars = _iter_bar_records(cursor, batch_size, with_raw)
+            if not by_session:
+                yield from bars
+                return
+            
+            session_bars = []
+            for bar in bars:
+                if session_bars and bar.session_date != session_bars[-1].session_date:
+                    yield session_bars[-1].session_date, session_bars
+                    session_bars = []
+                session_bars.append(bar)
+            if session_bars:
+                yield session_bars[-1].session_date, session_bars
+        finally:
+            cursor.close()
+    
+    def get_bars_columnar(
+        self,
+        symbol: str,
+        session_date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        batch_size: int = ITER_BATCH_SIZE
+    ) -> BarColumns:
+        """
+        Queries bars like get_bars, but returns them as a BarColumns of
+        typed arrays instead of a list of dicts.
+        
+        Rows go straight from fetchmany batches into the column buffers;
+        no per-bar dict or object is built. Use to_numpy() or to_pandas()
+        on the result for zero-copy analytics.
+        """
+        cursor = self.connection().cursor()
+        query, params = _bars_query(
+            cursor, symbol, session_date, start_date, end_date, timeframe, include_halt, source, False
+        )
+        
+        columns = BarColumns()
+        codes = {None: -1}
+        
+        def session_code(date):
+            code = codes.get(date)
+            if code is None:
+                code = codes[date] = len(columns.session_dates)
+                columns.session_dates.append(date)
+            return code
+        
+        try:
+            cursor.execute(query, params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                _, timestamps, opens, highs, lows, closes, volumes, halts, dates = zip(*rows)
+                columns.timestamp.extend(timestamps)
+                columns.open.extend(opens)
+                columns.high.extend(highs)
+                columns.low.extend(lows)
+                columns.close.extend(closes)
+                columns.volume.extend(volumes)
+                columns.halt_period.extend(halts)
+                columns.session_code.extend(map(session_code, dates))
+        finally:
+            cursor.close()
+        
+        return columns
+    
+    def export_bars(
+        self,
+        symbol: str,
+        path: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        format: str = "auto",
+        batch_size: int = ITER_BATCH_SIZE
+    ) -> dict:
+        """
+        Exports bars to columnar files under path, one per trade day:
+        
+            path/symbol=<symbol>/session_date=<YYYY-MM-DD>/<source>-<timeframe>s.<parquet|bars>
+        
+        Bars are selected as in get_bars (a resampled timeframe is exported
+        as resampled) and streamed batch_size rows at a time, so memory
+        holds one trade day whatever the range. Halt bars (include_halt=True)
+        go into the file of the trade day they follow. Files are written
+        to temporaries and replace existing ones only once every trade day
+        is written; if the export fails, the temporaries and the directories
+        it created are removed and the exception propagates.
+        
+        format is "parquet" (requires pyarrow), "columnar" (the built-in
+        format, see _write_columnar_file) or "auto": parquet when pyarrow is
+        installed. Each file records symbol, source, session_date and
+        timeframe, so import_bars needs nothing else.
+        
+        Returns:
+            {"format": ..., "bars": N, "files": [path, ...]}
+        """
+        format = _check_export_format(format)
+        write_file = _write_parquet_file if format == "parquet" else _write_columnar_file
+        
+        cursor = self.connection().cursor()
+        query, params = _bars_query(
+            cursor, symbol, None, start_date, end_date, timeframe, include_halt, source, False
+        )
+        # File per partition date, settled before anything is written
+        file_paths = {
+            session_date: os.path.join(
+                path, f"symbol={symbol}", f"session_date={session_date}",
+                f"{source}-{seconds}s{EXPORT_SUFFIXES[format]}"
+            )
+            for session_date, seconds in params["timeframes"].items()
+        }
+        report = {"format": format, "bars": 0, "files": []}
+        created = []  # directories made by this export, parents first
+        
+        try:
+            cursor.execute(query, params)
+            for session_date, columns in _iter_bar_partitions(cursor, batch_size):
+                file_path = file_paths[session_date]
+                directory = os.path.dirname(file_path)
+                missing = []
+                while directory and not os.path.isdir(directory):
+                    missing.append(directory)
+                    directory = os.path.dirname(directory)
+                for directory in reversed(missing):
+                    os.mkdir(directory)
+                    created.append(directory)
+                metadata = {
+                    "symbol": symbol, "source": source, "timeframe": params["timeframes"][session_date],
+                    "session_date": session_date
+                }
+                report["files"].append(file_path)
+                write_file(file_path + ".tmp", metadata, columns)
+                report["bars"] += len(columns["timestamp"])
+            # Replace each file atomically, so readers never see a partial one
+            for file_path in report["files"]:
+                os.replace(file_path + ".tmp", file_path)
+        except BaseException:
+            for file_path in report["files"]:
+                if os.path.exists(file_path + ".tmp"):
+                    os.remove(file_path + ".tmp")
+            for directory in reversed(created):
+                os.rmdir(directory)
+            raise
+        finally:
+            cursor.close()
+        
+        return report
+    
+    def import_bars(self, path: str, commit_every: Optional[int] = None) -> dict:
+        """
+        Bulk-loads files written by export_bars (a file, or a directory
+        searched recursively) into the archive.
+        
+        Symbol, source and timeframe come from each file. Trade days and
+        halt flags are resolved again from the timestamps, and bars go
+        through the same set-based duplicate and conflict checks as
+        ingest_csv(bulk=True): re-importing skips every bar. Each file is
+        one transaction (or one per commit_every bars); files are loaded
+        one at a time, so memory holds one trade day.
+        
+        Returns:
+            The ingest_many summary: "inserted", "skipped", "conflicts",
+            "conflict_details" and a "files" list of per-file statistics.
+        
+        Raises ValueError for Saturday bars or a file that is not an export.
+        """
+        _check_commit_every(commit_every)
+        if os.path.isdir(path):
+            file_paths = sorted(
+                os.path.join(directory, name)
+                for directory, _, names in os.walk(path)
+                for name in names
+                if name.endswith(tuple(EXPORT_SUFFIXES.values()))
+            )
+        else:
+            file_paths = [path]
+        
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        report = _new_ingest_stats()
+        report["files"] = []
+        # Trade day ids resolved so far, per (symbol, source)
+        trade_day_ids = {}
+        # Bar files to bring up to date: (symbol, source, timeframe)
+        changed = set()
+        
+        try:
+            _migrate_schema(cursor)
+            conn.commit()
+            for file_path in file_paths:
+                if file_path.endswith(EXPORT_SUFFIXES["parquet"]):
+                    metadata, columns = _read_parquet_file(file_path)
+                else:
+                    metadata, columns = _read_columnar_file(file_path)
+                symbol, source = metadata["symbol"], metadata["source"]
+                
+                timestamps = list(columns["timestamp"])
+                try:
+                    session_dates, _ = resolve_trade_days(timestamps)
+                except ValueError as e:
+                    raise ValueError(str(e) + f", File: {file_path}")
+                batch = {name: list(columns[name]) for name in OHLCV_FIELDS}
+                batch.update(timestamp=timestamps, session_date=session_dates, raw_json=[None] * len(timestamps))
+                
+                stats = _new_ingest_stats()
+                for rows in _slice_batch(batch, commit_every) if commit_every else [batch]:
+                    _write_bar_batch(
+                        cursor, rows, symbol, source, metadata["timeframe"], file_path, stats,
+                        trade_day_ids.setdefault((symbol, source), {}), "off"
+                    )
+                    conn.commit()
+                _merge_ingest_stats(report, stats)
+                report["files"].append({"file": file_path, **stats})
+                if stats["inserted"]:
+                    changed.add((symbol, source, metadata["timeframe"]))
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        self._sync_bar_files(sorted(changed))
+        self._checkpoint_after_ingest()
+        return report
+    
+    def bar_file(self, symbol: str, timeframe: str, source: str = "tradingview") -> BarFile:
+        """
+        The memory-mapped bar file of a symbol, source and timeframe (see
+        BarFile), synced with the bars table first: created if missing,
+        appended with bars ingested since (also by other processes), or
+        rebuilt after a backfill. Requires Archive(bar_file_dir=...).
+        
+        The BarFile is reused while the file does not change, so repeated
+        calls cost one indexed query for new bars.
+        """
+        timeframe_seconds = parse_timeframe(timeframe)
+        path = self._bar_file_path(symbol, source, timeframe_seconds)
+        os.makedirs(self.bar_file_dir, exist_ok=True)
+        
+        cursor = self.connection().cursor()
+        with self._lock:
+            _sync_bar_file(cursor, path, symbol, source, timeframe_seconds)
+            info = os.stat(path)
+            key = (symbol, source, timeframe_seconds)
+            cached = self._bar_files.get(key)
+            if cached is None or cached[0] != (info.st_ino, info.st_size, info.st_mtime_ns):
+                cached = self._bar_files[key] = ((info.st_ino, info.st_size, info.st_mtime_ns), BarFile(path))
+        cursor.connection.commit()
+        return cached[1]
+    
+    def sync_bar_file(self, symbol: str, timeframe: str, source: str = "tradingview") -> str:
+        """
+        Brings a bar file up to date with the bars table, as bar_file does,
+        without mapping it, and returns its path. Requires
+        Archive(bar_file_dir=...).
+        """
+        timeframe_seconds = parse_timeframe(timeframe)
+        path = self._bar_file_path(symbol, source, timeframe_seconds)
+        self._sync_bar_files([(symbol, source, timeframe_seconds)])
+        return path
+    
+    def check_bar_file(self, symbol: str, timeframe: str, source: str = "tradingview") -> dict:
+        """
+        Compares a bar file record by record with the bars table, without
+        syncing it first.
+        
+        Returns:
+            {
+                "consistent": bool,
+                "file_records": N,
+                "stored_bars": M,
+                "mismatches": K,           # positions whose records differ
+                "first_mismatch": timestamp or None
+            }
+        """
+        timeframe_seconds = parse_timeframe(timeframe)
+        path = self._bar_file_path(symbol, source, timeframe_seconds)
+        report = {"consistent": False, "file_records": 0, "stored_bars": 0, "mismatches": 0, "first_mismatch": None}
+        
+        cursor = self.connection().cursor()
+        cursor.execute(
+            _bar_file_rows_query(new_only=False),
+            {"symbol": symbol, "source": source, "timeframe": timeframe_seconds}
+        )
+        with BarFile(path) as bar_file:
+            records = BAR_RECORD.iter_unpack(bar_file.view())
+            report["file_records"] = len(bar_file)
+            while True:
+                rows = cursor.fetchmany(ITER_BATCH_SIZE)
+                if not rows:
+                    break
+                report["stored_bars"] += len(rows)
+                for row, record in zip(rows, records):
+                    _, timestamp, o, h, l, c, v, halt = row
+                    if record != (timestamp, o, h, l, c, v, BAR_FLAG_HALT if halt else 0):
+                        report["mismatches"] += 1
+                        if report["first_mismatch"] is None:
+                            report["first_mismatch"] = timestamp
+            del records
+        cursor.close()
+        
+        report["consistent"] = report["mismatches"] == 0 and report["file_records"] == report["stored_bars"]
+        return report
+    
+    def get_session_summaries(
+        self,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        source: str = "tradingview"
+    ) -> list[dict]:
+        """
+        Reads daily session statistics from the session_summary table.
+        
+        Returns:
+            One dictionary per trade day, in date order, with session_date,
+            open, high, low, close, volume, vwap, bar_count, first_timestamp
+            and last_timestamp. Halt bars are not included.
+        
+        Behavior:
+            - Reads one precomputed row per trade day; no bars are scanned
+            - timeframe selects which stored bars the summary is built from;
+              by default the finest timeframe stored for each trade day
+            - VWAP uses the typical price (high + low + close) / 3
+        """
+        cursor = self.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        query = """
+            SELECT td.session_date, s.*
+            FROM trade_days td
+            JOIN session_summary s ON s.trade_day_id = td.id
+            WHERE td.symbol = ? AND td.source = ?
+        """
+        params = [symbol, source]
+        
+        if start_date:
+            query += " AND td.session_date >= ?"
+            params.append(start_date)
+        if end_date:
+            query += " AND td.session_date <= ?"
+            params.append(end_date)
+        
+        if timeframe:
+            query += " AND s.timeframe = ?"
+            params.append(parse_timeframe(timeframe))
+        else:
+            query += " AND s.timeframe = (SELECT MIN(timeframe) FROM session_summary WHERE trade_day_id = td.id)"
+        
+        query += " ORDER BY td.session_date"
+        
+        cursor.execute(query, params)
+        
+        return [
+            {
+                "session_date": row["session_date"],
+                "open": row["open"],
+                "high": row["high"],
+                "low": row["low"],
+                "close": row["close"],
+                "volume": row["volume"],
+                "vwap": row["price_volume"] / row["volume"] if row["volume"] else None,
+                "bar_count": row["bar_count"],
+                "first_timestamp": row["first_timestamp"],
+                "last_timestamp": row["last_timestamp"]
+            }
+            for row in cursor.fetchall()
+        ]
+    
+    def rebuild_session_summaries(self, symbol: Optional[str] = None, source: Optional[str] = None) -> int:
+        """
+        Recomputes session_summary from the stored bars.
+        
+        Ingest keeps the table current on its own; use this after changing
+        bars by other means. symbol and source limit the rebuild to matching
+        trade days. Returns the number of summary rows written.
+        """
+        conditions = []
+        params = []
+        if symbol is not None:
+            conditions.append("td.symbol = ?")
+            params.append(symbol)
+        if source is not None:
+            conditions.append("td.source = ?")
+            params.append(source)
+        
+        conn = self.connection(write=True)
+        cursor = conn.cursor()
+        try:
+            _migrate_schema(cursor)
+            count = _rebuild_session_summaries(cursor, " AND ".join(conditions), tuple(params))
+            conn.commit()
+        except BaseException:
+            conn.rollback()
+            raise
+        
+        return count
+    
+    def get_bar_raw(self, bar_id: int) -> Optional[str]:
+        """
+        Loads the raw_json of one bar, whichever storage policy it was saved with.
+        
+        Returns:
+            JSON text, or None if the bar has no stored raw_json.
+        """
+        cursor = self.connection().cursor()
+        cursor.execute(
+            """SELECT COALESCE(b.raw_json, br.raw_json)
+               FROM bars b
+               LEFT JOIN bar_raw br ON br.bar_id = b.id
+               WHERE b.id = ?""",
+            (bar_id,)
+        )
+        row = cursor.fetchone()
+        
+        return decode_raw_json(row[0]) if row else None
+    
+    def get_day_annotations(
+        self,
+        symbol: str,
+        start_date: str,
+        end_date: str,
+        tags: Optional[list[str]] = None,
+        status: str = "active",
+        annotation_type: Optional[str] = None,
+        tag_mode: str = "any"
+    ) -> list[dict]:
+        """
+        Queries annotations for a date range.
+        
+        Returns:
+            List of annotation dictionaries.
+        
+        Behavior:
+            - Default: only returns status='active'
+            - If tags provided, filter to annotations containing ANY of the tags
+              (tag_mode="any") or ALL of them (tag_mode="all")
+            - Tag filtering runs in SQL against the indexed annotation_tags table
+        """
+        if tag_mode not in TAG_MODES:
+            raise ValueError(f"Unknown tag_mode '{tag_mode}'. Expected one of: {', '.join(TAG_MODES)}")
+        
+        cursor = self.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        # Build query
+        query = """
+            SELECT 
+                da.id,
+                da.annotation_type,
+                da.content,
+                da.tags,
+                da.source,
+                da.created_at,
+                da.supersedes_id,
+                da.status,
+                td.session_date
+            FROM day_annotations da
+            JOIN trade_days td ON da.trade_day_id = td.id
+            WHERE td.symbol = ?
+              AND td.session_date >= ?
+              AND td.session_date <= ?
+        """
+        params = [symbol, start_date, end_date]
+        
+        # Add status filter
+        if status != "all":
+            query += " AND da.status = ?"
+            params.append(status)
+        
+        # Add annotation type filter
+        if annotation_type:
+            query += " AND da.annotation_type = ?"
+            params.append(annotation_type)
+        
+        # Add tag filter
+        if tags:
+            tags = list(dict.fromkeys(tags))
+            placeholders = ",".join("?" * len(tags))
+            query += f" AND da.id IN (SELECT annotation_id FROM annotation_tags WHERE tag IN ({placeholders})"
+            if tag_mode == "all":
+                query += " GROUP BY annotation_id HAVING COUNT(*) = ?"
+                params.extend(tags + [len(tags)])
             else:
-                # Insert new bar
-                cursor.execute(
-                    """INSERT INTO bars 
-                       (trade_day_id, timestamp, open, high, low, close, volume, halt_period, raw_json)
-                       VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)""",
-                    (trade_day_id, timestamp, open_price, high_price, low_price, close_price, volume, halt_period, raw_json)
-                )
-                stats["inserted"] += 1
+                params.extend(tags)
+            query += ")"
+        
+        query += " ORDER BY td.session_date, da.created_at"
+        
+        cursor.execute(query, params)
+        rows = cursor.fetchall()
+        
+        # Convert to list of dictionaries
+        return [_annotation_record(row) for row in rows]
     
-    conn.commit()
-    conn.close()
+    def search_annotations(
+        self,
+        symbol: str,
+        query: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        status: str = "active",
+        limit: Optional[int] = None
+    ) -> list[dict]:
+        """
+        Full-text search over annotation content.
+        
+        Returns:
+            List of annotation dictionaries (as from get_day_annotations) with
+            an added "rank" (bm25; lower is a better match), best match first.
+        
+        Behavior:
+            - query uses SQLite FTS5 syntax: CPI matches the word, "failed breakout"
+              (in double quotes) the phrase, and AND / OR / NOT / prefix* combine terms
+            - Matching is case-insensitive, on whole words
+            - Default: only returns status='active'; status="all" returns every status
+            - start_date / end_date optionally bound the trade days (inclusive)
+        
+        Raises:
+            ValueError: if query is not a valid FTS5 query
+        """
+        cursor = self.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        sql = """
+            SELECT 
+                da.id,
+                da.annotation_type,
+                da.content,
+                da.tags,
+                da.source,
+                da.created_at,
+                da.supersedes_id,
+                da.status,
+                td.session_date,
+                annotation_fts.rank
+            FROM annotation_fts
+            JOIN day_annotations da ON da.id = annotation_fts.rowid
+            JOIN trade_days td ON da.trade_day_id = td.id
+            WHERE annotation_fts MATCH ?
+              AND td.symbol = ?
+        """
+        params = [query, symbol]
+        
+        if start_date:
+            sql += " AND td.session_date >= ?"
+            params.append(start_date)
+        if end_date:
+            sql += " AND td.session_date <= ?"
+            params.append(end_date)
+        if status != "all":
+            sql += " AND da.status = ?"
+            params.append(status)
+        
+        sql += " ORDER BY annotation_fts.rank, td.session_date, da.created_at"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+        
+        try:
+            cursor.execute(sql, params)
+            rows = cursor.fetchall()
+        except sqlite3.OperationalError as e:
+            # A malformed MATCH expression is a plain SQLITE_ERROR (code 1);
+            # let busy/locked and other failures through unchanged
+            if getattr(e, "sqlite_errorcode", 1) != 1:
+                raise
+            raise ValueError(f"Invalid search query '{query}': {e}") from None
+        
+        result = []
+        for row in rows:
+            record = _annotation_record(row)
+            record["rank"] = row["rank"]
+            result.append(record)
+        
+        return result
     
-    return stats
+    def get_trade_day(
+        self,
+        symbol: str,
+        session_date: str,
+        source: str = "tradingview"
+    ) -> Optional[dict]:
+        """
+        Gets a trade_day record.
+        
+        Returns:
+            Dictionary with trade_day fields or None if not found.
+        """
+        cursor = self.connection().cursor()
+        cursor.row_factory = sqlite3.Row
+        
+        cursor.execute(
+            "SELECT id, symbol, session_date, source FROM trade_days WHERE symbol = ? AND session_date = ? AND source = ?",
+            (symbol, session_date, source)
+        )
+        
+        row = cursor.fetchone()
+        
+        if row:
+            return {
+                "id": row["id"],
+                "symbol": row["symbol"],
+                "session_date": row["session_date"],
+                "source": row["source"]
+            }
+        
+        return None
 
 
-def save_day_annotation(
-    symbol: str,
-    session_date: str,
-    content: str,
-    annotation_type: str = "observation",
-    tags: Optional[list[str]] = None,
-    source: str = "manual",
-    supersedes_id: Optional[int] = None,
-    db_path: str = "market_data.db"
-) -> int:
+class AsyncArchive:
     """
-    Saves an annotation for a specific trade day.
+    asyncio front end to an Archive, for use inside event-loop services.
     
-    Returns:
-        The ID of the newly created annotation.
+    Queries run on a bounded pool of reader threads, each with its own
+    pooled connection (see Archive), so up to max_readers queries proceed
+    at once while the event loop keeps running. Writes (init_database,
+    ingest_csv, save_day_annotation) go through one queue served by a
+    single writer thread: they run one at a time, in submission order,
+    never contend for the SQLite write lock among themselves, and in WAL
+    mode never block the readers.
+    
+    Turning rows into dicts holds the GIL, so reader threads beyond what
+    it takes to overlap disk waits add event-loop lag, not throughput.
     
-    Behavior:
-        - Find or create trade_day record
-        - Insert annotation
-        - If supersedes_id provided, mark old annotation as 'superseded'
-        - Store tags as JSON string
+    Usage:
+        async with AsyncArchive("market_data.db") as archive:
+            bars = await archive.get_bars("MNQ", session_date="2026-02-06")
+            await archive.save_day_annotation("MNQ", "2026-02-06", "Gap filled by 7:00")
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
     
-    # Get or create trade day (assuming tradingview source by default)
-    trade_day_id = get_or_create_trade_day(symbol, session_date, "tradingview", cursor)
+    def __init__(self, db_path: str = "market_data.db", max_readers: int = 2, **archive_options):
+        """
+        Args:
+            db_path: SQLite database file
+            max_readers: Number of reader threads (and read connections)
+            archive_options: Passed on to Archive (pragmas, checkpoint_mode,
+                cache_bytes, bar_file_dir)
+        """
+        if max_readers < 1:
+            raise ValueError(f"max_readers must be a positive thread count, got {max_readers}")
+        self.archive = Archive(db_path, **archive_options)
+        self._readers = ThreadPoolExecutor(max_readers, thread_name_prefix="archive-reader")
+        self._writer = ThreadPoolExecutor(1, thread_name_prefix="archive-writer")
     
-    # Convert tags to JSON
-    tags_json = json.dumps(tags if tags else [])
+    async def _read(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._readers, partial(method, *args, **kwargs))
     
-    # Get current timestamp
-    created_at = int(datetime.datetime.now(tz=PT_TIMEZONE).timestamp())
+    async def _write(self, method, *args, **kwargs):
+        return await asyncio.get_running_loop().run_in_executor(self._writer, partial(method, *args, **kwargs))
     
-    # Insert annotation
-    cursor.execute(
-        """INSERT INTO day_annotations 
-           (trade_day_id, annotation_type, content, tags, source, created_at, supersedes_id, status)
-           VALUES (?, ?, ?, ?, ?, ?, ?, 'active')""",
-        (trade_day_id, annotation_type, content, tags_json, source, created_at, supersedes_id)
-    )
+    async def close(self) -> None:
+        """Waits for queued work, then stops the threads and closes every connection."""
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.shutdown)
+        await loop.run_in_executor(None, self._readers.shutdown)
+        self.archive.close()
     
-    annotation_id = cursor.lastrowid
+    async def __aenter__(self) -> "AsyncArchive":
+        return self
     
-    # If supersedes another annotation, mark the old one as superseded
-    if supersedes_id:
-        cursor.execute(
-            "UPDATE day_annotations SET status = 'superseded' WHERE id = ?",
-            (supersedes_id,)
+    async def __aexit__(self, exc_type, exc, tb) -> None:
+        await self.close()
+    
+    async def init_database(self) -> None:
+        """Creates the database and tables if needed. See Archive.init_database."""
+        await self._write(self.archive.init_database)
+    
+    async def ingest_csv(
+        self,
+        file_path: str,
+        symbol: str,
+        timeframe: str,
+        source: str = "tradingview",
+        **options
+    ) -> dict:
+        """Ingests a CSV file on the writer thread. See Archive.ingest_csv for options."""
+        return await self._write(self.archive.ingest_csv, file_path, symbol, timeframe, source, **options)
+    
+    async def save_day_annotation(
+        self,
+        symbol: str,
+        session_date: str,
+        content: str,
+        annotation_type: str = "observation",
+        tags: Optional[list[str]] = None,
+        source: str = "manual",
+        supersedes_id: Optional[int] = None
+    ) -> int:
+        """Saves an annotation on the writer thread. See Archive.save_day_annotation."""
+        return await self._write(
+            self.archive.save_day_annotation, symbol, session_date, content, annotation_type, tags, source,
+            supersedes_id
+        )
+    
+    async def get_bars(
+        self,
+        symbol: str,
+        session_date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        with_raw: bool = False
+    ) -> list[dict]:
+        """Queries bars on a reader thread. See Archive.get_bars."""
+        return await self._read(
+            self.archive.get_bars, symbol, session_date, start_date, end_date, timeframe, include_halt, source,
+            with_raw
         )
     
-    conn.commit()
-    conn.close()
+    async def get_day_annotations(
+        self,
+        symbol: str,
+        start_date: str,
+        end_date: str,
+        tags: Optional[list[str]] = None,
+        status: str = "active",
+        annotation_type: Optional[str] = None,
+        tag_mode: str = "any"
+    ) -> list[dict]:
+        """Queries annotations on a reader thread. See Archive.get_day_annotations."""
+        return await self._read(
+            self.archive.get_day_annotations, symbol, start_date, end_date, tags, status, annotation_type, tag_mode
+        )
     
-    return annotation_id
+    async def get_trade_day(self, symbol: str, session_date: str, source: str = "tradingview") -> Optional[dict]:
+        """Gets a trade_day record on a reader thread. See Archive.get_trade_day."""
+        return await self._read(self.archive.get_trade_day, symbol, session_date, source)
 
 
-def get_bars(
-    symbol: str,
-    session_date: Optional[str] = None,
-    start_date: Optional[str] = None,
-    end_date: Optional[str] = None,
-    timeframe: Optional[str] = None,
-    include_halt: bool = False,
-    source: str = "tradingview",
-    db_path: str = "market_data.db"
-) -> list[dict]:
+def _query_arguments(query: str, parameters: dict, required: tuple) -> dict:
     """
-    Queries bars from the database.
-    
-    Returns:
-        List of bar dictionaries with all fields.
+    Parses an ArchiveServer query string into keyword arguments.
     
-    Behavior:
-        - Default: filters WHERE halt_period = 0
-        - Joins with trade_days to include session_date in results
-        - Can query single day or date range
+    parameters maps each accepted name to str, bool ("1"/"true"/"0"/"false")
+    or list (repeated and/or comma-separated values).
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
+    arguments = {}
+    for name, value in urllib.parse.parse_qsl(query, keep_blank_values=True):
+        kind = parameters.get(name)
+        if kind is None:
+            raise ValueError(f"Unknown parameter '{name}'. Expected one of: {', '.join(parameters)}")
+        if kind is list:
+            arguments.setdefault(name, []).extend(item for item in value.split(",") if item)
+        elif kind is bool:
+            if value.lower() not in ("1", "true", "0", "false"):
+                raise ValueError(f"Unknown {name} '{value}'. Expected one of: 1, true, 0, false")
+            arguments[name] = value.lower() in ("1", "true")
+        else:
+            arguments[name] = value
+    for name in required:
+        if not arguments.get(name):
+            raise ValueError(f"Missing parameter '{name}'")
+    return arguments
+
+
+class _ArchiveRequestHandler(http.server.BaseHTTPRequestHandler):
+    """One client connection of an ArchiveServer; see ArchiveServer for the endpoints."""
     
-    # Build query
-    query = """
-        SELECT 
-            b.id,
-            b.timestamp,
-            b.open,
-            b.high,
-            b.low,
-            b.close,
-            b.volume,
-            b.halt_period,
-            b.raw_json,
-            td.session_date
-        FROM bars b
-        LEFT JOIN trade_days td ON b.trade_day_id = td.id
-        WHERE td.symbol = ? AND td.source = ?
+    protocol_version = "HTTP/1.1"
+    
+    # path -> (method, accepted parameters, required parameters)
+    routes = {
+        "/bars": ("bars", {
+            "symbol": str, "session_date": str, "start_date": str, "end_date": str, "timeframe": str,
+            "include_halt": bool, "source": str, "format": str,
+        }, ("symbol",)),
+        "/sessions": ("sessions", {
+            "symbol": str, "start_date": str, "end_date": str, "timeframe": str, "source": str,
+        }, ("symbol",)),
+        "/annotations": ("annotations", {
+            "symbol": str, "start_date": str, "end_date": str, "tags": list, "status": str,
+            "annotation_type": str, "tag_mode": str,
+        }, ("symbol", "start_date", "end_date")),
+    }
+    
+    def setup(self) -> None:
+        # An idle keep-alive connection gives its worker back after this long
+        self.timeout = self.server.idle_timeout
+        super().setup()
+    
+    def log_message(self, format: str, *args) -> None:
+        if self.server.log_requests:
+            super().log_message(format, *args)
+    
+    def do_GET(self) -> None:
+        url = urllib.parse.urlsplit(self.path)
+        route = self.routes.get(url.path)
+        if route is None:
+            self._send_json(404, {"error": f"Unknown path '{url.path}'. Expected one of: {', '.join(self.routes)}"})
+            return
+        method, parameters, required = route
+        
+        archive = self.server.archive
+        conn = archive.connection()
+        self._streaming = False
+        try:
+            arguments = _query_arguments(url.query, parameters, required)
+            # One read transaction, so the ETag and the body describe the same snapshot
+            conn.execute("BEGIN")
+            getattr(self, "_get_" + method)(archive, conn.cursor(), url.query, **arguments)
+        except (ValueError, sqlite3.Error) as e:
+            if self._streaming:
+                # Headers are out; cutting the connection is the only way to signal it
+                self.log_error("%s failed mid-stream: %s", self.path, e)
+                self.close_connection = True
+            else:
+                self._send_json(400 if isinstance(e, ValueError) else 500, {"error": str(e)})
+        except (BrokenPipeError, ConnectionResetError):
+            self.close_connection = True
+        finally:
+            conn.rollback()
+    
+    def _get_bars(
+        self,
+        archive: "Archive",
+        cursor: sqlite3.Cursor,
+        query: str,
+        symbol: str,
+        session_date: Optional[str] = None,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        include_halt: bool = False,
+        source: str = "tradingview",
+        format: str = "json"
+    ) -> None:
+        if format not in SERVER_BAR_FORMATS:
+            raise ValueError(f"Unknown format '{format}'. Expected one of: {', '.join(SERVER_BAR_FORMATS)}")
+        etag = self._etag(query, _bar_generations(
+            cursor, symbol, session_date, start_date, end_date, include_halt, source
+        ))
+        if self._not_modified(etag):
+            return
+        
+        if format == "json":
+            self._send_cached(etag, lambda: archive.get_bars(
+                symbol, session_date, start_date, end_date, timeframe, include_halt, source
+            ))
+            return
+        
+        bar_query, params = _bars_query(
+            cursor, symbol, session_date, start_date, end_date, timeframe, include_halt, source, False
+        )
+        cursor.execute(bar_query, params)
+        if format == "ndjson":
+            chunks = _ndjson_bar_chunks(cursor)
+        else:
+            # Every partition's metadata is settled before the 200 goes out
+            metadata = {
+                date: {"symbol": symbol, "source": source, "timeframe": seconds, "session_date": date}
+                for date, seconds in params["timeframes"].items()
+            }
+            chunks = (
+                chunk
+                for date, columns in _iter_bar_partitions(cursor, ITER_BATCH_SIZE)
+                for chunk in _columnar_chunks(metadata[date], columns)
+            )
+        self._send_stream(_SERVER_CONTENT_TYPES[format], chunks, etag)
+    
+    def _get_sessions(
+        self,
+        archive: "Archive",
+        cursor: sqlite3.Cursor,
+        query: str,
+        symbol: str,
+        start_date: Optional[str] = None,
+        end_date: Optional[str] = None,
+        timeframe: Optional[str] = None,
+        source: str = "tradingview"
+    ) -> None:
+        etag = self._etag(query, _bar_generations(cursor, symbol, None, start_date, end_date, False, source))
+        if not self._not_modified(etag):
+            self._send_cached(etag, lambda: archive.get_session_summaries(
+                symbol, start_date, end_date, timeframe, source
+            ))
+    
+    def _get_annotations(
+        self,
+        archive: "Archive",
+        cursor: sqlite3.Cursor,
+        query: str,
+        symbol: str,
+        start_date: str,
+        end_date: str,
+        tags: Optional[list[str]] = None,
+        status: str = "active",
+        annotation_type: Optional[str] = None,
+        tag_mode: str = "any"
+    ) -> None:
+        etag = self._etag(query, _annotation_generation(cursor, symbol, start_date, end_date))
+        if not self._not_modified(etag):
+            self._send_cached(etag, lambda: archive.get_day_annotations(
+                symbol, start_date, end_date, tags, status, annotation_type, tag_mode
+            ))
+    
+    @staticmethod
+    def _etag(query: str, generations: tuple) -> str:
+        return '"' + hashlib.sha1(repr((query, generations)).encode()).hexdigest()[:20] + '"'
+    
+    def _not_modified(self, etag: str) -> bool:
+        """Answers 304 if the client's If-None-Match lists etag."""
+        header = self.headers.get("If-None-Match")
+        if not header:
+            return False
+        tags = [tag.strip() for tag in header.split(",")]
+        if "*" not in tags and etag not in [tag.removeprefix("W/") for tag in tags]:
+            return False
+        self.send_response(304)
+        self.send_header("ETag", etag)
+        self.end_headers()
+        return True
+    
+    def _send_cached(self, etag: str, query) -> None:
+        """Sends the JSON body for etag from the server's cache, running query on a miss."""
+        cache = self.server.cache
+        key = (self.path,)
+        body = cache.get(key, etag) if cache is not None else None
+        if body is None:
+            body = json.dumps(query()).encode()
+            if cache is not None:
+                cache.put(key, etag, body, sys.getsizeof(body))
+        self._send_json(200, body, etag)
+    
+    def _send_json(self, status: int, payload, etag: Optional[str] = None) -> None:
+        body = payload if isinstance(payload, bytes) else json.dumps(payload).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", _SERVER_CONTENT_TYPES["json"])
+        self.send_header("Content-Length", str(len(body)))
+        if etag:
+            self.send_header("ETag", etag)
+            self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self.wfile.write(body)
+    
+    def _send_stream(self, content_type: str, chunks: Iterator[bytes], etag: str) -> None:
+        """Sends chunks as they are produced: chunked for HTTP/1.1, until close for HTTP/1.0."""
+        chunked = self.request_version != "HTTP/1.0"
+        self.send_response(200)
+        self.send_header("Content-Type", content_type)
+        if chunked:
+            self.send_header("Transfer-Encoding", "chunked")
+        else:
+            self.close_connection = True
+        self.send_header("ETag", etag)
+        self.send_header("Cache-Control", "no-cache")
+        self.end_headers()
+        self._streaming = True
+        for chunk in chunks:
+            if not chunk:
+                continue
+            if chunked:
+                self.wfile.write(b"%x\r\n" % len(chunk))
+            self.wfile.write(chunk)
+            if chunked:
+                self.wfile.write(b"\r\n")
+        if chunked:
+            self.wfile.write(b"0\r\n\r\n")
+
+
+def _ndjson_bar_chunks(cursor: sqlite3.Cursor) -> Iterator[bytes]:
+    """Encodes an executed _bars_query as NDJSON, ITER_BATCH_SIZE bars per chunk, keyed like get_bars."""
+    keys = Bar._fields[:9]
+    dumps = json.dumps
+    while True:
+        rows = cursor.fetchmany(ITER_BATCH_SIZE)
+        if not rows:
+            return
+        lines = []
+        for row in rows:
+            bar = dict(zip(keys, row))
+            bar["halt_period"] = bool(bar["halt_period"])
+            lines.append(dumps(bar))
+        lines.append("")
+        yield "\n".join(lines).encode()
+
+
+class ArchiveServer(http.server.HTTPServer):
     """
-    params = [symbol, source]
+    Local HTTP/JSON query server over one archive, so analysts and tools
+    share warm connections and one result cache instead of each opening
+    the database and re-running the same queries.
     
-    # Add date filters
-    if session_date:
-        query += " AND td.session_date = ?"
-        params.append(session_date)
-    elif start_date and end_date:
-        query += " AND td.session_date >= ? AND td.session_date <= ?"
-        params.extend([start_date, end_date])
+    Endpoints (GET; query parameters are named as in the Archive methods):
+        /bars         get_bars: symbol, session_date, start_date, end_date,
+                      timeframe, include_halt, source, and format, one of
+                      SERVER_BAR_FORMATS. "json" answers with one array;
+                      "ndjson" (one bar per line) and "columnar" (see
+                      read_columnar_stream) are streamed in chunks as
+                      rows are read, so memory stays flat for any range.
+        /sessions     get_session_summaries: symbol, start_date, end_date,
+                      timeframe, source
+        /annotations  get_day_annotations: symbol, start_date, end_date,
+                      tags (repeated or comma-separated), status,
+                      annotation_type, tag_mode
     
-    # Add halt filter
-    if not include_halt:
-        query += " AND b.halt_period = 0"
+    Responses carry an ETag built from the trade day generations the
+    query covers (for annotations, their count and newest id). A request
+    whose If-None-Match matches gets 304 Not Modified without running the
+    query. JSON bodies are kept, already encoded, in a BarCache shared by
+    all clients and keyed by URL and ETag, so a repeated query costs one
+    generation lookup until ingest changes its data. Bad parameters get
+    400 with {"error": message}.
     
-    query += " ORDER BY b.timestamp"
+    Connections are served by a fixed pool of worker threads, each with
+    its own pooled Archive connection, and kept alive between requests;
+    a connection idle for idle_timeout seconds gives its worker back.
     
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
+    Usage:
+        with ArchiveServer("market_data.db", port=8765) as server:
+            server.serve_forever()
+    """
     
-    conn.close()
+    request_queue_size = 128
     
-    # Convert to list of dictionaries
-    result = []
-    for row in rows:
-        result.append({
-            "id": row["id"],
-            "timestamp": row["timestamp"],
-            "open": row["open"],
-            "high": row["high"],
-            "low": row["low"],
-            "close": row["close"],
-            "volume": row["volume"],
-            "halt_period": bool(row["halt_period"]),
-            "session_date": row["session_date"],
-            "raw_json": row["raw_json"]
-        })
+    def __init__(
+        self,
+        db_path: str = "market_data.db",
+        host: str = "127.0.0.1",
+        port: int = 8765,
+        workers: int = 8,
+        cache_bytes: int = 64 * 1024 * 1024,
+        idle_timeout: float = 5.0,
+        log_requests: bool = False,
+        **archive_options
+    ):
+        """
+        Args:
+            db_path: SQLite database file
+            host, port: Address to listen on; port 0 picks a free port
+                (see server_address)
+            workers: Worker threads, i.e. client connections served at once
+            cache_bytes: Memory cap of the shared response cache; 0 disables it
+            idle_timeout: Seconds an idle keep-alive connection is kept open
+            log_requests: Log each request to stderr
+            archive_options: Passed on to Archive (pragmas, checkpoint_mode,
+                bar_file_dir)
+        """
+        if workers < 1:
+            raise ValueError(f"workers must be a positive thread count, got {workers}")
+        self.archive = Archive(db_path, **archive_options)
+        self.cache = BarCache(cache_bytes) if cache_bytes > 0 else None
+        self.idle_timeout = idle_timeout
+        self.log_requests = log_requests
+        self._workers = ThreadPoolExecutor(workers, thread_name_prefix="archive-server")
+        super().__init__((host, port), _ArchiveRequestHandler)
     
-    return result
+    def process_request(self, request, client_address) -> None:
+        self._workers.submit(self._serve_connection, request, client_address)
+    
+    def _serve_connection(self, request, client_address) -> None:
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+    
+    def server_close(self) -> None:
+        """Stops listening, waits for open connections, then closes every database connection."""
+        super().server_close()
+        self._workers.shutdown()
+        self.archive.close()
+
+
+# Module-level API: each call opens a short-lived Archive on db_path.
+# Use an Archive directly to keep connections open across calls.
+
+
+def init_database(db_path: str = "market_data.db") -> None:
+    """
+    Creates the database and tables if they don't exist.
+    Safe to call repeatedly (idempotent). See Archive.init_database.
+    """
+    with Archive(db_path) as archive:
+        archive.init_database()
+
+
+def ingest_csv(
+    file_path: str,
+    symbol: str,
+    timeframe: str,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    bulk: bool = False,
+    chunk_size: int = BULK_CHUNK_SIZE,
+    raw_storage: str = "inline",
+    commit_every: Optional[int] = None,
+    incremental: bool = False,
+    overlap_seconds: int = INCREMENTAL_OVERLAP_SECONDS,
+    force: bool = False
+) -> dict:
+    """Ingests a CSV file of market data into the database. See Archive.ingest_csv."""
+    with Archive(db_path) as archive:
+        return archive.ingest_csv(
+            file_path, symbol, timeframe, source,
+            bulk=bulk, chunk_size=chunk_size, raw_storage=raw_storage, commit_every=commit_every,
+            incremental=incremental, overlap_seconds=overlap_seconds, force=force
+        )
+
+
+def ingest_many(
+    file_paths: list[str],
+    symbol: str,
+    timeframe: str,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    workers: Optional[int] = None,
+    raw_storage: str = "inline",
+    commit_every: Optional[int] = None,
+    force: bool = False
+) -> dict:
+    """Ingests several CSV files with parallel parsing. See Archive.ingest_many."""
+    with Archive(db_path) as archive:
+        return archive.ingest_many(
+            file_paths, symbol, timeframe, source,
+            workers=workers, raw_storage=raw_storage, commit_every=commit_every, force=force
+        )
+
+
+def save_day_annotation(
+    symbol: str,
+    session_date: str,
+    content: str,
+    annotation_type: str = "observation",
+    tags: Optional[list[str]] = None,
+    source: str = "manual",
+    supersedes_id: Optional[int] = None,
+    db_path: str = "market_data.db"
+) -> int:
+    """Saves an annotation for a specific trade day. See Archive.save_day_annotation."""
+    with Archive(db_path) as archive:
+        return archive.save_day_annotation(
+            symbol, session_date, content, annotation_type, tags, source, supersedes_id
+        )
+
+
+def save_day_annotations_bulk(records: list[dict], db_path: str = "market_data.db") -> list[int]:
+    """Saves many annotations in one transaction. See Archive.save_day_annotations_bulk."""
+    with Archive(db_path) as archive:
+        return archive.save_day_annotations_bulk(records)
+
+
+def get_bars(
+    symbol: str,
+    session_date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    include_halt: bool = False,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    with_raw: bool = False
+) -> list[dict]:
+    """Queries bars from the database. See Archive.get_bars."""
+    with Archive(db_path) as archive:
+        return archive.get_bars(
+            symbol, session_date, start_date, end_date, timeframe,
+            include_halt, source, with_raw=with_raw
+        )
+
+
+def iter_bars(
+    symbol: str,
+    session_date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    include_halt: bool = False,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    with_raw: bool = False,
+    batch_size: int = ITER_BATCH_SIZE,
+    by_session: bool = False
+) -> Iterator:
+    """Streams bars lazily. See Archive.iter_bars."""
+    with Archive(db_path) as archive:
+        yield from archive.iter_bars(
+            symbol, session_date, start_date, end_date, timeframe, include_halt, source,
+            with_raw=with_raw, batch_size=batch_size, by_session=by_session
+        )
+
+
+def get_bars_columnar(
+    symbol: str,
+    session_date: Optional[str] = None,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    include_halt: bool = False,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    batch_size: int = ITER_BATCH_SIZE
+) -> BarColumns:
+    """Queries bars as typed column arrays. See Archive.get_bars_columnar."""
+    with Archive(db_path) as archive:
+        return archive.get_bars_columnar(
+            symbol, session_date, start_date, end_date, timeframe, include_halt, source,
+            batch_size=batch_size
+        )
+
+
+def export_bars(
+    symbol: str,
+    path: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    include_halt: bool = False,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    format: str = "auto",
+    batch_size: int = ITER_BATCH_SIZE
+) -> dict:
+    """Exports bars to per-trade-day columnar files. See Archive.export_bars."""
+    with Archive(db_path) as archive:
+        return archive.export_bars(
+            symbol, path, start_date, end_date, timeframe, include_halt, source,
+            format=format, batch_size=batch_size
+        )
+
+
+def import_bars(path: str, db_path: str = "market_data.db", commit_every: Optional[int] = None) -> dict:
+    """Bulk-loads files written by export_bars. See Archive.import_bars."""
+    with Archive(db_path) as archive:
+        return archive.import_bars(path, commit_every=commit_every)
+
+
+def sync_bar_file(
+    symbol: str,
+    timeframe: str,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    bar_file_dir: str = "bar_files"
+) -> str:
+    """Creates or updates a bar file from the bars table; returns its path. See Archive.sync_bar_file."""
+    with Archive(db_path, bar_file_dir=bar_file_dir) as archive:
+        return archive.sync_bar_file(symbol, timeframe, source)
+
+
+def check_bar_file(
+    symbol: str,
+    timeframe: str,
+    source: str = "tradingview",
+    db_path: str = "market_data.db",
+    bar_file_dir: str = "bar_files"
+) -> dict:
+    """Compares a bar file with the bars table. See Archive.check_bar_file."""
+    with Archive(db_path, bar_file_dir=bar_file_dir) as archive:
+        return archive.check_bar_file(symbol, timeframe, source)
+
+
+def get_session_summaries(
+    symbol: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    timeframe: Optional[str] = None,
+    source: str = "tradingview",
+    db_path: str = "market_data.db"
+) -> list[dict]:
+    """Reads daily session statistics. See Archive.get_session_summaries."""
+    with Archive(db_path) as archive:
+        return archive.get_session_summaries(symbol, start_date, end_date, timeframe, source)
+
+
+def rebuild_session_summaries(
+    symbol: Optional[str] = None,
+    source: Optional[str] = None,
+    db_path: str = "market_data.db"
+) -> int:
+    """Recomputes session_summary from the stored bars. See Archive.rebuild_session_summaries."""
+    with Archive(db_path) as archive:
+        return archive.rebuild_session_summaries(symbol, source)
+
+
+def get_bar_raw(bar_id: int, db_path: str = "market_data.db") -> Optional[str]:
+    """Loads the raw_json of one bar. See Archive.get_bar_raw."""
+    with Archive(db_path) as archive:
+        return archive.get_bar_raw(bar_id)
 
 
 def get_day_annotations(
@@ -493,83 +4631,28 @@ def get_day_annotations(
     tags: Optional[list[str]] = None,
     status: str = "active",
     annotation_type: Optional[str] = None,
+    db_path: str = "market_data.db",
+    tag_mode: str = "any"
+) -> list[dict]:
+    """Queries annotations for a date range. See Archive.get_day_annotations."""
+    with Archive(db_path) as archive:
+        return archive.get_day_annotations(
+            symbol, start_date, end_date, tags, status, annotation_type, tag_mode
+        )
+
+
+def search_annotations(
+    symbol: str,
+    query: str,
+    start_date: Optional[str] = None,
+    end_date: Optional[str] = None,
+    status: str = "active",
+    limit: Optional[int] = None,
     db_path: str = "market_data.db"
 ) -> list[dict]:
-    """
-    Queries annotations for a date range.
-    
-    Returns:
-        List of annotation dictionaries.
-    
-    Behavior:
-        - Default: only returns status='active'
-        - If tags provided, filter to annotations containing ANY of the tags
-        - Parse JSON tags field for filtering
-    """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    # Build query
-    query = """
-        SELECT 
-            da.id,
-            da.annotation_type,
-            da.content,
-            da.tags,
-            da.source,
-            da.created_at,
-            da.supersedes_id,
-            da.status,
-            td.session_date
-        FROM day_annotations da
-        JOIN trade_days td ON da.trade_day_id = td.id
-        WHERE td.symbol = ?
-          AND td.session_date >= ?
-          AND td.session_date <= ?
-    """
-    params = [symbol, start_date, end_date]
-    
-    # Add status filter
-    if status != "all":
-        query += " AND da.status = ?"
-        params.append(status)
-    
-    # Add annotation type filter
-    if annotation_type:
-        query += " AND da.annotation_type = ?"
-        params.append(annotation_type)
-    
-    query += " ORDER BY td.session_date, da.created_at"
-    
-    cursor.execute(query, params)
-    rows = cursor.fetchall()
-    
-    conn.close()
-    
-    # Convert to list of dictionaries and filter by tags if needed
-    result = []
-    for row in rows:
-        row_tags = json.loads(row["tags"]) if row["tags"] else []
-        
-        # If tags filter is provided, check if any tag matches
-        if tags:
-            if not any(tag in row_tags for tag in tags):
-                continue
-        
-        result.append({
-            "id": row["id"],
-            "session_date": row["session_date"],
-            "annotation_type": row["annotation_type"],
-            "content": row["content"],
-            "tags": row_tags,
-            "source": row["source"],
-            "created_at": row["created_at"],
-            "supersedes_id": row["supersedes_id"],
-            "status": row["status"]
-        })
-    
-    return result
+    """Full-text search over annotation content. See Archive.search_annotations."""
+    with Archive(db_path) as archive:
+        return archive.search_annotations(symbol, query, start_date, end_date, status, limit)
 
 
 def get_trade_day(
@@ -578,33 +4661,27 @@ def get_trade_day(
     source: str = "tradingview",
     db_path: str = "market_data.db"
 ) -> Optional[dict]:
+    """Gets a trade_day record. See Archive.get_trade_day."""
+    with Archive(db_path) as archive:
+        return archive.get_trade_day(symbol, session_date, source)
+
+
+def serve(
+    db_path: str = "market_data.db",
+    host: str = "127.0.0.1",
+    port: int = 8765,
+    workers: int = 8,
+    cache_bytes: int = 64 * 1024 * 1024
+) -> None:
     """
-    Gets a trade_day record.
-    
-    Returns:
-        Dictionary with trade_day fields or None if not found.
+    Runs an ArchiveServer on db_path until interrupted. See ArchiveServer
+    for the endpoints.
     """
-    conn = sqlite3.connect(db_path)
-    conn.row_factory = sqlite3.Row
-    cursor = conn.cursor()
-    
-    cursor.execute(
-        "SELECT id, symbol, session_date, source FROM trade_days WHERE symbol = ? AND session_date = ? AND source = ?",
-        (symbol, session_date, source)
-    )
-    
-    row = cursor.fetchone()
-    conn.close()
-    
-    if row:
-        return {
-            "id": row["id"],
-            "symbol": row["symbol"],
-            "session_date": row["session_date"],
-            "source": row["source"]
-        }
-    
-    return None
+    with ArchiveServer(db_path, host, port, workers, cache_bytes) as server:
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
 
 
 def register_source_schema(
@@ -4,33 +4,101 @@ Tests for Market Data Archivist.
 This file contains tests to verify all the requirements from the specification.
 """
 
+import asyncio
+import bz2
+import csv
+import gzip
+import http.client
+import io
+import json
+import lzma
 import os
+import random
+import shutil
 import sqlite3
 import datetime
+import statistics
+import threading
+import time
 from zoneinfo import ZoneInfo
+import market_archivist
 from market_archivist import (
+    Archive,
+    ArchiveServer,
+    AsyncArchive,
     init_database,
     resolve_trade_day,
+    resolve_trade_days,
     is_saturday,
     is_halt_period,
     get_pt_datetime,
     ingest_csv,
+    ingest_many,
+    expand_csv_inputs,
+    export_bars,
+    import_bars,
+    check_bar_file,
+    sync_bar_file,
     save_day_annotation,
+    save_day_annotations_bulk,
     get_bars,
+    iter_bars,
+    get_bars_columnar,
+    read_columnar_stream,
+    get_bar_raw,
+    get_session_summaries,
+    rebuild_session_summaries,
     get_day_annotations,
+    search_annotations,
     get_trade_day,
-    parse_tradingview_timestamp
+    parse_tradingview_timestamp,
+    parse_tradingview_timestamps,
+    parse_timeframe,
+    SCHEMA_VERSION
 )
 
 
 PT_TIMEZONE = ZoneInfo("America/Los_Angeles")
 TEST_DB = "test_market_data.db"
+TEST_CSV = "test_market_data.csv"
+SAMPLE_CSV = "TradingView-Feb9-CME_MINI_MNQ1!, 1_5cedc.csv"
 
 
 def cleanup_test_db():
-    """Remove test database if it exists."""
-    if os.path.exists(TEST_DB):
-        os.remove(TEST_DB)
+    """Remove test database (and any WAL sidecar files) if it exists."""
+    for path in (TEST_DB, TEST_DB + "-wal", TEST_DB + "-shm"):
+        if os.path.exists(path):
+            os.remove(path)
+
+
+def _dump_bars(db_path):
+    """Return all stored bars with their session date, in timestamp order."""
+    conn = sqlite3.connect(db_path)
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT td.session_date, b.timestamp, b.open, b.high, b.low, b.close,
+               b.volume, b.halt_period, b.raw_json
+        FROM bars b
+        LEFT JOIN trade_days td ON b.trade_day_id = td.id
+        ORDER BY b.timestamp, b.id
+    """)
+    rows = cursor.fetchall()
+    conn.close()
+    return rows
+
+
+def _dump_annotations(db_path):
+    """All annotations (without created_at), their tags and trade days, for comparisons."""
+    conn = sqlite3.connect(db_path)
+    annotations = conn.execute(
+        """SELECT da.id, td.symbol, td.session_date, da.annotation_type, da.content, da.tags,
+                  da.source, da.supersedes_id, da.status
+           FROM day_annotations da JOIN trade_days td ON da.trade_day_id = td.id ORDER BY da.id"""
+    ).fetchall()
+    tags = conn.execute("SELECT * FROM annotation_tags ORDER BY annotation_id, tag").fetchall()
+    indexed = conn.execute("SELECT rowid, content FROM annotation_fts ORDER BY rowid").fetchall()
+    conn.close()
+    return annotations, tags, indexed
 
 
 def test_trade_day_resolution():
@@ -185,6 +253,12 @@ def test_csv_ingestion_and_idempotency():
     assert result2["inserted"] == 0, "Second ingestion should insert nothing"
     assert result2["skipped"] == result["inserted"], "Should skip all previously inserted bars"
     print(f"✓ Second ingestion (idempotent): {result2['skipped']} bars skipped")
+    
+    # Re-verify row by row instead of trusting the ingest_files ledger
+    result3 = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, force=True)
+    assert result2["replayed"] and "replayed" not in result3
+    assert result3 == {key: value for key, value in result2.items() if key not in ("replayed", "incremental")}, \
+        "Re-verification should match the ledger's answer"
 
 
 def test_annotations():
@@ -392,6 +466,1742 @@ def test_timestamp_parsing():
     print(f"✓ Simple format parsed: {dt}")
 
 
+def test_bulk_ingestion_matches_row_path():
+    """Test that bulk ingestion produces the same stats and bars as the row path."""
+    print("\n=== Testing Bulk Ingestion ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    
+    # Copy of the sample file with a changed close on a few rows, plus a
+    # repeated row to exercise in-file duplicate detection
+    with open(SAMPLE_CSV) as f:
+        lines = f.read().splitlines()
+    conflict_lines = [lines[0]]
+    for i, line in enumerate(lines[1:]):
+        fields = line.split(",")
+        if i % 500 == 0:
+            fields[4] = str(float(fields[4]) + 1)
+        conflict_lines.append(",".join(fields))
+    conflict_lines.append(lines[1])
+    with open(TEST_CSV, "w") as f:
+        f.write("\n".join(conflict_lines) + "\n")
+    
+    try:
+        # Small chunk size so duplicates span chunk boundaries
+        bulk = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=True, chunk_size=300)
+        bulk_again = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=True, chunk_size=300)
+        bulk_bars = _dump_bars(TEST_DB)
+        
+        cleanup_test_db()
+        init_database(TEST_DB)
+        rows = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+        rows_again = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        row_bars = _dump_bars(TEST_DB)
+    finally:
+        os.remove(TEST_CSV)
+    
+    assert bulk == rows, "Bulk first ingestion should match row path"
+    assert bulk_again == rows_again, "Bulk re-ingestion should match row path"
+    assert bulk_again["conflicts"] > 0, "Modified rows should be reported as conflicts"
+    assert bulk_again["inserted"] == 0, "Re-ingestion should insert nothing"
+    assert bulk_bars == row_bars, "Stored bars should be identical"
+    print(f"✓ Bulk ingestion matches row path: {bulk['inserted']} inserted, "
+          f"{bulk_again['skipped']} skipped, {bulk_again['conflicts']} conflicts")
+
+
+def test_schema_migration():
+    """Test that init_database upgrades an unindexed database in place."""
+    print("\n=== Testing Schema Migration ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    first = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    
+    # Turn it back into a baseline database: no indexes, no timeframe
+    # column, user_version 0
+    conn = sqlite3.connect(TEST_DB)
+    cursor = conn.cursor()
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    for (name,) in cursor.fetchall():
+        cursor.execute(f"DROP INDEX {name}")
+    cursor.execute("ALTER TABLE bars DROP COLUMN timeframe")
+    cursor.execute("PRAGMA user_version = 0")
+    conn.commit()
+    conn.close()
+    
+    init_database(TEST_DB)
+    
+    conn = sqlite3.connect(TEST_DB)
+    cursor = conn.cursor()
+    cursor.execute("PRAGMA user_version")
+    assert cursor.fetchone()[0] == SCHEMA_VERSION, "Database should be at the current schema version"
+    cursor.execute("SELECT name FROM sqlite_master WHERE type = 'index' AND name LIKE 'idx_%'")
+    indexes = {row[0] for row in cursor.fetchall()}
+    assert "idx_bars_trade_day_timeframe_timestamp" in indexes
+    assert "idx_bars_halt_key" in indexes
+    assert "idx_trade_days_symbol_source_date" in indexes
+    print(f"✓ Indexes created in place: {sorted(indexes)}")
+    
+    cursor.execute("SELECT DISTINCT timeframe FROM bars")
+    assert cursor.fetchall() == [(60,)], "Timeframe should be inferred from 1-minute bar spacing"
+    print(f"✓ Timeframe backfilled from bar spacing")
+    
+    # Duplicate checks are index lookups, not table scans
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM bars WHERE trade_day_id = ? AND timeframe = ? AND timestamp = ?",
+        (1, 60, 0)
+    )
+    plan = " ".join(row[-1] for row in cursor.fetchall())
+    assert "idx_bars_trade_day_timeframe_timestamp" in plan, f"Unexpected plan: {plan}"
+    cursor.execute(
+        "EXPLAIN QUERY PLAN SELECT id FROM bars "
+        "WHERE halt_symbol = ? AND halt_source = ? AND timeframe = ? AND timestamp = ? AND halt_period = 1",
+        ("MNQ", "tradingview", 60, 0)
+    )
+    plan = " ".join(row[-1] for row in cursor.fetchall())
+    assert "idx_bars_halt_key" in plan, f"Unexpected plan: {plan}"
+    print(f"✓ Duplicate checks use indexes")
+    
+    # The unique key rejects a duplicate bar
+    try:
+        cursor.execute(
+            "INSERT INTO bars (trade_day_id, timeframe, timestamp, halt_period) "
+            "SELECT trade_day_id, timeframe, timestamp, halt_period FROM bars WHERE halt_period = 0 LIMIT 1"
+        )
+        assert False, "Duplicate bar should violate the unique key"
+    except sqlite3.IntegrityError:
+        print(f"✓ Unique bar key enforced")
+    conn.rollback()
+    conn.close()
+    
+    again = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    assert again["inserted"] == 0
+    assert again["skipped"] == first["inserted"]
+    print(f"✓ Re-ingestion after migration skips {again['skipped']} bars")
+
+
+def _reference_trade_day(ts):
+    """Trade day resolution straight from ZoneInfo, for comparison."""
+    dt = datetime.datetime.fromtimestamp(ts, tz=PT_TIMEZONE)
+    if dt.weekday() == 5:
+        return "saturday"
+    if dt.hour == 14:
+        return None
+    if dt.hour >= 15:
+        return (dt.date() + datetime.timedelta(days=1)).strftime("%Y-%m-%d")
+    return dt.date().strftime("%Y-%m-%d")
+
+
+def test_session_calendar_matches_zoneinfo():
+    """Test the cached session calendar against ZoneInfo across DST changes."""
+    print("\n=== Testing Session Calendar ===")
+    
+    timestamps = []
+    # Every minute of the weeks around the 2024 and 2025 DST transitions
+    for year, month, day in ((2024, 3, 8), (2024, 11, 1), (2025, 3, 7), (2025, 10, 31)):
+        start = int(datetime.datetime(year, month, day, tzinfo=PT_TIMEZONE).timestamp())
+        timestamps.extend(range(start, start + 4 * 86400, 60))
+    # Every hour (plus odd seconds) over several years
+    start = int(datetime.datetime(2019, 1, 1, tzinfo=PT_TIMEZONE).timestamp())
+    timestamps.extend(range(start, start + 6 * 365 * 86400, 3600 + 17))
+    
+    for ts in timestamps:
+        expected = _reference_trade_day(ts)
+        if expected == "saturday":
+            try:
+                resolve_trade_day(ts)
+                assert False, f"Saturday timestamp {ts} should raise"
+            except ValueError:
+                pass
+            assert is_saturday(ts)
+        else:
+            assert resolve_trade_day(ts) == expected, f"Mismatch at {ts}"
+            assert is_halt_period(ts) == (expected is None)
+    print(f"✓ {len(timestamps):,} timestamps match ZoneInfo resolution")
+    
+    # Batch API agrees with the scalar function
+    weekday_timestamps = [ts for ts in timestamps if _reference_trade_day(ts) != "saturday"]
+    session_dates, halt_flags = resolve_trade_days(weekday_timestamps)
+    assert session_dates == [resolve_trade_day(ts) for ts in weekday_timestamps]
+    assert halt_flags == [d is None for d in session_dates]
+    print(f"✓ resolve_trade_days matches resolve_trade_day")
+    
+    # Saturday raises the same error from the batch API
+    saturday = int(datetime.datetime(2024, 1, 13, 10, 0, 0, tzinfo=PT_TIMEZONE).timestamp())
+    try:
+        resolve_trade_days([weekday_timestamps[0], saturday])
+        assert False, "Saturday should raise ValueError"
+    except ValueError as e:
+        assert "Saturday" in str(e)
+    print(f"✓ resolve_trade_days raises for Saturday")
+
+
+def test_timestamp_fast_path():
+    """Test the fixed-width timestamp parser against datetime parsing."""
+    print("\n=== Testing Timestamp Fast Path ===")
+    
+    def general(time_str):
+        dt = datetime.datetime.fromisoformat(time_str)
+        if dt.tzinfo is None:
+            dt = dt.replace(tzinfo=PT_TIMEZONE)
+        return int(dt.astimezone(PT_TIMEZONE).timestamp())
+    
+    with open(SAMPLE_CSV) as f:
+        times = [line.split(",")[0] for line in f.read().splitlines()[1:]]
+    times += [
+        "2024-03-10T01:59:00-08:00",    # just before spring forward
+        "2024-03-10T03:00:00-07:00",    # just after
+        "2024-11-03T01:30:00-07:00",    # ambiguous hour, first pass
+        "2024-11-03T01:30:00-08:00",    # ambiguous hour, second pass
+        "2024-01-08T10:00:00+05:30",    # other offsets
+        "2024-01-08T10:00:00Z",         # unusual shapes use the general path
+        "2024-01-08T10:00:00.123-08:00",
+        "2024-01-08T10:00:00.50000",
+    ]
+    
+    expected = [general(t) for t in times]
+    assert [parse_tradingview_timestamp(t) for t in times] == expected
+    assert parse_tradingview_timestamps(times) == expected
+    print(f"✓ {len(times)} timestamps match datetime parsing")
+    
+    # Malformed fixed-width strings still raise
+    for bad in ("2024-02-30T10:00:00-08:00", "2024-01-08T25:00:00-08:00"):
+        try:
+            parse_tradingview_timestamp(bad)
+            assert False, f"{bad} should raise ValueError"
+        except ValueError:
+            pass
+    print(f"✓ Malformed timestamps raise ValueError")
+
+
+def _write_sample_parts(count, overlap=50):
+    """Split the sample CSV into overlapping part files; return their paths."""
+    with open(SAMPLE_CSV) as f:
+        lines = f.read().splitlines()
+    header, rows = lines[0], lines[1:]
+    size = len(rows) // count + 1
+    paths = []
+    for i in range(count):
+        path = f"test_market_data_part{i}.csv"
+        part = rows[max(0, i * size - overlap):(i + 1) * size]
+        with open(path, "w") as f:
+            f.write("\n".join([header] + part) + "\n")
+        paths.append(path)
+    return paths
+
+
+def test_ingest_many():
+    """Test parallel multi-file ingestion against serial ingest_csv."""
+    print("\n=== Testing Multi-File Ingestion ===")
+    
+    paths = _write_sample_parts(3)
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        serial = [ingest_csv(path, "MNQ", "1m", db_path=TEST_DB) for path in paths]
+        serial_bars = _dump_bars(TEST_DB)
+        
+        cleanup_test_db()
+        init_database(TEST_DB)
+        report = ingest_many(paths, "MNQ", "1m", db_path=TEST_DB, workers=2)
+        parallel_bars = _dump_bars(TEST_DB)
+    finally:
+        for path in paths:
+            os.remove(path)
+    
+    assert [{k: v for k, v in f.items() if k != "file"} for f in report["files"]] == serial
+    assert [f["file"] for f in report["files"]] == paths
+    assert report["inserted"] == sum(s["inserted"] for s in serial)
+    assert report["skipped"] == sum(s["skipped"] for s in serial) > 0, "Overlap should be skipped"
+    assert parallel_bars == serial_bars, "Stored bars should match serial ingestion"
+    print(f"✓ ingest_many matches serial ingestion: {report['inserted']} inserted, "
+          f"{report['skipped']} skipped across {len(paths)} files")
+
+
+def test_raw_storage_policies():
+    """Test that every raw_json storage policy round-trips through get_bars."""
+    print("\n=== Testing raw_json Storage Policies ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    expected = {bar["timestamp"]: bar["raw_json"]
+                for bar in get_bars("MNQ", include_halt=True, db_path=TEST_DB, with_raw=True)}
+    
+    bars = get_bars("MNQ", db_path=TEST_DB)
+    assert "raw_json" not in bars[0], "raw_json should only be returned with with_raw=True"
+    
+    for raw_storage in ("compressed", "side", "off"):
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            first = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=bulk, raw_storage=raw_storage)
+            again = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=bulk, raw_storage=raw_storage,
+                               force=True)
+            assert again["skipped"] == first["inserted"], "Re-ingestion should skip everything"
+            
+            bars = get_bars("MNQ", include_halt=True, db_path=TEST_DB, with_raw=True)
+            for bar in bars:
+                if raw_storage == "off":
+                    assert bar["raw_json"] is None
+                else:
+                    assert bar["raw_json"] == expected[bar["timestamp"]]
+            if raw_storage != "off":
+                assert get_bar_raw(bars[0]["id"], db_path=TEST_DB) == expected[bars[0]["timestamp"]]
+        print(f"✓ raw_storage='{raw_storage}' round-trips ({len(bars)} bars)")
+    
+    try:
+        ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, raw_storage="gzip")
+        assert False, "Unknown raw_storage should raise ValueError"
+    except ValueError:
+        print(f"✓ Unknown raw_storage raises ValueError")
+
+
+def test_archive_session():
+    """Test that an Archive reuses one connection per thread and matches the module API."""
+    print("\n=== Testing Archive Sessions ===")
+    
+    cleanup_test_db()
+    with Archive(TEST_DB) as archive:
+        archive.init_database()
+        stats = archive.ingest_csv(SAMPLE_CSV, "MNQ", "1m")
+        again = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+        assert stats["inserted"] > 0 and again["skipped"] == stats["inserted"]
+        
+        conn = archive.connection()
+        assert archive.connection() is conn, "Same thread should reuse its connection"
+        assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+        assert conn.execute("PRAGMA synchronous").fetchone()[0] == 1, "synchronous should be NORMAL"
+        
+        session_date = archive.get_bars("MNQ")[0]["session_date"]
+        assert archive.get_bars("MNQ", session_date=session_date) == \
+            get_bars("MNQ", session_date=session_date, db_path=TEST_DB)
+        assert archive.get_trade_day("MNQ", session_date) == get_trade_day("MNQ", session_date, db_path=TEST_DB)
+        
+        annotation_id = archive.save_day_annotation("MNQ", session_date, "Archive note", tags=["session"])
+        notes = get_day_annotations("MNQ", session_date, session_date, db_path=TEST_DB)
+        assert [n["id"] for n in notes] == [annotation_id]
+        
+        results = {}
+        
+        def reader(name):
+            results[name] = (archive.connection(), archive.get_bars("MNQ", session_date=session_date))
+        
+        threads = [threading.Thread(target=reader, args=(i,)) for i in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        connections = {id(c) for c, _ in results.values()} | {id(conn)}
+        assert len(connections) == 5, "Each thread should get its own connection"
+        assert all(bars == archive.get_bars("MNQ", session_date=session_date) for _, bars in results.values())
+        
+        try:
+            archive.ingest_csv(SAMPLE_CSV, "MNQ", "1m", raw_storage="gzip")
+            assert False, "Unknown raw_storage should raise ValueError"
+        except ValueError:
+            pass
+        assert not conn.in_transaction, "Failed writes should not leave a transaction open"
+    
+    # Queries leave a rollback-journal database as it is; the first write switches it to WAL
+    conn = sqlite3.connect(TEST_DB)
+    assert conn.execute("PRAGMA journal_mode = DELETE").fetchone()[0] == "delete"
+    conn.close()
+    assert get_bars("MNQ", session_date=session_date, db_path=TEST_DB)
+    assert get_day_annotations("MNQ", session_date, session_date, db_path=TEST_DB)
+    assert not os.path.exists(TEST_DB + "-wal") and not os.path.exists(TEST_DB + "-shm")
+    conn = sqlite3.connect(TEST_DB)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "delete"
+    conn.close()
+    save_day_annotation("MNQ", session_date, "Second note", db_path=TEST_DB)
+    conn = sqlite3.connect(TEST_DB)
+    assert conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    conn.close()
+    
+    print(f"✓ Archive reuses per-thread connections ({stats['inserted']} bars, {len(connections)} connections)")
+
+
+def test_wal_readers_during_ingest():
+    """Test that get_bars keeps running against consistent snapshots during a chunked ingest."""
+    print("\n=== Testing WAL Readers During Ingest ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    paths = _write_sample_parts(4)
+    latencies = []
+    counts = []
+    errors = []
+    done = threading.Event()
+    
+    def reader():
+        with Archive(TEST_DB) as archive:
+            while not done.is_set():
+                try:
+                    start = time.perf_counter()
+                    bars = archive.get_bars("MNQ", include_halt=True)
+                    latencies.append(time.perf_counter() - start)
+                    counts.append(len(bars))
+                except Exception as e:
+                    errors.append(e)
+                    return
+    
+    thread = threading.Thread(target=reader)
+    try:
+        with Archive(TEST_DB) as archive:
+            # Seed the archive so the reader has real work from the start
+            first = archive.ingest_csv(paths[0], "MNQ", "1m")
+            thread.start()
+            report = archive.ingest_many(paths[1:], "MNQ", "1m", workers=1, commit_every=100)
+            done.set()
+            thread.join()
+            
+            busy, _, _ = archive.checkpoint("TRUNCATE")
+            assert busy == 0, "TRUNCATE checkpoint should complete once readers are gone"
+            assert os.path.getsize(TEST_DB + "-wal") == 0, "WAL should be truncated"
+    finally:
+        done.set()
+        thread.join()
+        for path in paths:
+            os.remove(path)
+    
+    assert not errors, f"Reader failed during ingest: {errors[0]!r}"
+    assert counts == sorted(counts), "Readers should only ever see committed, growing snapshots"
+    assert counts[0] >= first["inserted"]
+    assert len(get_bars("MNQ", include_halt=True, db_path=TEST_DB)) == first["inserted"] + report["inserted"]
+    
+    assert len(latencies) >= 2, "Reader should run while the ingest is in progress"
+    percentiles = statistics.quantiles(latencies, n=100, method="inclusive")
+    p50, p95, p99 = (percentiles[i] * 1000 for i in (49, 94, 98))
+    print(f"✓ {len(latencies)} get_bars calls while ingesting {report['inserted']} bars, no errors")
+    print(f"  read latency p50 {p50:.2f} ms, p95 {p95:.2f} ms, p99 {p99:.2f} ms, max {max(latencies) * 1000:.2f} ms")
+    
+    try:
+        ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, commit_every=0)
+        assert False, "commit_every=0 should raise ValueError"
+    except ValueError:
+        print(f"✓ Invalid commit_every raises ValueError")
+
+
+def test_iter_bars():
+    """Test that iter_bars streams the same bars as get_bars."""
+    print("\n=== Testing Streaming Bar Queries ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    
+    expected = get_bars("MNQ", include_halt=True, db_path=TEST_DB, with_raw=True)
+    streamed = list(iter_bars("MNQ", include_halt=True, db_path=TEST_DB, with_raw=True, batch_size=7))
+    assert [bar._asdict() for bar in streamed] == expected, "iter_bars should match get_bars"
+    assert all(bar.raw_json is None for bar in iter_bars("MNQ", db_path=TEST_DB))
+    print(f"✓ iter_bars matches get_bars ({len(streamed)} bars, batch_size=7)")
+    
+    sessions = list(iter_bars("MNQ", db_path=TEST_DB, by_session=True))
+    dates = [session_date for session_date, _ in sessions]
+    assert dates == sorted(set(bar["session_date"] for bar in expected)), "One chunk per trade day, in order"
+    for session_date, bars in sessions:
+        assert bars == list(iter_bars("MNQ", session_date=session_date, db_path=TEST_DB))
+    print(f"✓ by_session yields {len(sessions)} trade-day chunks")
+    
+    # Abandoning a stream part-way releases its connection
+    stream = iter_bars("MNQ", db_path=TEST_DB, batch_size=10)
+    next(stream)
+    assert os.path.exists(TEST_DB + "-wal"), "An open stream holds a WAL connection"
+    stream.close()
+    assert not os.path.exists(TEST_DB + "-wal"), "The last connection to close removes the WAL"
+    print(f"✓ Closing a stream early releases the database")
+
+
+def test_get_bars_columnar():
+    """Test that get_bars_columnar returns the get_bars values as typed columns."""
+    print("\n=== Testing Columnar Bar Queries ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    
+    expected = get_bars("MNQ", include_halt=True, db_path=TEST_DB)
+    columns = get_bars_columnar("MNQ", include_halt=True, db_path=TEST_DB, batch_size=100)
+    assert len(columns) == len(expected)
+    assert columns.timestamp.typecode == "q" and columns.close.typecode == "d"
+    for i, bar in enumerate(expected):
+        assert columns.timestamp[i] == bar["timestamp"]
+        assert (columns.open[i], columns.high[i], columns.low[i], columns.close[i], columns.volume[i]) == \
+            (bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"])
+        assert bool(columns.halt_period[i]) == bar["halt_period"]
+        assert columns.session_date(i) == bar["session_date"]
+    assert columns.session_dates == sorted(set(bar["session_date"] for bar in expected))
+    print(f"✓ Columns match get_bars ({len(columns)} bars, {len(columns.session_dates)} session codes)")
+    
+    assert len(get_bars_columnar("MNQ", session_date="1999-01-04", db_path=TEST_DB)) == 0
+    
+    try:
+        import numpy as np
+    except ImportError:
+        print("- NumPy not installed, skipping zero-copy checks")
+        return
+    arrays = columns.to_numpy()
+    assert arrays["timestamp"].dtype == np.int64 and arrays["halt_period"].dtype == np.bool_
+    columns.close[0] += 1.0
+    assert arrays["close"][0] == columns.close[0], "to_numpy should share the column buffers"
+    print(f"✓ to_numpy shares memory with the columns")
+
+
+def _resample_in_python(bars, seconds):
+    """Reference resampling: buckets aligned to 3:00 PM PT session opens."""
+    buckets = {}
+    for bar in bars:
+        day = datetime.date.fromisoformat(bar["session_date"]) - datetime.timedelta(days=1)
+        session_open = int(datetime.datetime(day.year, day.month, day.day, 15, tzinfo=PT_TIMEZONE).timestamp())
+        start = session_open + (bar["timestamp"] - session_open) // seconds * seconds
+        bucket = buckets.get(start)
+        if bucket is None:
+            buckets[start] = dict(bar, id=None, timestamp=start)
+        else:
+            bucket["high"] = max(bucket["high"], bar["high"])
+            bucket["low"] = min(bucket["low"], bar["low"])
+            bucket["close"] = bar["close"]
+            bucket["volume"] += bar["volume"]
+    return [buckets[start] for start in sorted(buckets)]
+
+
+def test_timeframes_and_resampling():
+    """Test timeframe-keyed storage and resampling in get_bars."""
+    print("\n=== Testing Timeframes and Resampling ===")
+    
+    assert parse_timeframe("1m") == parse_timeframe("1") == 60
+    assert parse_timeframe("15m") == 900 and parse_timeframe("4h") == parse_timeframe("4H") == 14400
+    assert parse_timeframe("1D") == 86400 and parse_timeframe("30s") == 30
+    assert parse_timeframe("1min") == parse_timeframe("1 Minute") == 60 and parse_timeframe("15mins") == 900
+    assert parse_timeframe("4hours") == 14400 and parse_timeframe("1day") == 86400
+    for bad in ("", "0m", "5x", "2D", "1minx"):
+        try:
+            parse_timeframe(bad)
+            assert False, f"parse_timeframe({bad!r}) should raise ValueError"
+        except ValueError as e:
+            assert "Invalid timeframe" in str(e) or "longer than one day" in str(e), e
+    for bad in ("1W", "1M", "1month"):
+        try:
+            parse_timeframe(bad)
+            assert False, f"parse_timeframe({bad!r}) should raise ValueError"
+        except ValueError as e:
+            assert "weekly or monthly" in str(e), e
+    print("✓ Timeframe strings parsed")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    minute_bars = get_bars("MNQ", db_path=TEST_DB)
+    assert get_bars("MNQ", timeframe="1m", db_path=TEST_DB) == minute_bars
+    
+    for timeframe, seconds in (("5m", 300), ("15m", 900), ("1h", 3600), ("4h", 14400), ("1D", 86400)):
+        resampled = get_bars("MNQ", timeframe=timeframe, db_path=TEST_DB)
+        assert resampled == _resample_in_python(minute_bars, seconds), f"{timeframe} resampling mismatch"
+        for bar in resampled:
+            # Buckets never cross into the 2-3 PM halt
+            assert get_pt_datetime(bar["timestamp"]).hour != 14
+    daily = get_bars("MNQ", timeframe="1D", db_path=TEST_DB)
+    assert [bar["session_date"] for bar in daily] == sorted({bar["session_date"] for bar in minute_bars})
+    print(f"✓ Resampled 5m/15m/1h/4h/1D bars match a Python aggregation ({len(daily)} sessions)")
+    
+    session_date = daily[1]["session_date"]
+    one_day = get_bars("MNQ", session_date=session_date, timeframe="15m", db_path=TEST_DB)
+    assert one_day == [bar for bar in get_bars("MNQ", timeframe="15m", db_path=TEST_DB)
+                       if bar["session_date"] == session_date]
+    columns = get_bars_columnar("MNQ", timeframe="15m", db_path=TEST_DB)
+    assert list(columns.close) == [bar["close"] for bar in get_bars("MNQ", timeframe="15m", db_path=TEST_DB)]
+    
+    # Store 5-minute bars next to the 1-minute bars: same timestamps, separate keys
+    five_minute = get_bars("MNQ", timeframe="5m", db_path=TEST_DB)
+    with open(TEST_CSV, "w") as f:
+        f.write("time,open,high,low,close,Volume\n")
+        for bar in five_minute:
+            time_str = get_pt_datetime(bar["timestamp"]).isoformat()
+            f.write(f"{time_str},{bar['open']},{bar['high']},{bar['low']},{bar['close']},{bar['volume'] + 1}\n")
+    try:
+        stats = ingest_csv(TEST_CSV, "MNQ", "5m", db_path=TEST_DB)
+    finally:
+        os.remove(TEST_CSV)
+    assert stats["inserted"] == len(five_minute) and stats["conflicts"] == 0
+    assert get_bars("MNQ", db_path=TEST_DB) == minute_bars, "Default query should not mix timeframes"
+    stored = get_bars("MNQ", timeframe="5m", db_path=TEST_DB)
+    assert [bar["volume"] for bar in stored] == [bar["volume"] + 1 for bar in five_minute]
+    assert all(bar["id"] is not None for bar in stored), "Stored 5m bars should be returned as stored"
+    print(f"✓ 1m and 5m bars stored side by side ({stats['inserted']} 5m bars)")
+    
+    for timeframe in ("90s", "30s"):
+        try:
+            get_bars("MNQ", timeframe=timeframe, db_path=TEST_DB)
+            assert False, f"timeframe={timeframe} should raise ValueError"
+        except ValueError:
+            pass
+    print("✓ Timeframes that are not multiples of the stored data raise ValueError")
+
+
+def test_mixed_timeframe_days():
+    """Test that the timeframe is resolved per trade day when days are stored at different resolutions."""
+    print("\n=== Testing Mixed-Resolution Trade Days ===")
+    
+    def write_bars(path, start, count, step):
+        with open(path, "w") as f:
+            f.write("time,open,high,low,close,Volume\n")
+            for i in range(count):
+                time_str = (start + datetime.timedelta(seconds=step * i)).isoformat()
+                price = 17000.0 + i
+                f.write(f"{time_str},{price},{price + 2},{price - 2},{price + 1},{10 + i}\n")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    export_dir = TEST_DB + ".export"
+    try:
+        write_bars(TEST_CSV, datetime.datetime(2024, 1, 8, 6, 0, tzinfo=PT_TIMEZONE), 120, 60)
+        ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        write_bars(TEST_CSV, datetime.datetime(2024, 1, 9, 6, 0, tzinfo=PT_TIMEZONE), 8, 900)
+        ingest_csv(TEST_CSV, "MNQ", "15m", db_path=TEST_DB)
+        
+        both = {"start_date": "2024-01-08", "end_date": "2024-01-09", "db_path": TEST_DB}
+        finest = get_bars("MNQ", **both)
+        assert [bar["session_date"] for bar in finest] == ["2024-01-08"] * 120 + ["2024-01-09"] * 8
+        assert finest == get_bars("MNQ", session_date="2024-01-08", db_path=TEST_DB) + \
+            get_bars("MNQ", session_date="2024-01-09", db_path=TEST_DB)
+        
+        quarter_hours = get_bars("MNQ", timeframe="15m", **both)
+        minute_bars = [bar for bar in finest if bar["session_date"] == "2024-01-08"]
+        assert quarter_hours[:8] == _resample_in_python(minute_bars, 900), "01-08 should be resampled from 1m"
+        assert quarter_hours[8:] == finest[120:], "01-09 should return its stored 15m bars"
+        
+        assert [tuple(bar[:9]) for bar in iter_bars("MNQ", timeframe="15m", **both)] == \
+            [tuple(bar.values()) for bar in quarter_hours]
+        assert list(get_bars_columnar("MNQ", **both).timestamp) == [bar["timestamp"] for bar in finest]
+        report = export_bars("MNQ", export_dir, format="columnar", **both)
+        assert sorted(os.path.basename(path) for path in report["files"]) == \
+            ["tradingview-60s.bars", "tradingview-900s.bars"]
+        
+        try:
+            get_bars("MNQ", timeframe="1m", **both)
+            assert False, "15m bars cannot be resampled to 1m"
+        except ValueError:
+            pass
+    finally:
+        if os.path.exists(TEST_CSV):
+            os.remove(TEST_CSV)
+        shutil.rmtree(export_dir, ignore_errors=True)
+    print("✓ Each trade day returns its own stored timeframe, or is resampled from its finest one")
+
+
+def test_session_summaries():
+    """Test that ingest keeps session_summary in step with the stored bars."""
+    print("\n=== Testing Session Summaries ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    paths = _write_sample_parts(3)
+    try:
+        # Overlapping parts through every write path
+        ingest_csv(paths[0], "MNQ", "1m", db_path=TEST_DB)
+        ingest_csv(paths[2], "MNQ", "1m", db_path=TEST_DB, bulk=True, commit_every=100)
+        ingest_many(paths, "MNQ", "1m", db_path=TEST_DB, workers=1)
+    finally:
+        for path in paths:
+            os.remove(path)
+    
+    summaries = get_session_summaries("MNQ", db_path=TEST_DB)
+    daily = get_bars("MNQ", timeframe="1D", db_path=TEST_DB)
+    assert [s["session_date"] for s in summaries] == [bar["session_date"] for bar in daily]
+    for summary, bar in zip(summaries, daily):
+        minute_bars = get_bars("MNQ", session_date=bar["session_date"], db_path=TEST_DB)
+        assert (summary["open"], summary["high"], summary["low"], summary["close"]) == \
+            (bar["open"], bar["high"], bar["low"], bar["close"])
+        assert abs(summary["volume"] - bar["volume"]) < 1e-6
+        assert summary["bar_count"] == len(minute_bars)
+        assert summary["first_timestamp"] == minute_bars[0]["timestamp"]
+        assert summary["last_timestamp"] == minute_bars[-1]["timestamp"]
+        vwap = sum((b["high"] + b["low"] + b["close"]) / 3 * b["volume"] for b in minute_bars) / bar["volume"]
+        assert abs(summary["vwap"] - vwap) < 1e-6
+    print(f"✓ Incremental summaries match the bars ({len(summaries)} sessions)")
+    
+    assert rebuild_session_summaries(db_path=TEST_DB) == len(summaries)
+    rebuilt = get_session_summaries("MNQ", db_path=TEST_DB)
+    for before, after in zip(summaries, rebuilt):
+        assert before.keys() == after.keys()
+        assert all(abs(before[k] - after[k]) < 1e-6 if isinstance(before[k], float) else before[k] == after[k]
+                   for k in before)
+    print(f"✓ rebuild_session_summaries reproduces them")
+    
+    middle = summaries[1]["session_date"]
+    assert get_session_summaries("MNQ", middle, middle, db_path=TEST_DB) == [rebuilt[1]]
+    assert get_session_summaries("MNQ", timeframe="5m", db_path=TEST_DB) == []
+    assert get_session_summaries("ES", db_path=TEST_DB) == []
+    print(f"✓ Date, timeframe and symbol filters")
+
+
+def test_bar_cache():
+    """Test the get_bars cache: hits, generation-based invalidation and LRU eviction."""
+    print("\n=== Testing get_bars Cache ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    paths = _write_sample_parts(2, overlap=0)
+    try:
+        ingest_csv(paths[0], "MNQ", "1m", db_path=TEST_DB)
+        with Archive(TEST_DB, cache_bytes=10_000_000) as archive:
+            dates = [bar["session_date"] for bar in archive.get_bars("MNQ", timeframe="1D")]
+            first, last = dates[0], dates[-1]
+            
+            bars = archive.get_bars("MNQ", session_date=first)
+            again = archive.get_bars("MNQ", session_date=first)
+            assert again == bars and again is not bars
+            again[0]["close"] = -1.0
+            assert archive.get_bars("MNQ", session_date=first) == bars, "Callers get copies"
+            stats = archive.cache.stats()
+            assert (stats["hits"], stats["misses"]) == (2, 2), stats
+            print(f"✓ Repeated queries hit the cache: {stats}")
+            
+            # The second part adds bars to the last session (and later ones) only
+            last_before = archive.get_bars("MNQ", session_date=last)
+            whole_before = archive.get_bars("MNQ")
+            ingest_csv(paths[1], "MNQ", "1m", db_path=TEST_DB)
+            
+            assert archive.get_bars("MNQ", session_date=first) == bars
+            assert archive.cache.stats()["invalidations"] == 0, "Untouched trade days stay cached"
+            last_after = archive.get_bars("MNQ", session_date=last)
+            whole_after = archive.get_bars("MNQ")
+            assert len(last_after) > len(last_before) and len(whole_after) > len(whole_before)
+            assert last_after == get_bars("MNQ", session_date=last, db_path=TEST_DB)
+            assert archive.cache.stats()["invalidations"] == 2
+            print(f"✓ Ingest invalidates exactly the affected queries")
+    finally:
+        for path in paths:
+            os.remove(path)
+    
+    with Archive(TEST_DB, cache_bytes=1) as archive:
+        archive.get_bars("MNQ", session_date=first)
+        assert archive.cache.stats()["entries"] == 0, "Results over the cap are not cached"
+    
+    # Three keys for the same bars, with room for two of them
+    variants = [{}, {"include_halt": True}, {"timeframe": "1m"}]
+    with Archive(TEST_DB, cache_bytes=10_000_000) as archive:
+        archive.get_bars("MNQ", session_date=last)
+        entry_bytes = archive.cache.stats()["bytes"]
+    with Archive(TEST_DB, cache_bytes=entry_bytes * 5 // 2) as archive:
+        for kwargs in variants:
+            archive.get_bars("MNQ", session_date=last, **kwargs)
+        stats = archive.cache.stats()
+        assert stats["entries"] == 2 and stats["evictions"] == 1 and stats["bytes"] <= stats["max_bytes"]
+        archive.get_bars("MNQ", session_date=last, **variants[2])
+        archive.get_bars("MNQ", session_date=last, **variants[0])
+        stats = archive.cache.stats()
+        assert (stats["hits"], stats["misses"]) == (1, 4), "Least recently used entry was evicted"
+    print(f"✓ Byte cap enforced by LRU eviction ({stats['evictions']} evictions)")
+
+
+def test_annotation_tags():
+    """Test ANY/ALL tag filtering and the annotation_tags backfill migration."""
+    print("\n=== Testing Annotation Tags ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    tag_sets = [["momentum", "breakout"], ["momentum"], ["breakout", "gap"], [], None,
+                ["momentum", "breakout", "gap", "gap"]]
+    ids = [
+        save_day_annotation("MNQ", "2024-01-08", f"note {i}", tags=tags, db_path=TEST_DB)
+        for i, tags in enumerate(tag_sets)
+    ]
+    
+    def query(tags, tag_mode="any"):
+        annotations = get_day_annotations(
+            "MNQ", "2024-01-08", "2024-01-08", tags=tags, db_path=TEST_DB, tag_mode=tag_mode
+        )
+        return [annotation["id"] for annotation in annotations]
+    
+    def expected(tags, match):
+        return [i for i, ts in zip(ids, tag_sets) if ts and match(tag in ts for tag in tags)]
+    
+    for tags in (["momentum"], ["breakout", "gap"], ["momentum", "gap"], ["nope"], ["gap", "gap"]):
+        assert query(tags) == expected(tags, any), tags
+        assert query(tags, "all") == expected(tags, all), tags
+    assert query(None, "all") == ids
+    assert get_day_annotations("MNQ", "2024-01-08", "2024-01-08", tags=["gap"],
+                               db_path=TEST_DB)[-1]["tags"] == ["momentum", "breakout", "gap", "gap"]
+    print("✓ ANY and ALL tag filters match a Python scan")
+    
+    try:
+        query(["gap"], "some")
+        assert False, "Should reject an unknown tag_mode"
+    except ValueError as e:
+        assert "Unknown tag_mode 'some'" in str(e)
+    
+    # Databases from before the tag table get it backfilled from the JSON column
+    conn = sqlite3.connect(TEST_DB)
+    conn.execute("DROP TABLE annotation_tags")
+    conn.execute("PRAGMA user_version = 5")
+    conn.commit()
+    conn.close()
+    init_database(TEST_DB)
+    assert query(["breakout"], "all") == expected(["breakout"], all)
+    assert query(["gap", "momentum"], "all") == expected(["gap", "momentum"], all)
+    print("✓ Migration backfills annotation_tags from existing annotations")
+
+
+def test_search_annotations():
+    """Test FTS5 annotation search against a LIKE scan, supersedes and the backfill migration."""
+    print("\n=== Testing Annotation Search ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    rng = random.Random(7)
+    phrases = ["failed breakout", "CPI", "gap fill", "range day", "trend day", "opening drive"]
+    dates = ["2024-01-08", "2024-01-09", "2024-01-10", "2024-01-11"]
+    for i in range(200):
+        words = rng.sample(phrases, 2) + [rng.choice(["cpi", "Failed Breakout", "quiet"])]
+        save_day_annotation(rng.choice(["MNQ", "ES"]), rng.choice(dates), f"{i}: " + " then ".join(words),
+                            db_path=TEST_DB)
+    
+    def like_baseline(symbol, phrase, start_date=None, end_date=None, status="active"):
+        conn = sqlite3.connect(TEST_DB)
+        rows = conn.execute(
+            """SELECT da.id FROM day_annotations da JOIN trade_days td ON da.trade_day_id = td.id
+               WHERE td.symbol = ? AND da.content LIKE ?
+                 AND td.session_date >= ? AND td.session_date <= ? AND (? = 'all' OR da.status = ?)""",
+            (symbol, f"%{phrase}%", start_date or "", end_date or "9999", status, status)
+        ).fetchall()
+        conn.close()
+        return sorted(row[0] for row in rows)
+    
+    def search_ids(*args, **kwargs):
+        return sorted(a["id"] for a in search_annotations(*args, db_path=TEST_DB, **kwargs))
+    
+    for phrase in ("failed breakout", "CPI", "range day"):
+        for symbol in ("MNQ", "ES"):
+            expected = like_baseline(symbol, phrase)
+            assert expected and search_ids(symbol, f'"{phrase}"') == expected, phrase
+        expected = like_baseline("MNQ", phrase, "2024-01-09", "2024-01-10")
+        assert search_ids("MNQ", f'"{phrase}"', "2024-01-09", "2024-01-10") == expected
+    print("✓ Phrase search matches a LIKE scan, by symbol and date range")
+    
+    hits = search_annotations("MNQ", "cpi OR breakout", db_path=TEST_DB)
+    ranks = [hit["rank"] for hit in hits]
+    assert ranks == sorted(ranks), "Best matches first"
+    top = search_annotations("MNQ", "cpi", limit=5, db_path=TEST_DB)
+    assert top == search_annotations("MNQ", "cpi", db_path=TEST_DB)[:5]
+    print(f"✓ {len(hits)} hits ranked by bm25")
+    
+    # Superseded notes leave the default results, new ones are searchable at once
+    old = search_annotations("MNQ", '"failed breakout"', db_path=TEST_DB)[0]
+    new_id = save_day_annotation("MNQ", old["session_date"], "Actually a failed breakdown, CPI driven",
+                                 supersedes_id=old["id"], db_path=TEST_DB)
+    assert old["id"] not in search_ids("MNQ", '"failed breakout"')
+    assert old["id"] in search_ids("MNQ", '"failed breakout"', status="all")
+    assert search_ids("MNQ", "breakdown") == [new_id]
+    assert search_ids("MNQ", '"failed breakout"', status="superseded") == [old["id"]]
+    print("✓ Index stays in sync with inserts and supersedes")
+    
+    try:
+        search_annotations("MNQ", '"unbalanced', db_path=TEST_DB)
+        assert False, "Should reject a malformed query"
+    except ValueError as e:
+        assert "Invalid search query" in str(e)
+    
+    # Databases from before the index get it built from existing annotations
+    conn = sqlite3.connect(TEST_DB)
+    conn.execute("DROP TABLE annotation_fts")
+    conn.execute("PRAGMA user_version = 6")
+    conn.commit()
+    conn.close()
+    init_database(TEST_DB)
+    assert search_ids("ES", '"gap fill"') == like_baseline("ES", "gap fill")
+    assert search_ids("MNQ", "breakdown") == [new_id]
+    print("✓ Migration indexes existing annotations")
+
+
+def test_save_day_annotations_bulk():
+    """Test bulk annotation saves against per-call saves, supersede chains and atomicity."""
+    print("\n=== Testing Bulk Annotations ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    existing = save_day_annotation("MNQ", "2024-01-08", "Old gap note", tags=["gap"], db_path=TEST_DB)
+    records = [
+        {"symbol": "MNQ", "session_date": "2024-01-09", "content": "Gap up 40 points",
+         "annotation_type": "observation", "tags": ["gap", "auto"], "source": "script"},
+        {"symbol": "ES", "session_date": "2024-01-09", "content": "Inside range day", "tags": ["range"]},
+        {"symbol": "MNQ", "session_date": "2024-01-08", "content": "Gap filled by noon",
+         "tags": ["gap"], "supersedes_id": existing},
+        {"symbol": "MNQ", "session_date": "2024-01-09", "content": "Gap up 42 points (revised)",
+         "tags": ["gap", "auto", "auto"], "source": "script", "supersedes_index": 0},
+        {"symbol": "MNQ", "session_date": "2024-01-09", "content": "Gap up 42.25 points (final)",
+         "tags": ["gap", "auto"], "source": "script", "supersedes_index": 3},
+        {"symbol": "MNQ", "session_date": "2024-01-10", "content": "No gap"},
+    ]
+    ids = save_day_annotations_bulk(records, db_path=TEST_DB)
+    assert ids == sorted(ids) and len(set(ids)) == len(records) and existing not in ids
+    
+    annotations = {a["id"]: a for a in get_day_annotations("MNQ", "2024-01-01", "2024-01-31", status="all",
+                                                           db_path=TEST_DB)}
+    annotations.update({a["id"]: a for a in get_day_annotations("ES", "2024-01-01", "2024-01-31",
+                                                                db_path=TEST_DB)})
+    for record, annotation_id in zip(records, ids):
+        annotation = annotations[annotation_id]
+        assert annotation["content"] == record["content"] and annotation["session_date"] == record["session_date"]
+        assert annotation["tags"] == record.get("tags", [])
+        assert annotation["source"] == record.get("source", "manual")
+    print(f"✓ {len(ids)} annotations saved, ids in input order")
+    
+    assert annotations[existing]["status"] == "superseded"
+    assert annotations[ids[2]]["supersedes_id"] == existing
+    assert [annotations[ids[i]]["status"] for i in (0, 3, 4)] == ["superseded", "superseded", "active"]
+    assert annotations[ids[3]]["supersedes_id"] == ids[0] and annotations[ids[4]]["supersedes_id"] == ids[3]
+    active = get_day_annotations("MNQ", "2024-01-09", "2024-01-09", tags=["auto"], db_path=TEST_DB)
+    assert [a["id"] for a in active] == [ids[4]]
+    assert [a["id"] for a in search_annotations("MNQ", "final", db_path=TEST_DB)] == [ids[4]]
+    print("✓ Supersede chains, tags and search index applied")
+    
+    # Same result as saving one at a time
+    bulk_rows = _dump_annotations(TEST_DB)
+    cleanup_test_db()
+    init_database(TEST_DB)
+    save_day_annotation("MNQ", "2024-01-08", "Old gap note", tags=["gap"], db_path=TEST_DB)
+    for record in records:
+        record = dict(record)
+        index = record.pop("supersedes_index", None)
+        if index is not None:
+            record["supersedes_id"] = ids[index]
+        save_day_annotation(db_path=TEST_DB, **record)
+    assert _dump_annotations(TEST_DB) == bulk_rows
+    print("✓ Bulk save matches per-call saves")
+    
+    for bad, message in (
+        ({"symbol": "MNQ", "session_date": "2024-01-09"}, "missing: content"),
+        ({"symbol": "MNQ", "session_date": "2024-01-09", "content": "x", "tag": ["a"]}, "unknown fields: tag"),
+        ({"symbol": "MNQ", "session_date": "2024-01-09", "content": "x", "supersedes_index": 1}, "earlier record"),
+    ):
+        try:
+            save_day_annotations_bulk([records[0], bad], db_path=TEST_DB)
+            assert False, f"Should reject {bad}"
+        except ValueError as e:
+            assert message in str(e), str(e)
+    
+    try:
+        save_day_annotations_bulk([records[0], {**records[1], "tags": 5}], db_path=TEST_DB)
+        assert False, "Should fail on non-list tags"
+    except TypeError:
+        pass
+    assert _dump_annotations(TEST_DB) == bulk_rows, "A failed batch saves nothing"
+    assert save_day_annotations_bulk([], db_path=TEST_DB) == []
+    print("✓ Invalid batches are rejected without partial writes")
+    
+    # Ids come from each insert, even when other rows take the rowids in between
+    conn = sqlite3.connect(TEST_DB)
+    conn.execute("CREATE TRIGGER audit_script_notes AFTER INSERT ON day_annotations WHEN NEW.source = 'script' "
+                 "BEGIN INSERT INTO day_annotations (trade_day_id, content, source, status) "
+                 "VALUES (NEW.trade_day_id, 'audit', 'trigger', 'active'); END")
+    conn.commit()
+    conn.close()
+    gapped = save_day_annotations_bulk([records[0], {**records[3], "supersedes_index": 0}], db_path=TEST_DB)
+    conn = sqlite3.connect(TEST_DB)
+    rows = [conn.execute("SELECT content, supersedes_id, status FROM day_annotations WHERE id = ?", (i,)).fetchone()
+            for i in gapped]
+    audits = conn.execute("SELECT status FROM day_annotations WHERE source = 'trigger'").fetchall()
+    conn.close()
+    assert gapped[1] - gapped[0] == 2, gapped
+    assert rows == [(records[0]["content"], None, "superseded"), (records[3]["content"], gapped[0], "active")], rows
+    assert audits == [("active",), ("active",)]
+    print("✓ Returned ids match the saved rows when rowids are not consecutive")
+
+
+def test_incremental_ingest():
+    """Test incremental ingest of an overlapping re-export against a full re-ingest."""
+    print("\n=== Testing Incremental Ingest ===")
+    
+    with open(SAMPLE_CSV) as f:
+        lines = f.read().splitlines()
+    header, rows = lines[0], lines[1:]
+    first_export = "test_market_data_first.csv"
+    with open(first_export, "w") as f:
+        f.write("\n".join([header] + rows[:1500]) + "\n")
+    # The re-export revises the last previously exported bar, which was still forming
+    revised = rows[1499].split(",")
+    revised[4] = str(float(revised[4]) + 1.0)
+    with open(TEST_CSV, "w") as f:
+        f.write("\n".join([header] + rows[:1499] + [",".join(revised)] + rows[1500:]) + "\n")
+    
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        ingest_csv(first_export, "MNQ", "1m", db_path=TEST_DB)
+        full = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        full_bars = _dump_bars(TEST_DB)
+        
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            first = ingest_csv(first_export, "MNQ", "1m", db_path=TEST_DB, incremental=True, bulk=bulk)
+            assert first["inserted"] == 1500, "Nothing stored yet: the whole file is read"
+            stats = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, incremental=True, bulk=bulk)
+            assert stats["inserted"] == full["inserted"] and stats["conflicts"] == full["conflicts"] == 1
+            assert 0 < stats["skipped"] <= 60 < full["skipped"], stats["skipped"]
+            assert _dump_bars(TEST_DB) == full_bars
+            # A replay of that run says its counts cover only the overlap window
+            replay = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, incremental=True, bulk=bulk)
+            assert replay["replayed"] and replay["incremental"], replay
+            assert replay["skipped"] == stats["inserted"] + stats["skipped"] < len(rows)
+            assert not ingest_csv(first_export, "MNQ", "1m", db_path=TEST_DB)["incremental"], \
+                "Nothing was stored before the first run, so it read the whole file"
+        print(f"✓ Re-export: {stats['inserted']} inserted, {stats['skipped']} verified in the overlap "
+              f"(full re-check: {full['skipped']})")
+        
+        # force: bypass the ingest_files ledger, which already has this file
+        stats = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, incremental=True, overlap_seconds=0,
+                           force=True)
+        assert stats["inserted"] == stats["skipped"] == stats["conflicts"] == 0, "Nothing newer to read"
+        stats = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, incremental=True, overlap_seconds=10 ** 9,
+                           force=True)
+        assert stats["skipped"] + stats["conflicts"] == len(rows), "A wide window re-checks everything"
+        stats = ingest_csv(TEST_CSV, "MNQ", "5m", db_path=TEST_DB, incremental=True)
+        assert stats["inserted"] == len(rows), "Other timeframes have their own resume point"
+        print("✓ Overlap window and timeframe are respected")
+    finally:
+        os.remove(first_export)
+        os.remove(TEST_CSV)
+
+
+def test_ingest_files_ledger():
+    """Test that identical files are recognized by content hash and not re-parsed."""
+    print("\n=== Testing Ingest File Ledger ===")
+    
+    cleanup_test_db()
+    init_database(TEST_DB)
+    first = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    conn = sqlite3.connect(TEST_DB)
+    ledger = conn.execute("SELECT path, size, content_hash, symbol, timeframe, stats FROM ingest_files").fetchall()
+    assert len(ledger) == 1 and ledger[0][:2] == (SAMPLE_CSV, os.path.getsize(SAMPLE_CSV))
+    assert ledger[0][3:5] == ("MNQ", 60) and len(ledger[0][2]) == 64
+    # Change a stored bar behind the ledger's back: a replay does not read bars
+    conn.execute("UPDATE bars SET close = close + 1 WHERE id = (SELECT MIN(id) FROM bars)")
+    conn.commit()
+    conn.close()
+    
+    replay = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    assert replay == {"inserted": 0, "skipped": first["inserted"], "conflicts": 0, "conflict_details": [],
+                      "replayed": True, "incremental": False}
+    forced = ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB, force=True, bulk=True)
+    assert forced["conflicts"] == 1 and forced["skipped"] == first["inserted"] - 1
+    print(f"✓ Identical file replayed from the ledger; force=True re-verifies ({forced['conflicts']} conflict)")
+    
+    # Same content under another name is recognized; another symbol or changed content is not
+    with open(SAMPLE_CSV) as f:
+        content = f.read()
+    with open(TEST_CSV, "w") as f:
+        f.write(content)
+    try:
+        assert ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)["conflict_details"][0]["file"] == TEST_CSV
+        assert ingest_csv(TEST_CSV, "NQ", "1m", db_path=TEST_DB)["inserted"] == first["inserted"]
+        with open(TEST_CSV, "a") as f:
+            f.write("\n2026-02-09T19:27:00-08:00,25297.5,25299,25296,25298,120\n")
+        appended = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        assert appended["inserted"] == 1 and appended["conflicts"] == 1
+        
+        report = ingest_many([SAMPLE_CSV, TEST_CSV], "MNQ", "1m", db_path=TEST_DB, workers=1)
+        assert [f["file"] for f in report["files"]] == [SAMPLE_CSV, TEST_CSV]
+        assert report["inserted"] == 0 and report["skipped"] == 2 * first["inserted"] - 1
+        conn = sqlite3.connect(TEST_DB)
+        assert conn.execute("SELECT COUNT(*) FROM ingest_files").fetchone()[0] == 3
+        conn.close()
+    finally:
+        os.remove(TEST_CSV)
+    print("✓ Ledger matches content (not paths) per symbol, in ingest_csv and ingest_many")
+
+
+def test_streaming_csv_reader():
+    """Test the mmap CSV reader against csv.DictReader on awkward files."""
+    print("\n=== Testing Streaming CSV Reader ===")
+    
+    with open(SAMPLE_CSV) as f:
+        lines = f.read().splitlines()
+    variants = {
+        "plain": "\n".join(lines) + "\n",
+        "crlf, no final newline": "\r\n".join(lines),
+        "blank lines": "\n".join(lines[:100] + ["", ""] + lines[100:]) + "\n\n",
+        "quoted fields": "\n".join(
+            [lines[0]] + [f'"{line.split(",", 1)[0]}",' + line.split(",", 1)[1] for line in lines[1:]]
+        ) + "\n",
+        "header only": lines[0] + "\n",
+        "empty": "",
+    }
+    saved_read_bytes = market_archivist.CSV_READ_BYTES
+    try:
+        for name, content in variants.items():
+            with open(TEST_CSV, "w", newline="") as f:
+                f.write(content)
+            with open(TEST_CSV, newline="") as f:
+                expected = [tuple(row.values()) for row in csv.DictReader(f)]
+            # Windows smaller than a line, a few lines, and the whole file
+            for read_bytes in (7, 1000, 4 << 20):
+                market_archivist.CSV_READ_BYTES = read_bytes
+                chunks = list(market_archivist._iter_csv_chunks(TEST_CSV, 300))
+                assert [row for _, rows in chunks for row in rows] == expected, (name, read_bytes)
+                assert all(0 < len(rows) <= 300 for _, rows in chunks)
+                assert all(fieldnames == lines[0].split(",") for fieldnames, _ in chunks)
+            if expected:
+                cleanup_test_db()
+                init_database(TEST_DB)
+                bulk = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=True, chunk_size=500)
+                bulk_bars = _dump_bars(TEST_DB)
+                cleanup_test_db()
+                init_database(TEST_DB)
+                assert ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB) == bulk, name
+                assert _dump_bars(TEST_DB) == bulk_bars, name
+    finally:
+        market_archivist.CSV_READ_BYTES = saved_read_bytes
+        os.remove(TEST_CSV)
+    print(f"✓ Chunks match csv.DictReader and the row path on {len(variants)} file layouts")
+
+
+def test_compressed_and_directory_inputs():
+    """Test compressed files, directories and glob patterns against plain ingest."""
+    print("\n=== Testing Compressed and Directory Inputs ===")
+    
+    paths = _write_sample_parts(3)
+    input_dir = "test_market_data_inputs"
+    os.makedirs(input_dir, exist_ok=True)
+    openers = {".gz": gzip.open, ".bz2": bz2.open, ".xz": lzma.open}
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        plain = [ingest_csv(path, "MNQ", "1m", db_path=TEST_DB) for path in paths]
+        plain_bars = _dump_bars(TEST_DB)
+        
+        # One part per codec, named so that name order is not time order
+        compressed = []
+        for path, (suffix, opener), name in zip(paths, openers.items(), ("c", "a", "b")):
+            compressed.append(os.path.join(input_dir, f"{name}.csv{suffix}"))
+            with open(path, "rb") as src, opener(compressed[-1], "wb") as dst:
+                shutil.copyfileobj(src, dst)
+        with open(os.path.join(input_dir, "notes.txt"), "w") as f:
+            f.write("not an export\n")
+        
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            stats = [ingest_csv(path, "MNQ", "1m", db_path=TEST_DB, bulk=bulk) for path in compressed]
+            assert stats == plain and _dump_bars(TEST_DB) == plain_bars, bulk
+        print(f"✓ {', '.join(openers)} inputs match plain ingest (row and bulk paths)")
+        
+        assert expand_csv_inputs(input_dir) == compressed, "Directory files are ordered by first timestamp"
+        assert expand_csv_inputs([paths[2], os.path.join(input_dir, "*.csv.*")]) == [paths[2]] + compressed
+        try:
+            expand_csv_inputs(os.path.join(input_dir, "*.parquet"))
+            assert False, "An empty pattern should raise"
+        except FileNotFoundError:
+            pass
+        
+        cleanup_test_db()
+        init_database(TEST_DB)
+        report = ingest_csv(input_dir, "MNQ", "1m", db_path=TEST_DB)
+        assert [f["file"] for f in report["files"]] == compressed
+        assert report["inserted"] == sum(s["inserted"] for s in plain) and _dump_bars(TEST_DB) == plain_bars
+        cleanup_test_db()
+        init_database(TEST_DB)
+        report = ingest_many([os.path.join(input_dir, "*.csv.*")], "MNQ", "1m", db_path=TEST_DB, workers=2)
+        assert [f["file"] for f in report["files"]] == compressed and _dump_bars(TEST_DB) == plain_bars
+        print(f"✓ Directory and glob inputs expand to {len(compressed)} files in timestamp order")
+        
+        # Compressed files cannot seek: incremental ingest drops the older rows instead
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            ingest_csv(paths[0], "MNQ", "1m", db_path=TEST_DB)
+            stats = ingest_csv(compressed[1], "MNQ", "1m", db_path=TEST_DB, incremental=True, bulk=bulk)
+            assert stats["inserted"] == plain[1]["inserted"] and 0 < stats["skipped"] <= 60, stats
+        print(f"✓ Incremental ingest of a compressed file re-checks only the overlap ({stats['skipped']} rows)")
+    finally:
+        for path in paths:
+            os.remove(path)
+        shutil.rmtree(input_dir)
+
+
+def test_zstandard_inputs():
+    """Test .zst inputs: line reading, ordering by first timestamp and ingest against plain files."""
+    print("\n=== Testing Zstandard Inputs ===")
+    
+    try:
+        import zstandard
+    except ImportError:
+        print("- zstandard not installed, skipping .zst checks")
+        return
+    paths = _write_sample_parts(2)
+    input_dir = "test_market_data_inputs"
+    os.makedirs(input_dir, exist_ok=True)
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        plain = [ingest_csv(path, "MNQ", "1m", db_path=TEST_DB) for path in paths]
+        plain_bars = _dump_bars(TEST_DB)
+        
+        # Named so that name order is not time order; each file is two frames
+        compressed = [os.path.join(input_dir, name) for name in ("b.csv.zst", "a.csv.zst")]
+        for path, target in zip(paths, compressed):
+            with open(path, "rb") as f:
+                data = f.read()
+            middle = len(data) // 2
+            with open(target, "wb") as f:
+                for part in (data[:middle], data[middle:]):
+                    f.write(zstandard.ZstdCompressor().compress(part))
+        assert expand_csv_inputs(input_dir) == compressed, "Directory files are ordered by first timestamp"
+        
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            stats = [ingest_csv(path, "MNQ", "1m", db_path=TEST_DB, bulk=bulk) for path in compressed]
+            assert stats == plain and _dump_bars(TEST_DB) == plain_bars, bulk
+    finally:
+        for path in paths:
+            os.remove(path)
+        shutil.rmtree(input_dir)
+    
+    print(f"✓ .zst inputs expand in timestamp order and match plain ingest (row and bulk paths)")
+
+
+def _write_sample_with_halt(path, price_offset=0.0):
+    """Write the sample CSV with a bar for every minute of the 2026-02-09 halt; return the halt timestamps."""
+    with open(SAMPLE_CSV) as f:
+        lines = f.read().splitlines()
+    halt_start = datetime.datetime(2026, 2, 9, 14, 0, tzinfo=PT_TIMEZONE)
+    halt_rows = []
+    for minute in range(60):
+        time_str = (halt_start + datetime.timedelta(minutes=minute)).isoformat()
+        price = 25000.0 + minute + price_offset
+        halt_rows.append(f"{time_str},{price},{price + 1},{price - 1},{price},1")
+    position = next(i for i, line in enumerate(lines) if line.startswith("2026-02-09T15:00"))
+    with open(path, "w") as f:
+        f.write("\n".join(lines[:position] + halt_rows + lines[position:]) + "\n")
+    return [int((halt_start + datetime.timedelta(minutes=minute)).timestamp()) for minute in range(60)]
+
+
+def test_halt_bars_keyed_by_symbol():
+    """Test that halt bars belong to their symbol: dedup, get_bars(include_halt=True) and migration."""
+    print("\n=== Testing Halt Bars Keyed by Symbol ===")
+    
+    es_csv = "test_market_data_es.csv"
+    halt_timestamps = _write_sample_with_halt(TEST_CSV)
+    _write_sample_with_halt(es_csv, price_offset=100.0)
+    try:
+        for bulk in (False, True):
+            cleanup_test_db()
+            init_database(TEST_DB)
+            mnq = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=bulk)
+            es = ingest_csv(es_csv, "ES", "1m", db_path=TEST_DB, bulk=bulk)
+            assert es["conflicts"] == 0 and es["inserted"] == mnq["inserted"], (bulk, es)
+            again = ingest_csv(es_csv, "ES", "1m", db_path=TEST_DB, bulk=bulk, force=True)
+            assert again["inserted"] == again["conflicts"] == 0 and again["skipped"] == es["inserted"]
+        print(f"✓ Two symbols sharing {len(halt_timestamps)} halt timestamps: no cross-symbol conflicts")
+        
+        bars = get_bars("MNQ", session_date="2026-02-09", include_halt=True, db_path=TEST_DB)
+        halt_bars = [bar for bar in bars if bar["halt_period"]]
+        assert [bar["timestamp"] for bar in halt_bars] == halt_timestamps
+        assert all(bar["session_date"] is None and bar["open"] < 25100 for bar in halt_bars)
+        assert [bar["timestamp"] for bar in bars] == sorted(bar["timestamp"] for bar in bars)
+        assert [bar for bar in bars if not bar["halt_period"]] == get_bars(
+            "MNQ", session_date="2026-02-09", db_path=TEST_DB
+        )
+        es_halt = [bar for bar in get_bars("ES", include_halt=True, db_path=TEST_DB) if bar["halt_period"]]
+        assert [bar["open"] for bar in es_halt] == [bar["open"] + 100 for bar in halt_bars]
+        assert not any(bar["halt_period"] for bar in get_bars(
+            "MNQ", session_date="2026-02-10", include_halt=True, db_path=TEST_DB
+        )), "The halt belongs after the session it follows"
+        ranged = get_bars("MNQ", start_date="2026-02-06", end_date="2026-02-10", include_halt=True, db_path=TEST_DB)
+        assert sum(bar["halt_period"] for bar in ranged) == len(halt_timestamps)
+        with Archive(TEST_DB, cache_bytes=1 << 20) as archive:
+            assert archive.get_bars("MNQ", session_date="2026-02-09", include_halt=True) == bars
+            archive.connection().execute("DELETE FROM bars WHERE halt_period = 1 AND halt_symbol = 'MNQ'")
+            archive.connection().commit()
+            ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, force=True)
+            assert archive.get_bars("MNQ", session_date="2026-02-09", include_halt=True) != bars, \
+                "Re-inserted halt bars have new ids: the cached result must not be served"
+        print(f"✓ get_bars(include_halt=True) returns the symbol's {len(halt_bars)} halt bars in order")
+        
+        # Back to the old schema: halt bars without a symbol, one symbol per database
+        cleanup_test_db()
+        init_database(TEST_DB)
+        ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        conn = sqlite3.connect(TEST_DB)
+        conn.execute("DROP INDEX idx_bars_halt_key")
+        conn.execute("UPDATE bars SET halt_symbol = NULL, halt_source = NULL")
+        # A halt bar with no session bars around it: with one symbol in the database it is still theirs
+        orphan = int(datetime.datetime(2026, 2, 4, 14, 30, tzinfo=PT_TIMEZONE).timestamp())
+        conn.execute("INSERT INTO bars (trade_day_id, timeframe, timestamp, open, high, low, close, volume, "
+                     "halt_period) VALUES (NULL, 60, ?, 1, 1, 1, 1, 1, 1)", (orphan,))
+        conn.execute("CREATE UNIQUE INDEX idx_bars_halt_timeframe_timestamp "
+                     "ON bars(timeframe, timestamp) WHERE halt_period = 1")
+        conn.execute("PRAGMA user_version = 8")
+        conn.commit()
+        conn.close()
+        init_database(TEST_DB)
+        conn = sqlite3.connect(TEST_DB)
+        keys = conn.execute("SELECT DISTINCT halt_symbol, halt_source FROM bars WHERE halt_period = 1").fetchall()
+        indexes = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index'")}
+        conn.close()
+        assert keys == [("MNQ", "tradingview")], keys
+        assert "idx_bars_halt_key" in indexes and "idx_bars_halt_timeframe_timestamp" not in indexes
+        assert get_bars("MNQ", session_date="2026-02-09", include_halt=True, db_path=TEST_DB) == bars
+        for bulk in (False, True):
+            again = ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB, bulk=bulk, force=True)
+            assert again["inserted"] == again["conflicts"] == 0, (bulk, again)
+        print("✓ Migration attributes existing halt bars to the symbol ingested with them")
+    finally:
+        os.remove(TEST_CSV)
+        os.remove(es_csv)
+
+
+def test_halt_bar_migration_neighbours():
+    """Test that the halt bar migration only takes the symbol of a session bar adjoining the same halt."""
+    print("\n=== Testing Halt Bar Migration Neighbours ===")
+    
+    halt_timestamps = _write_sample_with_halt(TEST_CSV)
+    with open(TEST_CSV) as f:
+        header, *lines = f.read().splitlines()
+    os.remove(TEST_CSV)
+    halt_start = halt_timestamps[0]
+    split = next(i for i, line in enumerate(lines) if parse_tradingview_timestamp(line.split(",")[0]) >= halt_start)
+    es_csv = "test_market_data_es.csv"
+    # ES trades at a quarter of NQ's price and stops at 13:59; the NQ file starts in the halt
+    with open(es_csv, "w") as f:
+        f.write(header + "\n")
+        for line in lines[:split]:
+            time_str, *values = line.split(",")
+            prices = [str(float(value) / 4) for value in values[:4]]
+            f.write(",".join([time_str] + prices + values[4:]) + "\n")
+    with open(TEST_CSV, "w") as f:
+        f.write("\n".join([header] + lines[split:]) + "\n")
+    
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        ingest_csv(es_csv, "ES", "1m", db_path=TEST_DB)
+        ingest_csv(TEST_CSV, "NQ", "1m", db_path=TEST_DB)
+        expected = get_bars("NQ", session_date="2026-02-10", include_halt=True, db_path=TEST_DB)
+        
+        # Back to the old schema, plus a legacy halt bar with no session bars around it
+        conn = sqlite3.connect(TEST_DB)
+        conn.execute("DROP INDEX idx_bars_halt_key")
+        conn.execute("UPDATE bars SET halt_symbol = NULL, halt_source = NULL")
+        orphan = int(datetime.datetime(2026, 2, 4, 14, 30, tzinfo=PT_TIMEZONE).timestamp())
+        conn.execute("INSERT INTO bars (trade_day_id, timeframe, timestamp, open, high, low, close, volume, "
+                     "halt_period) VALUES (NULL, 60, ?, 1, 1, 1, 1, 1, 1)", (orphan,))
+        conn.execute("CREATE UNIQUE INDEX idx_bars_halt_timeframe_timestamp "
+                     "ON bars(timeframe, timestamp) WHERE halt_period = 1")
+        conn.execute("PRAGMA user_version = 8")
+        conn.commit()
+        conn.close()
+        init_database(TEST_DB)
+        
+        conn = sqlite3.connect(TEST_DB)
+        keys = conn.execute(
+            "SELECT halt_symbol, COUNT(*) FROM bars WHERE halt_period = 1 GROUP BY halt_symbol ORDER BY halt_symbol"
+        ).fetchall()
+        conn.close()
+        assert keys == [(None, 1), ("NQ", len(halt_timestamps))], keys
+        # NQ has no 2026-02-09 session: its halt bars go with the session they precede
+        nq = get_bars("NQ", start_date="2026-02-09", end_date="2026-02-10", include_halt=True, db_path=TEST_DB)
+        assert [bar["timestamp"] for bar in nq if bar["halt_period"]] == halt_timestamps
+        assert [bar for bar in nq if not bar["halt_period"]] == expected
+        assert not any(bar["halt_period"] for bar in get_bars("ES", include_halt=True, db_path=TEST_DB))
+        
+        # Re-ingesting after the migration stores no second copies, including of the unassigned bar
+        orphan_csv = "test_market_data_orphan.csv"
+        with open(orphan_csv, "w") as f:
+            f.write(header + "\n" + datetime.datetime.fromtimestamp(orphan, PT_TIMEZONE).isoformat() + ",1,1,1,1,1\n")
+        try:
+            for bulk in (False, True):
+                for path, symbol in ((es_csv, "ES"), (TEST_CSV, "NQ"), (orphan_csv, "ES")):
+                    again = ingest_csv(path, symbol, "1m", db_path=TEST_DB, bulk=bulk, force=True)
+                    assert again["inserted"] == again["conflicts"] == 0, (bulk, path, again)
+        finally:
+            os.remove(orphan_csv)
+        conn = sqlite3.connect(TEST_DB)
+        keys = conn.execute(
+            "SELECT halt_symbol, COUNT(*) FROM bars WHERE halt_period = 1 GROUP BY halt_symbol ORDER BY halt_symbol"
+        ).fetchall()
+        conn.close()
+        assert keys == [("ES", 1), ("NQ", len(halt_timestamps))], keys
+    finally:
+        os.remove(TEST_CSV)
+        os.remove(es_csv)
+    print(f"✓ {len(halt_timestamps)} halt bars of a file starting in the halt migrate to its symbol; "
+          f"a halt bar without neighbours stays unassigned until an ingest meets it again")
+
+
+def test_export_import_bars():
+    """Test that export_bars / import_bars round-trip bars through per-session columnar files."""
+    print("\n=== Testing Bar Export and Import ===")
+    
+    export_dir = "test_market_data_export"
+    import_db = "test_market_data_import.db"
+    _write_sample_with_halt(TEST_CSV)
+    
+    def without_ids(bars):
+        return [{key: value for key, value in bar.items() if key != "id"} for bar in bars]
+    
+    try:
+        import pyarrow  # noqa: F401
+        formats = ("columnar", "parquet")
+    except ImportError:
+        formats = ("columnar",)
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        expected = get_bars("MNQ", include_halt=True, db_path=TEST_DB)
+        
+        for format in formats:
+            shutil.rmtree(export_dir, ignore_errors=True)
+            for path in (import_db, import_db + "-wal", import_db + "-shm"):
+                if os.path.exists(path):
+                    os.remove(path)
+            # Batches smaller than a session, so partitions span fetches
+            report = export_bars("MNQ", export_dir, include_halt=True, db_path=TEST_DB, format=format,
+                                 batch_size=97)
+            assert report["format"] == format and report["bars"] == len(expected)
+            assert [os.path.relpath(path, export_dir).split(os.sep)[:2] for path in report["files"]] == [
+                ["symbol=MNQ", f"session_date={date}"] for date in sorted({bar["session_date"] for bar in expected
+                                                                          if bar["session_date"]})
+            ]
+            
+            init_database(import_db)
+            stats = import_bars(export_dir, db_path=import_db)
+            assert stats["inserted"] == len(expected) and len(stats["files"]) == len(report["files"])
+            assert without_ids(get_bars("MNQ", include_halt=True, db_path=import_db)) == without_ids(expected)
+            again = import_bars(export_dir, db_path=import_db, commit_every=100)
+            assert again["inserted"] == 0 and again["skipped"] == len(expected)
+            print(f"✓ {format}: {report['bars']} bars in {len(report['files'])} session files round-trip")
+        
+        # A date range exports only its sessions; a coarser timeframe is exported resampled
+        ranged = export_bars("MNQ", export_dir, start_date="2026-02-09", end_date="2026-02-09",
+                             timeframe="5m", db_path=TEST_DB, format="columnar")
+        assert len(ranged["files"]) == 1 and ranged["files"][0].endswith("tradingview-300s.bars")
+        cleanup_test_db()
+        init_database(TEST_DB)
+        import_bars(ranged["files"][0], db_path=TEST_DB)
+        assert without_ids(get_bars("MNQ", db_path=TEST_DB)) == without_ids(
+            get_bars("MNQ", session_date="2026-02-09", timeframe="5m", db_path=import_db)
+        )
+        print(f"✓ Range and timeframe exports ({ranged['bars']} 5-minute bars)")
+        
+        # A failed export leaves earlier files alone and no partial tree behind
+        before = {path: os.path.getmtime(path) for path in ranged["files"]}
+        failed_dir = "test_market_data_export_failed"
+        os.makedirs(os.path.join(failed_dir, "symbol=MNQ"))
+        with open(os.path.join(failed_dir, "symbol=MNQ", "session_date=2026-02-09"), "w") as f:
+            f.write("in the way\n")
+        try:
+            export_bars("MNQ", failed_dir, db_path=import_db, format="columnar")
+            assert False, "A file in place of a partition directory should raise"
+        except OSError:
+            pass
+        assert os.listdir(os.path.join(failed_dir, "symbol=MNQ")) == ["session_date=2026-02-09"]
+        blocker = os.path.join(export_dir, "symbol=MNQ", "session_date=2026-02-10", "tradingview-300s.bars.tmp")
+        os.makedirs(blocker)
+        try:
+            export_bars("MNQ", export_dir, timeframe="5m", db_path=import_db, format="columnar")
+            assert False, "A directory in place of a temporary file should raise"
+        except OSError:
+            pass
+        os.rmdir(blocker)
+        assert {path: os.path.getmtime(path) for path in ranged["files"]} == before
+        assert not any(name.endswith(".tmp") for _, _, names in os.walk(export_dir) for name in names)
+        print("✓ A failed export removes its temporaries and directories")
+        
+        try:
+            export_bars("MNQ", export_dir, db_path=TEST_DB, format="csv")
+            assert False, "Unknown format should raise"
+        except ValueError as e:
+            assert "Unknown format 'csv'" in str(e)
+        try:
+            import_bars(TEST_CSV, db_path=TEST_DB)
+            assert False, "A CSV is not an export"
+        except ValueError:
+            pass
+        print("✓ Unknown formats and foreign files raise ValueError")
+    finally:
+        os.remove(TEST_CSV)
+        shutil.rmtree(export_dir, ignore_errors=True)
+        shutil.rmtree("test_market_data_export_failed", ignore_errors=True)
+        for path in (import_db, import_db + "-wal", import_db + "-shm"):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def test_leading_halt_partitions():
+    """Test that halt bars before a symbol's first session are exported and streamed under their own date."""
+    print("\n=== Testing Leading Halt Partitions ===")
+    
+    export_dir = "test_market_data_export"
+    # 2024-01-08 14:30-15:04 PT: 30 halt bars, then the first bars of the 2024-01-09 session
+    start = datetime.datetime(2024, 1, 8, 14, 30, tzinfo=PT_TIMEZONE)
+    with open(TEST_CSV, "w") as f:
+        f.write("time,open,high,low,close,Volume\n")
+        for minute in range(35):
+            price = 16800.0 + minute
+            f.write(f"{(start + datetime.timedelta(minutes=minute)).isoformat()},"
+                    f"{price},{price + 1},{price - 1},{price},10\n")
+    
+    try:
+        cleanup_test_db()
+        init_database(TEST_DB)
+        ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        expected = get_bars("MNQ", include_halt=True, db_path=TEST_DB)
+        assert sum(bar["halt_period"] for bar in expected) == 30 and len(expected) == 35
+        
+        report = export_bars("MNQ", export_dir, include_halt=True, db_path=TEST_DB, format="columnar")
+        assert [os.path.relpath(path, export_dir) for path in report["files"]] == [
+            os.path.join("symbol=MNQ", f"session_date={date}", "tradingview-60s.bars")
+            for date in ("2024-01-08", "2024-01-09")
+        ]
+        assert report["bars"] == len(expected)
+        
+        server = ArchiveServer(TEST_DB, port=0)
+        serving = threading.Thread(target=server.serve_forever)
+        serving.start()
+        try:
+            conn = http.client.HTTPConnection("127.0.0.1", server.server_address[1], timeout=10)
+            conn.request("GET", "/bars?symbol=MNQ&include_halt=1&format=columnar")
+            response = conn.getresponse()
+            assert response.status == 200
+            partitions = list(read_columnar_stream(io.BytesIO(response.read())))
+            conn.close()
+        finally:
+            server.shutdown()
+            server.server_close()
+            serving.join()
+        assert [(metadata["session_date"], metadata["timeframe"]) for metadata, _ in partitions] == [
+            ("2024-01-08", 60), ("2024-01-09", 60)
+        ]
+        assert [t for _, columns in partitions for t in columns["timestamp"]] == [bar["timestamp"] for bar in expected]
+    finally:
+        os.remove(TEST_CSV)
+        shutil.rmtree(export_dir, ignore_errors=True)
+    print(f"✓ 30 leading halt bars export and stream under 2024-01-08, ahead of the 2024-01-09 session")
+
+
+def test_bar_files():
+    """Test memory-mapped bar files against get_bars as ingests append and backfill."""
+    print("\n=== Testing Memory-Mapped Bar Files ===")
+    
+    bar_file_dir = "test_market_data_bar_files"
+    paths = _write_sample_parts(3)
+    
+    def as_records(bars):
+        return [(bar["timestamp"], bar["open"], bar["high"], bar["low"], bar["close"], bar["volume"],
+                 market_archivist.BAR_FLAG_HALT if bar["halt_period"] else 0) for bar in bars]
+    
+    try:
+        cleanup_test_db()
+        with Archive(TEST_DB, bar_file_dir=bar_file_dir) as archive:
+            archive.init_database()
+            archive.ingest_csv(paths[0], "MNQ", "1m")
+            file_path = os.path.join(bar_file_dir, "MNQ.tradingview.60s.bars")
+            inode = os.stat(file_path).st_ino
+            archive.ingest_csv(paths[2], "MNQ", "1m", bulk=True)
+            assert os.stat(file_path).st_ino == inode, "Newer bars are appended in place"
+            archive.ingest_csv(paths[1], "MNQ", "1m")
+            assert os.stat(file_path).st_ino != inode, "A backfill rebuilds the file"
+            
+            bar_file = archive.bar_file("MNQ", "1m")
+            assert archive.bar_file("MNQ", "1m") is bar_file, "An unchanged file is reused"
+            assert bar_file.bars() == as_records(archive.get_bars("MNQ"))
+            for start, end in (("2026-02-09", "2026-02-09"), ("2026-02-06", "2026-02-10"), ("2026-02-11", None)):
+                assert bar_file.bars(start, end) == as_records(
+                    archive.get_bars("MNQ", start_date=start, end_date=end or "9999-12-31")
+                ), (start, end)
+            view = bar_file.view(bar_file.bars()[10][0], bar_file.bars()[20][0])
+            assert len(view) == 10 * market_archivist.BAR_RECORD.size and isinstance(view, memoryview)
+            view.release()
+            assert archive.check_bar_file("MNQ", "1m")["consistent"]
+            print(f"✓ {len(bar_file)} records match get_bars after append and backfill")
+        
+        # Ingests through an archive without bar files are picked up on the next open
+        _write_sample_with_halt(TEST_CSV)
+        ingest_csv(TEST_CSV, "MNQ", "1m", db_path=TEST_DB)
+        stale = check_bar_file("MNQ", "1m", db_path=TEST_DB, bar_file_dir=bar_file_dir)
+        assert not stale["consistent"] and stale["stored_bars"] == stale["file_records"] + 60, stale
+        assert sync_bar_file("MNQ", "1m", db_path=TEST_DB, bar_file_dir=bar_file_dir) == file_path
+        assert check_bar_file("MNQ", "1m", db_path=TEST_DB, bar_file_dir=bar_file_dir)["consistent"]
+        sync_bar_file("ES", "1m", db_path=TEST_DB, bar_file_dir=bar_file_dir)
+        assert check_bar_file("ES", "1m", db_path=TEST_DB, bar_file_dir=bar_file_dir)["file_records"] == 0
+        with Archive(TEST_DB, bar_file_dir=bar_file_dir) as archive:
+            bar_file = archive.bar_file("MNQ", "1m")
+            expected = archive.get_bars("MNQ", session_date="2026-02-09", include_halt=True)
+            assert bar_file.bars("2026-02-09", "2026-02-09", include_halt=True) == as_records(expected)
+            assert archive.check_bar_file("MNQ", "1m")["consistent"]
+            
+            archive.connection().execute(
+                "UPDATE bars SET close = close + 1 WHERE id = (SELECT MAX(id) FROM bars WHERE halt_period = 0)"
+            )
+            archive.connection().commit()
+            tampered = archive.check_bar_file("MNQ", "1m")
+            assert tampered["mismatches"] == 1 and tampered["first_mismatch"] is not None
+            try:
+                archive.bar_file("ES", "1m").bars()
+            except Exception as e:
+                raise AssertionError(f"An empty bar file should open: {e}")
+        print("✓ Halt bars, catching up on other ingests, and the consistency check")
+    finally:
+        for path in paths + [TEST_CSV]:
+            if os.path.exists(path):
+                os.remove(path)
+        shutil.rmtree(bar_file_dir, ignore_errors=True)
+
+
+def test_async_archive():
+    """Test AsyncArchive: concurrent queries match the sync API, writes run in order, the loop stays live."""
+    print("\n=== Testing AsyncArchive ===")
+    
+    async def scenario():
+        async with AsyncArchive(TEST_DB, max_readers=3) as archive:
+            await archive.init_database()
+            
+            # The event loop keeps running while the writer thread ingests
+            ticks = 0
+            done = asyncio.Event()
+            
+            async def ticker():
+                nonlocal ticks
+                while not done.is_set():
+                    ticks += 1
+                    await asyncio.sleep(0.001)
+            
+            ticking = asyncio.create_task(ticker())
+            stats = await archive.ingest_csv(SAMPLE_CSV, "MNQ", "1m")
+            done.set()
+            await ticking
+            
+            dates = sorted({bar["session_date"] for bar in await archive.get_bars("MNQ")})
+            queries = [archive.get_bars("MNQ", session_date=date) for date in dates * 20]
+            notes = [archive.save_day_annotation("MNQ", dates[i % len(dates)], f"note {i}", tags=["async"])
+                     for i in range(30)]
+            results = await asyncio.gather(*queries, *notes)
+            bars, ids = results[:len(queries)], results[len(queries):]
+            annotations = await archive.get_day_annotations("MNQ", dates[0], dates[-1], tags=["async"])
+            trade_day = await archive.get_trade_day("MNQ", dates[0])
+            try:
+                await archive.get_bars("MNQ", timeframe="bogus")
+                assert False, "Errors should propagate to the awaiting coroutine"
+            except ValueError:
+                pass
+            return stats, ticks, dates, bars, ids, annotations, trade_day
+    
+    cleanup_test_db()
+    stats, ticks, dates, bars, ids, annotations, trade_day = asyncio.run(scenario())
+    assert stats["inserted"] > 0 and ticks >= 2, (stats, ticks)
+    with Archive(TEST_DB) as archive:
+        expected = {date: archive.get_bars("MNQ", session_date=date) for date in dates}
+    assert bars == [expected[date] for date in dates * 20]
+    assert ids == list(range(ids[0], ids[0] + 30)), "Writes run one at a time, in submission order"
+    assert sorted(annotation["id"] for annotation in annotations) == ids
+    assert trade_day["session_date"] == dates[0]
+    print(f"✓ {len(bars)} concurrent queries match get_bars; {len(ids)} queued writes applied in order; "
+          f"event loop ticked {ticks} times during ingest")
+
+
+def test_archive_server():
+    """Test ArchiveServer: endpoints match the Python API, streamed formats, ETag revalidation and errors."""
+    print("\n=== Testing ArchiveServer ===")
+    
+    cleanup_test_db()
+    halt_csv = TEST_CSV + ".halt.csv"
+    _write_sample_with_halt(halt_csv)
+    init_database(TEST_DB)
+    ingest_csv(SAMPLE_CSV, "MNQ", "1m", db_path=TEST_DB)
+    save_day_annotation("MNQ", "2026-02-09", "Opening drive", tags=["drive"], db_path=TEST_DB)
+    
+    server = ArchiveServer(TEST_DB, port=0, workers=4)
+    serving = threading.Thread(target=server.serve_forever)
+    serving.start()
+    port = server.server_address[1]
+    
+    def request(path, etag=None, conn=None):
+        conn = conn or http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+        conn.request("GET", path, headers={"If-None-Match": etag} if etag else {})
+        response = conn.getresponse()
+        return response.status, response.getheader("ETag"), response.read()
+    
+    try:
+        week = "symbol=MNQ&start_date=2026-02-02&end_date=2026-02-10"
+        expected = get_bars("MNQ", start_date="2026-02-02", end_date="2026-02-10", db_path=TEST_DB)
+        
+        status, etag, body = request("/bars?" + week)
+        assert status == 200 and json.loads(body) == expected
+        lines = request("/bars?" + week + "&format=ndjson")[2].splitlines()
+        assert [json.loads(line) for line in lines] == expected
+        partitions = list(read_columnar_stream(io.BytesIO(request("/bars?" + week + "&format=columnar")[2])))
+        assert [metadata["session_date"] for metadata, _ in partitions] == \
+            sorted({bar["session_date"] for bar in expected})
+        assert [t for _, columns in partitions for t in columns["timestamp"]] == [bar["timestamp"] for bar in expected]
+        
+        sessions = get_session_summaries("MNQ", db_path=TEST_DB)
+        assert json.loads(request("/sessions?symbol=MNQ")[2]) == sessions
+        status, notes_etag, body = request("/annotations?" + week + "&tags=drive,gap")
+        assert [note["content"] for note in json.loads(body)] == ["Opening drive"]
+        
+        # Many clients on keep-alive connections see the same answers
+        def client(results):
+            conn = http.client.HTTPConnection("127.0.0.1", port, timeout=10)
+            for _ in range(5):
+                results.append(json.loads(request("/bars?" + week, conn=conn)[2]) == expected)
+            conn.close()
+        results = []
+        clients = [threading.Thread(target=client, args=(results,)) for _ in range(8)]
+        for thread in clients:
+            thread.start()
+        for thread in clients:
+            thread.join()
+        assert results == [True] * 40
+        
+        # Unchanged data revalidates with 304 and no body
+        assert request("/bars?" + week, etag) == (304, etag, b"")
+        halt_status, halt_etag, _ = request("/bars?" + week + "&include_halt=1")
+        
+        # Halt bars change include_halt responses only; a new note changes /annotations
+        ingest_csv(halt_csv, "MNQ", "1m", db_path=TEST_DB)
+        save_day_annotation("MNQ", "2026-02-09", "Gap filled", db_path=TEST_DB)
+        assert request("/bars?" + week, etag)[0] == 304
+        status, new_etag, body = request("/bars?" + week + "&include_halt=1", halt_etag)
+        assert status == 200 and new_etag != halt_etag
+        assert sum(bar["halt_period"] for bar in json.loads(body)) == 60
+        status, _, body = request("/annotations?" + week, notes_etag)
+        assert status == 200 and len(json.loads(body)) == 2
+        
+        # Superseding a note from another session date changes its day's answer
+        friday = "/annotations?symbol=MNQ&start_date=2026-02-06&end_date=2026-02-06"
+        old_id = save_day_annotation("MNQ", "2026-02-06", "Range day", db_path=TEST_DB)
+        status, friday_etag, body = request(friday)
+        assert [note["content"] for note in json.loads(body)] == ["Range day"]
+        save_day_annotation("MNQ", "2026-02-09", "Range broke Monday", supersedes_id=old_id, db_path=TEST_DB)
+        status, new_etag, body = request(friday, friday_etag)
+        assert status == 200 and new_etag != friday_etag and json.loads(body) == []
+        
+        for path, code in (
+            ("/bars?session_date=2026-02-09", 400),
+            ("/bars?symbol=MNQ&format=xml", 400),
+            ("/bars?symbol=MNQ&limit=5", 400),
+            ("/bars?symbol=MNQ&timeframe=bogus&format=ndjson", 400),
+            ("/annotations?symbol=MNQ", 400),
+            ("/quotes", 404),
+        ):
+            status, _, body = request(path)
+            assert status == code and "error" in json.loads(body), (path, status, body)
+    finally:
+        server.shutdown()
+        server.server_close()
+        serving.join()
+        os.remove(halt_csv)
+    
+    print(f"✓ json, ndjson and columnar /bars match get_bars ({len(expected)} bars); "
+          f"40 keep-alive requests from 8 clients; ETags revalidate with 304 until the data changes")
+
+
 def run_all_tests():
     """Run all tests."""
     print("=" * 60)
@@ -408,6 +2218,35 @@ def run_all_tests():
         test_annotations()
         test_bar_queries()
         test_trade_day_query()
+        test_bulk_ingestion_matches_row_path()
+        test_schema_migration()
+        test_session_calendar_matches_zoneinfo()
+        test_timestamp_fast_path()
+        test_ingest_many()
+        test_raw_storage_policies()
+        test_archive_session()
+        test_wal_readers_during_ingest()
+        test_iter_bars()
+        test_get_bars_columnar()
+        test_timeframes_and_resampling()
+        test_mixed_timeframe_days()
+        test_session_summaries()
+        test_bar_cache()
+        test_annotation_tags()
+        test_search_annotations()
+        test_save_day_annotations_bulk()
+        test_incremental_ingest()
+        test_ingest_files_ledger()
+        test_streaming_csv_reader()
+        test_compressed_and_directory_inputs()
+        test_zstandard_inputs()
+        test_halt_bars_keyed_by_symbol()
+        test_halt_bar_migration_neighbours()
+        test_export_import_bars()
+        test_leading_halt_partitions()
+        test_bar_files()
+        test_async_archive()
+        test_archive_server()
         
         print("\n" + "=" * 60)
         print("✅ All tests passed!")